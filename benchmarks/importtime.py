@@ -0,0 +1,98 @@
+"""CLI 启动导入耗时基准
+
+对每个命令运行 `python -X importtime -m x1ayu_rag.main <args>`，统计导入总耗时，
+并检查轻量命令没有加载 LangChain / pymilvus 等重型依赖。超出预算或命令异常退出时以非零状态退出，
+可用于 CI 中防止启动性能回退。
+
+用法:
+    python benchmarks/importtime.py                # 在已初始化的知识库目录中运行
+    python benchmarks/importtime.py --scale 2.0    # 放宽预算 (较慢的机器)
+    python benchmarks/importtime.py --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# 各命令的导入预算 (毫秒) 及禁止加载的模块前缀
+HEAVY_MODULES = ("langchain_core", "langchain_milvus", "pymilvus", "langchain_openai", "langchain_ollama", "numpy")
+
+COMMANDS = [
+    {"args": ["--help"], "budget_ms": 200, "forbidden": HEAVY_MODULES},
+    {"args": ["show"], "budget_ms": 250, "forbidden": HEAVY_MODULES},
+    {"args": ["select", "--help"], "budget_ms": 200, "forbidden": HEAVY_MODULES},
+    {"args": ["chain", "--help"], "budget_ms": 200, "forbidden": HEAVY_MODULES},
+    {"args": ["serve", "--help"], "budget_ms": 200, "forbidden": HEAVY_MODULES},
+]
+
+
+def measure(args):
+    """运行一次命令，返回 (导入总耗时毫秒, 已导入模块集合, 退出码)"""
+    env = dict(os.environ, RAG_NO_DAEMON="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "x1ayu_rag.main", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    total_us = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        # 仅累加顶层导入 (缩进为 1 个空格)，子模块已包含在其累计耗时中
+        if len(name) - len(name.lstrip()) == 1:
+            total_us += int(cumulative)
+    return total_us / 1000, modules, proc.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="预算缩放系数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个命令运行次数 (取最小值)")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    opts = parser.parse_args()
+
+    results = []
+    for command in COMMANDS:
+        runs = [measure(command["args"]) for _ in range(opts.repeat)]
+        elapsed = min(ms for ms, _, _ in runs)
+        modules = runs[0][1]
+        # 命令异常退出 (如导入时崩溃) 时耗时没有意义，直接判为失败
+        returncode = next((code for _, _, code in runs if code != 0), 0)
+        heavy = sorted(
+            m for m in modules
+            if any(m == p or m.startswith(p + ".") for p in command["forbidden"])
+        )
+        budget = command["budget_ms"] * opts.scale
+        results.append({
+            "command": " ".join(command["args"]),
+            "import_ms": round(elapsed, 1),
+            "budget_ms": budget,
+            "heavy_modules": [m for m in heavy if "." not in m],
+            "returncode": returncode,
+            "ok": returncode == 0 and elapsed <= budget and not heavy,
+        })
+
+    if opts.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for r in results:
+            status = "OK  " if r["ok"] else "FAIL"
+            line = f"{status} rag {r['command']:<16} {r['import_ms']:>8.1f} ms / {r['budget_ms']:.0f} ms"
+            if r["returncode"]:
+                line += f"  exit code {r['returncode']}"
+            if r["heavy_modules"]:
+                line += f"  heavy: {', '.join(r['heavy_modules'])}"
+            print(line)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""摄取内存基准
+
+生成合成 Markdown 语料，在内存中切分为 Document / Chunk (模拟一次目录批量摄取)，
+用 tracemalloc 统计保留的对象占用，并与原文字节数对比。超出预算时以非零状态退出。
+
+用法:
+    python benchmarks/memory.py                       # 默认 200 个文件
+    python benchmarks/memory.py --files 1000 --paragraphs 6
+    python benchmarks/memory.py --budget 2.5 --json   # 保留内存 / 原文字节数 的上限
+"""
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import tracemalloc
+
+
+def measure(files: int, sections: int, paragraphs: int, heading_depth: int) -> dict:
+    from x1ayu_rag.model.document import Document
+    from x1ayu_rag.service.bench_service import generate_corpus
+    # 预先导入切分器依赖，避免模块本身计入统计
+    from x1ayu_rag.splitter.base import get_splitter
+    get_splitter().split_from_content("warmup.md", ".", "# a\nb\n")
+
+    with tempfile.TemporaryDirectory(prefix="rag-mem-") as root:
+        paths = generate_corpus(root, files, heading_depth, sections, paragraphs)
+        contents = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                contents.append(f.read())
+
+    text_bytes = sum(len(c.encode("utf-8")) for c in contents)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    docs = [Document.from_content(f"doc{i:05d}.md", "corpus", c) for i, c in enumerate(contents)]
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained -= before
+    peak -= before
+    chunks = sum(len(d.chunks or []) for d in docs)
+    return {
+        "files": files,
+        "chunks": chunks,
+        "text_bytes": text_bytes,
+        "retained_bytes": retained,
+        "peak_bytes": peak,
+        "bytes_per_chunk": round(retained / max(chunks, 1), 1),
+        "retained_ratio": round(retained / max(text_bytes, 1), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200, help="文件数")
+    parser.add_argument("--sections", type=int, default=8, help="每个文件的章节数")
+    parser.add_argument("--paragraphs", type=int, default=4, help="每个章节的段落数")
+    parser.add_argument("--depth", type=int, default=3, help="标题层级深度")
+    parser.add_argument("--budget", type=float, default=2.0, help="保留内存与原文字节数之比的上限")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    opts = parser.parse_args()
+
+    result = measure(opts.files, opts.sections, opts.paragraphs, opts.depth)
+    result["budget_ratio"] = opts.budget
+    ok = result["retained_ratio"] <= opts.budget
+
+    if opts.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"files            {result['files']}")
+        print(f"chunks           {result['chunks']}")
+        print(f"text             {result['text_bytes'] / 1024:.0f} KB")
+        print(f"retained         {result['retained_bytes'] / 1024:.0f} KB ({result['retained_ratio']:.2f}x text)")
+        print(f"peak             {result['peak_bytes'] / 1024:.0f} KB")
+        print(f"per chunk        {result['bytes_per_chunk']:.0f} B")
+        print(f"budget           {opts.budget:.2f}x  {'OK' if ok else 'OVER'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from typing import Tuple
+from x1ayu_rag.api.ingest_api import IngestAPI
+from x1ayu_rag.service.async_ingest_service import AsyncIngestService
+
+
+class AsyncIngestAPI:
+    """异步摄取 API 层
+
+    目录中的文件并发解析与嵌入，同时处理的文件数受 max_concurrency 限制。
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self._sync_api = IngestAPI()
+        self.service = AsyncIngestService(self._sync_api.service, max_concurrency)
+
+    async def ingest_document(self, file_path: str) -> Tuple[bool, str, list]:
+        """处理文档或目录摄取请求 (返回值同 IngestAPI.ingest_document)"""
+        abs_path, error = IngestAPI.check_path(file_path)
+        if error:
+            return False, error, []
+        try:
+            op_type, result = await self.service.ingest_document(abs_path)
+            return IngestAPI.format_result(op_type, result, file_path)
+        except Exception as e:
+            return False, f"Ingestion failed: {str(e)}", []
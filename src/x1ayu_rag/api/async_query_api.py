@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from x1ayu_rag.api.query_api import QueryAPI
+from x1ayu_rag.service.async_query_service import AsyncQueryService
+
+
+class AsyncQueryAPI:
+    """异步查询 API 层
+
+    供嵌入式应用在单个事件循环中并发执行大量查询与问答。
+    同时进行的检索数与问答数分别受 max_concurrency / max_answers 限制。
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_answers: int = 4):
+        self._sync_api = QueryAPI()
+        self.service = AsyncQueryService(self._sync_api.service, max_concurrency)
+        self._answer_semaphore = asyncio.Semaphore(max_answers)
+        self._chains: Dict[Optional[int], Any] = {}
+
+    async def search_chunks(self, query: str, top_k: int = 2, **options) -> List[Dict[str, Any]]:
+        """搜索分块 (参数与返回值同 QueryAPI.search_chunks)"""
+        chunks = await self.service.search_chunks(query, top_k, **options)
+        return [QueryAPI._to_result(chunk) for chunk in chunks if chunk.content is not None]
+
+    async def search_chunks_many(self, queries: List[str], top_k: int = 2, **options) -> List[List[Dict[str, Any]]]:
+        """并发搜索多个查询，结果与 queries 一一对应"""
+        return list(await asyncio.gather(*(self.search_chunks(q, top_k, **options) for q in queries)))
+
+    def _get_chain(self, context_tokens: Optional[int]):
+        if context_tokens not in self._chains:
+            from x1ayu_rag.chain.rag_chain import RAGChain
+            self._chains[context_tokens] = RAGChain(
+                context_tokens=context_tokens, query_service=self._sync_api.service
+            )
+        return self._chains[context_tokens]
+
+    async def answer(self, question: str, k: int = 2, context_tokens: Optional[int] = None, **options) -> str:
+        """运行 RAG 链回答问题
+
+        参数:
+            question: 问题
+            k: 检索数量
+            context_tokens: 上下文 token 预算
+            **options: 其余检索参数，同 RAGChain.get_chain
+        """
+        rag = self._get_chain(context_tokens)
+        chain = rag.get_chain(k=k, **options)
+        async with self._answer_semaphore:
+            return await chain.ainvoke({"question": question, "k": k})
+
+    async def answer_many(self, questions: List[str], **options) -> List[str]:
+        """并发回答多个问题，结果与 questions 一一对应"""
+        return list(await asyncio.gather(*(self.answer(q, **options) for q in questions)))
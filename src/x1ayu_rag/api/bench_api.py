@@ -0,0 +1,63 @@
+import json
+from typing import Tuple, Dict, Any, List, Optional
+from x1ayu_rag.service.bench_service import BenchService
+
+
+class BenchAPI:
+    """基准测试 API 层
+
+    负责校验基准参数、读写结果文件，并调用 BenchService。
+    """
+    def __init__(self):
+        self.service = BenchService()
+
+    def run(self, options: Optional[Dict[str, Any]] = None, output: Optional[str] = None) -> Tuple[bool, str, Dict[str, Any]]:
+        """执行基准
+
+        参数:
+            options: 覆盖默认基准设置 (见 bench_service.DEFAULT_BENCH_OPTIONS)
+            output: 结果 JSON 的保存路径 (可选)
+
+        返回:
+            (success, message, report)
+        """
+        options = options or {}
+        sizes = options.get("sizes")
+        if sizes is not None and (not sizes or any(s <= 0 for s in sizes)):
+            return False, "Error: --sizes must be positive integers.", {}
+        if options.get("queries", 1) <= 0:
+            return False, "Error: --queries must be a positive integer.", {}
+        try:
+            report = self.service.run(options)
+        except Exception as e:
+            return False, f"Benchmark failed: {str(e)}", {}
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            return True, f"Benchmark results written to {output}.", report
+        return True, "Benchmark complete.", report
+
+    def compare(self, report: Dict[str, Any], baseline_path: str, tolerance: float = 0.1) -> Tuple[bool, str, List[Dict[str, Any]]]:
+        """与基线结果文件对比
+
+        返回:
+            (success, message, rows)：success 为 False 表示存在超出容差的退化、
+            基线无法读取或基线的设置 (后端、语料结构、Embedding 维度、查询集合等) 与本次不一致
+        """
+        try:
+            with open(baseline_path, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            return False, f"Error: Cannot read baseline: {e}", []
+        mismatches = self.service.option_mismatches(report, baseline)
+        if mismatches:
+            return False, "Error: Baseline was run with different options; results are not comparable: " + (
+                "; ".join(mismatches)
+            ), []
+        rows = self.service.compare(report, baseline, tolerance)
+        if not rows:
+            return False, "Error: Baseline has no results for the benchmarked sizes.", []
+        regressions = [r for r in rows if r["regressed"]]
+        if regressions:
+            return False, f"{len(regressions)} metric(s) regressed by more than {tolerance:.0%}.", rows
+        return True, f"No regressions beyond {tolerance:.0%}.", rows
@@ -0,0 +1,51 @@
+import os
+from typing import Any, Dict, Tuple
+from x1ayu_rag.error.exceptions import RAGError
+from x1ayu_rag.service.bundle_service import BundleService
+
+
+class BundleAPI:
+    """知识库快照 API 层
+
+    负责校验快照路径并调用 BundleService。
+    """
+    def __init__(self):
+        self.service = BundleService()
+
+    def export_bundle(self, bundle_path: str) -> Tuple[bool, str, Dict[str, Any]]:
+        """导出当前知识库到快照文件
+
+        返回:
+            (success, message, manifest)
+        """
+        if not bundle_path:
+            return False, "Error: Bundle path cannot be empty.", {}
+        if os.path.isdir(bundle_path):
+            return False, f"Error: {bundle_path} is a directory.", {}
+        try:
+            manifest = self.service.export_bundle(bundle_path)
+        except RAGError as e:
+            return False, f"Export failed: {e.message}", {}
+        except Exception as e:
+            return False, f"Export failed: {str(e)}", {}
+        return True, f"Exported {manifest['documents']} documents to {bundle_path}.", manifest
+
+    def import_bundle(self, bundle_path: str, replace: bool = False) -> Tuple[bool, str, Dict[str, Any]]:
+        """从快照文件导入知识库 (不重新嵌入)
+
+        参数:
+            bundle_path: 快照文件路径
+            replace: 当前知识库非空时是否替换
+
+        返回:
+            (success, message, report)
+        """
+        if not os.path.isfile(bundle_path):
+            return False, f"Error: Bundle not found: {bundle_path}", {}
+        try:
+            report = self.service.import_bundle(bundle_path, replace=replace)
+        except RAGError as e:
+            return False, f"Import failed: {e.message}", {}
+        except Exception as e:
+            return False, f"Import failed: {str(e)}", {}
+        return True, f"Imported {report['documents']} documents from {bundle_path}.", report
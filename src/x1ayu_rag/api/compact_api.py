@@ -0,0 +1,36 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from x1ayu_rag.service.compact_service import CompactService
+
+
+class CompactAPI:
+    """存储压缩 API 层
+
+    负责压缩向量库与 SQLite、重建向量索引，并报告压缩前后的大小与检索延迟。
+    """
+    def __init__(self):
+        self.service = CompactService()
+
+    def compact(
+        self,
+        threshold: Optional[float] = None,
+        progress: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """压缩当前知识库
+
+        参数:
+            threshold: 只在删除比例 (向量库已删除记录或 SQLite 空闲页) 达到该值时压缩，None 表示总是压缩
+            progress: 各阶段开始时调用 progress(阶段说明)
+
+        返回:
+            (success, message, report): report 见 CompactService.compact；未达到阈值时为空字典
+        """
+        if threshold is not None and not 0 < threshold <= 1:
+            return False, "Error: --threshold must be in (0, 1].", {}
+        try:
+            if threshold is not None and not self.service.needs_compaction(threshold):
+                return True, f"Deleted ratio is below {threshold:g}; nothing to compact.", {}
+            report = self.service.compact(progress=progress)
+        except Exception as e:
+            return False, f"Compaction failed: {str(e)}", {}
+        before, after = report["before"]["bytes"], report["after"]["bytes"]
+        return True, f"Compaction complete: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB.", report
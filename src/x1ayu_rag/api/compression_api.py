@@ -0,0 +1,40 @@
+from typing import Tuple, Dict, Any, Optional
+from x1ayu_rag.service.compression_service import CompressionService
+
+
+class CompressionAPI:
+    """向量压缩 API 层
+
+    负责校验压缩参数并调用 CompressionService。
+    """
+    def __init__(self):
+        self.service = CompressionService()
+
+    def compress(
+        self,
+        method: str = "pca",
+        dim: Optional[int] = None,
+        index_type: str = "FLAT",
+        index_params: Optional[Dict[str, Any]] = None,
+        sample_size: int = 200,
+        k: int = 10,
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """压缩向量集合
+
+        返回:
+            (success, message, report)
+        """
+        if method != "none" and (not dim or dim <= 0):
+            return False, "Error: --dim must be a positive integer for pca/truncate.", {}
+        try:
+            report = self.service.compress(
+                method=method,
+                dim=dim,
+                index_type=index_type,
+                index_params=index_params,
+                sample_size=sample_size,
+                k=k,
+            )
+            return True, "Vector collection compressed.", report
+        except Exception as e:
+            return False, f"Compression failed: {str(e)}", {}
@@ -0,0 +1,41 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from x1ayu_rag.service.fsck_service import FsckService
+
+
+class FsckAPI:
+    """一致性检查 API 层
+
+    负责检查 SQLite 与向量库之间的不一致，并按需修复。
+    """
+    def __init__(self):
+        self.service = FsckService()
+
+    def check(
+        self, repair: bool = False, progress: Optional[Callable[[str], None]] = None, force: bool = False
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """检查 (并可选修复) 当前知识库
+
+        参数:
+            repair: 是否修复发现的问题
+            progress: 各阶段开始时调用 progress(阶段说明)
+            force: 多数文档的源文件缺失时仍然删除这些文档
+
+        返回:
+            (success, message, report): report 见 FsckService.check
+        """
+        try:
+            report = self.service.check(repair=repair, progress=progress, force=force)
+        except Exception as e:
+            return False, f"Consistency check failed: {str(e)}", {}
+        issues = report["issues"]
+        if not issues:
+            return True, "No inconsistencies found.", report
+        if report["vanished_kept"]:
+            return True, (
+                f"Found {issues} inconsistencies; repaired all but the {report['vanished_documents']} documents "
+                f"whose source files are missing. Most documents are affected, which usually means the knowledge "
+                f"base was imported or its source directory moved; run 'rag fsck --repair --force' to delete them."
+            ), report
+        if repair:
+            return True, f"Found {issues} inconsistencies; repaired.", report
+        return True, f"Found {issues} inconsistencies; run 'rag fsck --repair' to fix them.", report
@@ -1,5 +1,6 @@
-from typing import Tuple, Optional
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 import os
+from x1ayu_rag.config.kb_context import use_kb
 from x1ayu_rag.service.ingest_service import IngestService
 from x1ayu_rag.service.constants import IngestOp
 from x1ayu_rag.utils.path_utils import to_relative_path
@@ -22,58 +23,167 @@ class IngestAPI:
         """
         return self.service.list_documents()
 
-    def ingest_document(self, file_path: str) -> Tuple[bool, str, list]:
+    def list_documents_page(
+        self,
+        sort: str = "name",
+        descending: bool = False,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        query: Optional[str] = None,
+    ) -> Tuple[bool, str, List[Dict[str, Any]], Optional[str]]:
+        """分页获取文档列表 (附带分块数与分块文本字节数)
+
+        参数:
+            sort: 排序键 (name / path / created / chunks / size)
+            descending: 是否降序
+            limit: 每页行数
+            cursor: 上一页返回的游标
+            query: 名称或路径需包含的子串
+
+        返回:
+            (success, message, rows, next_cursor)
+        """
+        error = self._check_listing(sort, limit)
+        if error:
+            return False, error, [], None
+        try:
+            rows, next_cursor = self.service.list_documents_page(sort, descending, limit, cursor, query or None)
+        except ValueError as e:
+            return False, f"Error: {e}", [], None
+        return True, f"{len(rows)} documents", [self._to_row(r) for r in rows], next_cursor
+
+    def iter_documents(
+        self, sort: str = "name", descending: bool = False, query: Optional[str] = None
+    ) -> Tuple[bool, str, Iterator[Dict[str, Any]]]:
+        """流式获取全部匹配的文档
+
+        返回:
+            (success, message, rows): rows 为逐行产出的迭代器
+        """
+        error = self._check_listing(sort, 1)
+        if error:
+            return False, error, iter(())
+        rows = self.service.iter_documents(sort, descending, query or None)
+        return True, "", (self._to_row(r) for r in rows)
+
+    @staticmethod
+    def _check_listing(sort: str, limit: int) -> Optional[str]:
+        if sort not in IngestService.SORT_KEYS:
+            return f"Error: Unknown sort key '{sort}'. Expected one of: {', '.join(IngestService.SORT_KEYS)}."
+        if limit <= 0:
+            return "Error: --limit must be a positive integer."
+        return None
+
+    @staticmethod
+    def _to_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": row["name"],
+            "path": row["path"] or ".",
+            "uuid": row["uuid"],
+            "hash": row["hash"],
+            "created_at": row["created_at"],
+            "chunks": row["chunks"],
+            "size": row["size"],
+        }
+
+    def ingest_document(self, file_path: str, kb: Optional[str] = None) -> Tuple[bool, str, list]:
         """处理文档或目录摄取请求
 
         参数:
             file_path: 文件或目录路径
+            kb: 写入的知识库 (默认为当前知识库，须已建立，见 SystemAPI.ensure_kb)
 
         返回:
             (success, message, errors): 成功与否、提示信息及详细错误列表
         """
         # 1. 参数校验
+        abs_path, error = self.check_path(file_path)
+        if error:
+            return False, error, []
+        
+        # 2. 调用 Service (现在统一入口)
+        try:
+            with use_kb(kb):
+                op_type, result = self.service.ingest_document(abs_path)
+                success, message, results = self.format_result(op_type, result, file_path)
+                if success and op_type in (IngestOp.UPDATED, IngestOp.BATCH_RESULT):
+                    message = self._auto_compact(message)
+            return success, message, results
+        except Exception as e:
+            return False, f"Ingestion failed: {str(e)}", []
+
+    @staticmethod
+    def _auto_compact(message: str) -> str:
+        """更新后按 maintenance.auto_compact_ratio 自动压缩存储 (失败不影响摄取结果)"""
+        # 压缩服务依赖向量库 (numpy 等)，仅在摄取更新后加载，避免拖慢 rag show 等轻量命令的启动
+        from x1ayu_rag.service.compact_service import CompactService
+        if CompactService.auto_threshold() is None:
+            return message
+        try:
+            report = CompactService().auto_compact()
+        except Exception as e:
+            return f"{message} (auto-compaction failed: {e})"
+        if report is None:
+            return message
+        before, after = report["before"]["bytes"], report["after"]["bytes"]
+        return f"{message} Storage auto-compacted: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB."
+
+    def embedding_stats(self) -> dict:
+        """获取 Embedding 请求的吞吐与限流计数
+
+        返回:
+            dict: requests, texts, tokens, retries, throttled, splits, failures,
+            wait_seconds, active_seconds, texts_per_second, concurrency_limit
+        """
+        from x1ayu_rag.llm.factory import LLMFactory
+        return LLMFactory.embedding_stats()
+
+    @staticmethod
+    def check_path(file_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """校验摄取路径
+
+        返回:
+            (abs_path, error): 绝对路径，或错误信息
+        """
         if not file_path:
-            return False, "Error: File path cannot be empty.", []
+            return None, "Error: File path cannot be empty."
         
         # 检查存在性
         abs_path = os.path.abspath(file_path)
         if not os.path.exists(abs_path):
-            return False, f"Error: Path not found: {to_relative_path(abs_path)}", []
-        
-        # 2. 调用 Service (现在统一入口)
-        try:
-            op_type, result = self.service.ingest_document(abs_path)
+            return None, f"Error: Path not found: {to_relative_path(abs_path)}"
+        return abs_path, None
+
+    @staticmethod
+    def format_result(op_type: IngestOp, result, file_path: str) -> Tuple[bool, str, list]:
+        """将 Service 层结果转换为 (success, message, results)"""
+        if op_type == IngestOp.BATCH_RESULT:
+            # 目录递归结果
+            results = result # 现在的 result 是 list[tuple]
             
-            if op_type == IngestOp.BATCH_RESULT:
-                # 目录递归结果
-                results = result # 现在的 result 是 list[tuple]
-                
-                # 计算统计信息以供消息使用
-                count = len(results)
-                msg = f"Sync complete: Processed {count} items."
-                
-                return True, msg, results
-                
-            elif op_type == IngestOp.ERROR:
-                return False, f"Ingestion error: {result}", []
-            else:
-                # 单文件操作结果 (ADDED, UPDATED, SKIPPED)
-                # 统一包装成 list 格式
-                detail = str(result)
-                uuid_val = detail
-                if "UUID: " in detail:
-                    uuid_val = detail.split("UUID: ")[1].strip()
-                
-                action_map = {
-                    IngestOp.ADDED: "[added]",
-                    IngestOp.UPDATED: "[updated]",
-                    IngestOp.SKIPPED: "[skipped]"
-                }
-                action = action_map.get(op_type, "[unknown]")
-                
-                # 单文件模式下 file_path 可能是绝对路径，转为相对路径
-                rel_path = to_relative_path(file_path)
-                return True, f"Success: {result}", [(action, rel_path, uuid_val)]
-                
-        except Exception as e:
-            return False, f"Ingestion failed: {str(e)}", []
+            # 计算统计信息以供消息使用
+            count = len(results)
+            msg = f"Sync complete: Processed {count} items."
+            
+            return True, msg, results
+            
+        elif op_type == IngestOp.ERROR:
+            return False, f"Ingestion error: {result}", []
+        else:
+            # 单文件操作结果 (ADDED, UPDATED, SKIPPED)
+            # 统一包装成 list 格式
+            detail = str(result)
+            uuid_val = detail
+            if "UUID: " in detail:
+                uuid_val = detail.split("UUID: ")[1].strip()
+            
+            action_map = {
+                IngestOp.ADDED: "[added]",
+                IngestOp.UPDATED: "[updated]",
+                IngestOp.SKIPPED: "[skipped]"
+            }
+            action = action_map.get(op_type, "[unknown]")
+            
+            # 单文件模式下 file_path 可能是绝对路径，转为相对路径
+            rel_path = to_relative_path(file_path)
+            return True, f"Success: {result}", [(action, rel_path, uuid_val)]
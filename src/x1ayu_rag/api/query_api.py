@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence
+import json
 from x1ayu_rag.service.query_service import QueryService
 from x1ayu_rag.utils.path_utils import to_relative_path
 
@@ -40,34 +41,138 @@ class QueryAPI:
         # 格式化为 "filename (relative_path)" 供用户选择
         return [f"{doc.name} ({to_relative_path(doc.path)})" for doc in docs]
 
-    def search_chunks(self, query: str, top_k: int = 2) -> List[Dict[str, Any]]:
+    def search_chunks(
+        self,
+        query: str,
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        kbs: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
         """搜索分块并返回前端友好的数据结构
         
         参数:
             query: 搜索关键词
-            top_k: 返回数量
+            top_k: 最多返回数量
+            neighbors: 附带的同文档前后邻近分块数
+            max_distance: 丢弃 score 大于该值的结果
+            elbow: 分数断层截断阈值 (0~1)
+            mmr_lambda: 设置后启用 MMR 多样化 (1 为纯相关性，0 为纯多样性)
+            fetch_k: MMR 候选池大小
+            kbs: 检索的知识库，多个时并发检索并合并 (默认为当前知识库)
             
         返回:
-            List[Dict]: 包含 content, score, metadata 等信息的列表
+            List[Dict]: 包含 content, score (L2 距离平方，越小越相似), metadata 等信息的列表；
+                多知识库检索时 metadata 含来源 kb
         """
-        chunks = self.service.search_chunks(query, top_k)
-        results = []
-        for chunk in chunks:
-            if not chunk.lc_document:
-                continue
-            
-            # 提取元数据
-            meta = chunk.lc_document.metadata or {}
-            
-            results.append({
-                "content": chunk.lc_document.page_content,
-                "metadata": meta,
-                # 注意：ChunkRepository 返回的 LangChain Document 可能不包含 score
-                # 除非我们修改 search_chunks 返回 (doc, score) 元组
-                # Milvus 的 similarity_search 默认返回 docs
-                # similarity_search_with_score 返回 (doc, score)
-                # 目前 Repository 实现是 similarity_search，所以没有 score
-            })
-        return results
+        chunks = self.service.search_chunks(
+            query, top_k, neighbors=neighbors, max_distance=max_distance, elbow=elbow,
+            mmr_lambda=mmr_lambda, fetch_k=fetch_k, kbs=kbs,
+        )
+        return [self._to_result(chunk) for chunk in chunks if chunk.content is not None]
+
+    @staticmethod
+    def _to_result(chunk) -> Dict[str, Any]:
+        return {
+            "content": chunk.content,
+            "score": chunk.score,
+            "metadata": chunk.metadata,
+        }
+
+    def search_chunks_batch(
+        self,
+        queries: List[str],
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        kbs: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """批量搜索分块
+
+        参数:
+            queries: 查询列表
+            top_k: 每个查询最多返回的数量
+            neighbors: 附带的同文档前后邻近分块数
+            max_distance: 丢弃 score 大于该值的结果
+            elbow: 分数断层截断阈值 (0~1)
+            mmr_lambda: 设置后启用 MMR 多样化 (1 为纯相关性，0 为纯多样性)
+            fetch_k: MMR 候选池大小
+            kbs: 检索的知识库，多个时并发检索并合并 (默认为当前知识库)
+
+        返回:
+            List[List[Dict]]: 与 queries 一一对应，每项包含 content, score, metadata
+        """
+        batches = self.service.search_chunks_batch(
+            queries, top_k, neighbors=neighbors, max_distance=max_distance, elbow=elbow,
+            mmr_lambda=mmr_lambda, fetch_k=fetch_k, kbs=kbs,
+        )
+        return [
+            [self._to_result(chunk) for chunk in chunks if chunk.content is not None]
+            for chunks in batches
+        ]
+
+    def stream_batch_results(
+        self,
+        lines: Iterable[str],
+        top_k: int = 2,
+        batch_size: int = 256,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        kbs: Optional[Sequence[str]] = None,
+    ) -> Iterator[str]:
+        """逐批处理 JSONL 查询并流式产出 JSONL 结果
+
+        每行输入为 {"query": "...", "id": 可选} ，输出行保留 id 并附加 results。
+        无法解析的行输出带 error 字段的记录。
 
-    
+        参数:
+            lines: JSONL 文本行
+            top_k: 每个查询的返回数量
+            batch_size: 每批提交的查询数
+            neighbors: 附带的同文档前后邻近分块数
+            max_distance: 丢弃 score 大于该值的结果
+            elbow: 分数断层截断阈值 (0~1)
+            mmr_lambda: 设置后启用 MMR 多样化 (1 为纯相关性，0 为纯多样性)
+            fetch_k: MMR 候选池大小
+            kbs: 检索的知识库，多个时并发检索并合并 (默认为当前知识库)
+
+        返回:
+            Iterator[str]: JSONL 结果行 (不含换行符)
+        """
+        batch: List[Dict[str, Any]] = []
+
+        def _flush():
+            hits = self.search_chunks_batch(
+                [item["query"] for item in batch], top_k, neighbors, max_distance, elbow,
+                mmr_lambda, fetch_k, kbs,
+            )
+            for item, results in zip(batch, hits):
+                yield json.dumps({**item, "results": results}, ensure_ascii=False)
+            batch.clear()
+
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if isinstance(item, str):
+                    item = {"query": item}
+                if not isinstance(item, dict) or not isinstance(item.get("query"), str):
+                    raise ValueError("missing string field 'query'")
+            except ValueError as e:
+                yield json.dumps({"line": line.rstrip("\n"), "error": str(e)}, ensure_ascii=False)
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from _flush()
+        if batch:
+            yield from _flush()
@@ -0,0 +1,65 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from x1ayu_rag.service.reindex_service import ReindexService
+
+
+class ReindexAPI:
+    """重建索引 API 层
+
+    负责启动 / 继续影子集合重建、查询进度与取消任务。
+    """
+    def __init__(self):
+        self.service = ReindexService()
+
+    def start(self, background: bool = True) -> Tuple[bool, str, Dict[str, Any]]:
+        """创建 (或继续) 重建任务
+
+        参数:
+            background: 是否在后台进程中执行；为 False 时只创建任务，由调用方随后调用 run
+
+        返回:
+            (success, message, job)
+        """
+        try:
+            job = self.service.start()
+            if not background:
+                return True, "Reindex started.", job
+            pid = self.service.spawn_worker()
+            return True, f"Reindex running in the background (pid {pid}).", self.service.load_job()
+        except Exception as e:
+            return False, f"Reindex failed to start: {str(e)}", {}
+
+    def run(self, progress: Optional[Callable[[int, int], None]] = None) -> Tuple[bool, str, Dict[str, Any]]:
+        """在当前进程中执行任务直至切换
+
+        返回:
+            (success, message, report)
+        """
+        try:
+            report = self.service.run(progress=progress)
+            return True, "Switched to the reindexed collection.", report
+        except Exception as e:
+            return False, str(e), {}
+
+    def status(self) -> Tuple[bool, str, Dict[str, Any]]:
+        """查询当前集合与任务进度
+
+        返回:
+            (success, message, report)
+        """
+        try:
+            return True, "", self.service.status()
+        except Exception as e:
+            return False, f"Failed to read reindex status: {str(e)}", {}
+
+    def cancel(self) -> Tuple[bool, str]:
+        """放弃未完成的任务并删除影子集合
+
+        返回:
+            (success, message)
+        """
+        try:
+            if self.service.cancel():
+                return True, "Reindex cancelled and shadow collection removed."
+            return True, "No reindex in progress."
+        except Exception as e:
+            return False, f"Failed to cancel reindex: {str(e)}"
@@ -1,4 +1,4 @@
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, List, Optional
 from x1ayu_rag.service.system_service import SystemService
 from x1ayu_rag.config.app_config import update_config, load_config
 
@@ -40,6 +40,24 @@ class SystemAPI:
         """检查系统是否已初始化"""
         return self.service.is_initialized()
 
+    def ensure_kb(self, name: Optional[str]) -> Tuple[bool, str]:
+        """确保知识库已建立，不存在时创建 (默认知识库由 init 建立)
+
+        返回:
+            (success, message)
+        """
+        from x1ayu_rag.config.kb_context import use_kb
+        try:
+            with use_kb(name) as kb:
+                created = self.service.ensure_kb()
+            return True, f"Knowledge base '{kb}' created." if created else ""
+        except Exception as e:
+            return False, f"Failed to create knowledge base: {str(e)}"
+
+    def list_kbs(self) -> List[Dict[str, Any]]:
+        """已建立的知识库 (默认知识库在前)，每项包含 name, path, documents, chunks"""
+        return self.service.list_kbs()
+
     def get_config(self) -> Dict[str, Any]:
         """获取当前配置"""
         return load_config()
@@ -76,3 +94,10 @@ class SystemAPI:
             return True, ""
         except ValueError as e:
             return False, str(e)
+
+    def pending_model_change(self) -> Optional[Dict[str, Any]]:
+        """Embedding 模型变更后尚未重建索引时返回 {"collection": ..., "config": ...}"""
+        try:
+            return self.service.pending_model_change()
+        except Exception:
+            return None
@@ -0,0 +1,191 @@
+from __future__ import annotations
+import json
+import re
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+# 默认上下文 Token 预算
+DEFAULT_CONTEXT_TOKENS = 3000
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u30ff\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+class TokenCounter:
+    """Token 计数器
+
+    优先使用聊天模型自带的分词器 (get_num_tokens)，不可用时退化为估算：
+    CJK 字符按 1 token 计，其余字符按 4 字符 1 token 计。
+    传入 get_llm 时在首次计数时才取得聊天模型，不在构造时加载。
+    """
+
+    def __init__(self, llm=None, get_llm: Optional[Callable[[], Any]] = None):
+        self.llm = llm
+        self._get_llm = get_llm
+        self._use_llm = llm is not None or get_llm is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._use_llm and self.llm is None:
+            try:
+                self.llm = self._get_llm()
+            except Exception:
+                self._use_llm = False
+        if self._use_llm:
+            try:
+                with warnings.catch_warnings():
+                    # 回退到 GPT-2 分词器时 LangChain 会告警，计数仍可用于预算
+                    warnings.simplefilter("ignore")
+                    return self.llm.get_num_tokens(text)
+            except Exception:
+                # 分词器不可用 (如缺少 transformers)，后续均使用估算
+                self._use_llm = False
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+
+class ContextPacker:
+    """检索上下文打包器
+
+    将检索到的分块去重、按文档分组，渲染为紧凑的可引用格式，并裁剪到 Token 预算内：
+
+        《notes/a.md》
+        [3] 标题1 > 标题2
+        分块内容
+
+    分块按检索排名依次放入，超出预算的分块按行截断后停止。
+    每个分块 (及截断时的每一行) 只计数一次，预算按各部分的 token 数累加。
+    """
+
+    # 渲染时连接各部分的换行符按 1 token 计
+    SEPARATOR_TOKENS = 1
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None, max_tokens: int = DEFAULT_CONTEXT_TOKENS):
+        self.token_counter = token_counter or TokenCounter()
+        self.max_tokens = max_tokens
+
+    @staticmethod
+    def _doc_name(meta: Dict[str, Any]) -> str:
+        return f"{meta.get('dir_path') or ''}/{meta.get('file_name', '')}".lstrip("/")
+
+    @staticmethod
+    def _heading(mk_struct: Optional[str]) -> str:
+        try:
+            headers = json.loads(mk_struct or "{}")
+        except (TypeError, ValueError):
+            return ""
+        return " > ".join(str(v) for v in headers.values())
+
+    @staticmethod
+    def _label(chunk) -> str:
+        positions = (chunk.extra or {}).get("positions")
+        if positions and positions[0] != positions[1]:
+            return f"{positions[0]}-{positions[1]}"
+        return str(chunk.position)
+
+    def _dedup(self, chunks) -> List:
+        """去除完全相同的分块，以及被同文档其它分块包含的分块 (保留排名靠前者的位置)"""
+        kept: List = []
+        seen = set()
+        for chunk in chunks:
+            if chunk.content is None:
+                continue
+            content = chunk.content.strip()
+            key = " ".join(content.split())
+            if not key or key in seen:
+                continue
+            doc_name = self._doc_name(chunk.source)
+            contained = False
+            covered: List[int] = []
+            for i, other in enumerate(kept):
+                if self._doc_name(other.source) != doc_name:
+                    continue
+                if content in other.content:
+                    contained = True
+                    break
+                if other.content.strip() in content:
+                    covered.append(i)
+            seen.add(key)
+            if contained:
+                continue
+            if covered:
+                # 新分块覆盖了已保留的分块：替换排名最靠前者，移除其余被覆盖的分块
+                kept[covered[0]] = chunk
+                for i in reversed(covered[1:]):
+                    del kept[i]
+            else:
+                kept.append(chunk)
+        return kept
+
+    def _render(self, groups: Dict[str, List[tuple]]) -> str:
+        blocks = []
+        for doc_name, items in groups.items():
+            lines = [f"《{doc_name}》"]
+            for _, header, content in sorted(items, key=lambda item: item[0]):
+                lines.append(header)
+                lines.append(content)
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    def pack(self, chunks) -> tuple[str, Dict[str, Any]]:
+        """打包分块
+
+        参数:
+            chunks: 按排名排列的分块
+
+        返回:
+            (context, stats): 上下文文本及统计信息
+            stats 包含 chunks (输入数)、kept (保留数)、tokens (打包后)、
+            baseline_tokens (未打包的原 JSON 格式) 与 saved (节省的 token 数，可能为负)
+        """
+        count = self.token_counter.count
+        sep = self.SEPARATOR_TOKENS
+        groups: Dict[str, List[tuple]] = {}
+        kept = 0
+        total = 0
+        for chunk in self._dedup(chunks):
+            doc_name = self._doc_name(chunk.source)
+            heading = self._heading(chunk.mk_struct)
+            header = f"[{self._label(chunk)}] {heading}".rstrip()
+            content = chunk.content.strip()
+            # 新文档需要标题行及与上一文档之间的空行
+            cost = 0 if doc_name in groups else count(f"《{doc_name}》") + (2 * sep if groups else 0)
+            cost += count(header) + count(content) + 2 * sep
+            if total + cost <= self.max_tokens:
+                groups.setdefault(doc_name, []).append((chunk.position, header, content))
+                total += cost
+                kept += 1
+                continue
+            # 超出预算：按行截断当前分块 (保留能放下的最长前缀) 后停止
+            lines = content.split("\n")
+            budget = self.max_tokens - total - (cost - count(content)) - count("…") - sep
+            used, keep = 0, 0
+            for line in lines[:-1]:
+                used += count(line) + sep
+                if used > budget:
+                    break
+                keep += 1
+            if keep:
+                truncated = "\n".join(lines[:keep]) + "\n…"
+                groups.setdefault(doc_name, []).append((chunk.position, header, truncated))
+                kept += 1
+            break
+
+        context = self._render(groups)
+        stats = {"chunks": len(chunks), "kept": kept, "tokens": count(context)}
+        stats["baseline_tokens"] = count(self.format_json(chunks))
+        stats["saved"] = stats["baseline_tokens"] - stats["tokens"]
+        return context, stats
+
+    def format_json(self, chunks) -> str:
+        """旧版 JSON 上下文格式，用于统计节省的 token 数"""
+        formatted_docs = []
+        for chunk in chunks:
+            if chunk.content is None:
+                continue
+            formatted_docs.append({
+                "doc_name": self._doc_name(chunk.source),
+                "位置": chunk.mk_struct or "",
+                "content": chunk.content,
+            })
+        return json.dumps(formatted_docs, ensure_ascii=False, indent=2)
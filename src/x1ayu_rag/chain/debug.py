@@ -26,5 +26,11 @@ def get_debug_context_node() -> RunnableLambda:
             f"Docs Preview: {x.get('docs')[:200]}...\n"
             "=======================================================================================\n"
         )
+        stats = x.get("context_stats")
+        if stats:
+            print(
+                f"Context: {stats['kept']}/{stats['chunks']} chunks, {stats['tokens']} tokens "
+                f"(JSON baseline {stats['baseline_tokens']}, saved {stats['saved']})\n"
+            )
         return x
     return RunnableLambda(_print_context)
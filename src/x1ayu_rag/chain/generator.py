@@ -1,7 +1,34 @@
-from langchain_core.runnables import Runnable
+from typing import AsyncIterator, Iterator
+from langchain_core.runnables import Runnable, RunnableGenerator
 from langchain_core.output_parsers import StrOutputParser
 from x1ayu_rag.llm.factory import LLMFactory
 from x1ayu_rag.chain.prompt import get_prompt_node
+from x1ayu_rag.utils.metrics import PROVIDER_ERRORS
+from x1ayu_rag.utils.profiling import span
+
+
+def _count_error(error: Exception) -> None:
+    PROVIDER_ERRORS.inc(kind="chat", provider=LLMFactory.provider_name("chat"), error=type(error).__name__)
+
+
+def _observed(chunks: Iterator[str]) -> Iterator[str]:
+    with span("llm.generate"):
+        try:
+            yield from chunks
+        except Exception as e:
+            _count_error(e)
+            raise
+
+
+async def _aobserved(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    with span("llm.generate"):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            _count_error(e)
+            raise
+
 
 class Generator:
     """RAG 生成器组件
@@ -9,14 +36,21 @@ class Generator:
     负责构建 Prompt 和调用 LLM 生成回答。
     """
     
+    def __init__(self):
+        self._llm = None
+
     def get_llm(self):
-        """获取配置好的 LLM 实例"""
-        return LLMFactory.get_chat_model()
+        """获取配置好的 LLM 实例 (同一 Generator 内复用)"""
+        if self._llm is None:
+            self._llm = LLMFactory.get_chat_model()
+        return self._llm
 
     def as_runnable(self) -> Runnable:
         """返回生成部分的 Runnable (SysPrompt -> Prompt -> LLM -> Parser)"""
+        # 末尾的透传节点记录从发起请求到最后一个 token 的耗时，并统计提供商错误
         return (
             get_prompt_node()
             | self.get_llm() 
             | StrOutputParser()
+            | RunnableGenerator(_observed, _aobserved)
         )
@@ -1,6 +1,10 @@
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 from langchain_core.runnables import Runnable
 from x1ayu_rag.chain.retriever import Retriever
 from x1ayu_rag.chain.generator import Generator
+from x1ayu_rag.chain.context_packer import ContextPacker, TokenCounter, DEFAULT_CONTEXT_TOKENS
+from x1ayu_rag.config.app_config import load_config
 from x1ayu_rag.chain.debug import get_debug_model_info_node, get_debug_context_node
 
 class RAGChain:
@@ -10,18 +14,49 @@ class RAGChain:
     支持 debug 模式。
     """
     
-    def __init__(self):
-        self.retriever = Retriever()
+    def __init__(self, context_tokens: int = None, query_service=None):
+        """构造函数
+
+        参数:
+            context_tokens: 上下文 token 预算，默认读取 config.json 的 retrieval.context_tokens
+            query_service: 复用已有的 QueryService (可选)
+        """
         self.generator = Generator()
+        if context_tokens is None:
+            context_tokens = load_config().get("retrieval", {}).get("context_tokens", DEFAULT_CONTEXT_TOKENS)
+        # 使用聊天模型自身的分词器计量上下文预算 (首次计数时才加载聊天模型)
+        packer = ContextPacker(TokenCounter(get_llm=self.generator.get_llm), max_tokens=context_tokens)
+        self.retriever = Retriever(query_service=query_service, packer=packer)
+        # 最近一次 stream/astream 的统计，流结束后可用
+        self.last_stream_stats: Optional[Dict[str, Any]] = None
 
-    def get_chain(self, mode: str = None, k: int = 2) -> Runnable:
+    def get_chain(
+        self,
+        mode: str = None,
+        k: int = 2,
+        neighbors: int = 0,
+        max_distance: float = None,
+        elbow: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+        kbs: List[str] = None,
+    ) -> Runnable:
         """构建 RAG 链
         
         参数:
             mode: 'debug' 开启调试输出
-            k: 默认检索数量
+            k: 默认 (最大) 检索数量
+            neighbors: 邻近分块扩展窗口
+            max_distance: 距离阈值
+            elbow: 分数断层截断阈值
+            mmr_lambda: 设置后启用 MMR 多样化
+            fetch_k: MMR 候选池大小
+            kbs: 检索的知识库，多个时并发检索并合并
         """
-        retriever_node = self.retriever.as_runnable(default_k=k)
+        retriever_node = self.retriever.as_runnable(
+            default_k=k, neighbors=neighbors, max_distance=max_distance, elbow=elbow,
+            mmr_lambda=mmr_lambda, fetch_k=fetch_k, kbs=kbs,
+        )
         generator_node = self.generator.as_runnable()
         
         if mode == "debug":
@@ -35,3 +70,63 @@ class RAGChain:
             )
         else:
             return retriever_node | generator_node
+
+    def stream(self, question: str, mode: str = None, k: int = 2, user_prompt: str = "", **options) -> Iterator[str]:
+        """流式运行 RAG 链，逐段产出回答文本
+
+        流结束后 last_stream_stats 记录首 token 延迟与生成速度，见 _stream_stats。
+
+        参数:
+            question: 问题
+            mode: 'debug' 开启调试输出
+            k: 默认 (最大) 检索数量
+            user_prompt: 附加的用户提示
+            **options: 其余检索参数，同 get_chain
+        """
+        chain = self.get_chain(mode=mode, k=k, **options)
+        self.last_stream_stats = None
+        self.retriever.last_context_stats = None
+        start, first, parts = time.perf_counter(), None, []
+        for token in chain.stream({"question": question, "k": k, "user_prompt": user_prompt}):
+            if not token:
+                continue
+            if first is None:
+                first = time.perf_counter()
+            parts.append(token)
+            yield token
+        self.last_stream_stats = self._stream_stats("".join(parts), start, first, time.perf_counter())
+
+    async def astream(
+        self, question: str, mode: str = None, k: int = 2, user_prompt: str = "", **options
+    ) -> AsyncIterator[str]:
+        """stream 的异步版本"""
+        chain = self.get_chain(mode=mode, k=k, **options)
+        self.last_stream_stats = None
+        self.retriever.last_context_stats = None
+        start, first, parts = time.perf_counter(), None, []
+        async for token in chain.astream({"question": question, "k": k, "user_prompt": user_prompt}):
+            if not token:
+                continue
+            if first is None:
+                first = time.perf_counter()
+            parts.append(token)
+            yield token
+        self.last_stream_stats = self._stream_stats("".join(parts), start, first, time.perf_counter())
+
+    def _stream_stats(self, answer: str, start: float, first: Optional[float], end: float) -> Dict[str, Any]:
+        """统计流式输出
+
+        返回:
+            Dict: ttft (首 token 延迟，含检索，秒)、elapsed (总耗时)、
+            tokens (回答 token 数)、tokens_per_second (首 token 之后的生成速度)、
+            context (上下文统计，含打包节省的 token 数，见 ContextPacker.pack)
+        """
+        tokens = self.retriever.packer.token_counter.count(answer)
+        generation = end - first if first is not None else 0.0
+        return {
+            "ttft": first - start if first is not None else None,
+            "elapsed": end - start,
+            "tokens": tokens,
+            "tokens_per_second": tokens / generation if generation > 0 else None,
+            "context": self.retriever.last_context_stats,
+        }
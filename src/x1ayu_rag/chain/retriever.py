@@ -1,6 +1,9 @@
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Optional
 from x1ayu_rag.service.query_service import QueryService
+from x1ayu_rag.chain.context_packer import ContextPacker, TokenCounter, DEFAULT_CONTEXT_TOKENS
+from x1ayu_rag.config.app_config import load_config
+from x1ayu_rag.utils.metrics import CONTEXT_TOKENS
+from x1ayu_rag.utils.profiling import span
 from langchain_core.runnables import RunnableLambda
 
 class Retriever:
@@ -9,39 +12,95 @@ class Retriever:
     负责调用 QueryService 进行向量检索，并格式化结果供 LLM 使用。
     """
     
-    def __init__(self, query_service: QueryService = None):
+    def __init__(self, query_service: QueryService = None, packer: ContextPacker = None):
         self.query_service = query_service or QueryService()
+        if packer is None:
+            max_tokens = load_config().get("retrieval", {}).get("context_tokens", DEFAULT_CONTEXT_TOKENS)
+            packer = ContextPacker(TokenCounter(), max_tokens=max_tokens)
+        self.packer = packer
+        self._async_query_service = None
+        # 最近一次检索的上下文统计 (见 ContextPacker.pack)
+        self.last_context_stats: Optional[Dict[str, Any]] = None
 
-    def _format_docs(self, chunks) -> str:
-        """将检索到的 Chunk 列表格式化为 JSON 字符串"""
-        formatted_docs = []
-        for chunk in chunks:
-            if not chunk.lc_document:
-                continue
-                
-            doc = chunk.lc_document
-            meta = doc.metadata or {}
-            
-            doc_info = {
-                "doc_name": f"{meta.get('dir_path', '')}/{meta.get('file_name', '')}".lstrip('/'),
-                "位置": meta.get("mk_struct", ""),
-                "content": doc.page_content,
-            }
-            formatted_docs.append(doc_info)
-            
-        return json.dumps(formatted_docs, ensure_ascii=False, indent=2)
-
-    def as_runnable(self, default_k: int = 2):
-        """返回 LangChain Runnable 对象"""
-        return RunnableLambda(
-            lambda x: {
-                "question": x["question"],
-                "docs": self._format_docs(
-                    self.query_service.search_chunks(
-                        x["question"], 
-                        top_k=x.get("k", default_k)
-                    )
-                ),
-                "user_prompt": x.get("user_prompt", "")
-            }
-        )
+    @property
+    def async_query_service(self):
+        """异步调用链时使用的查询服务 (与同步路径共享 QueryService)"""
+        if self._async_query_service is None:
+            from x1ayu_rag.service.async_query_service import AsyncQueryService
+            self._async_query_service = AsyncQueryService(self.query_service)
+        return self._async_query_service
+
+    def _format_docs(self, chunks) -> tuple[str, Dict[str, Any]]:
+        """将检索到的 Chunk 列表打包为紧凑的上下文文本，并记录打包前后的 token 数
+
+        返回:
+            (context, stats): 上下文及 token 统计 (见 ContextPacker.pack)
+        """
+        with span("context.pack"):
+            docs, stats = self.packer.pack(chunks)
+        CONTEXT_TOKENS.inc(stats["tokens"], format="packed")
+        CONTEXT_TOKENS.inc(stats["baseline_tokens"], format="json")
+        self.last_context_stats = stats
+        return docs, stats
+
+    def _retrieve(self, x: Dict[str, Any], default_k: int, neighbors: int, options: Dict[str, Any]) -> Dict[str, Any]:
+        with span("retrieve"):
+            chunks = self.query_service.search_chunks(
+                x["question"],
+                top_k=x.get("k", default_k),
+                neighbors=x.get("neighbors", neighbors),
+                # 输入中的同名字段优先于构建链时的默认值
+                **{key: x.get(key, value) for key, value in options.items()},
+            )
+        return self._build_output(x, chunks)
+
+    async def _aretrieve(
+        self, x: Dict[str, Any], default_k: int, neighbors: int, options: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        with span("retrieve"):
+            chunks = await self.async_query_service.search_chunks(
+                x["question"],
+                top_k=x.get("k", default_k),
+                neighbors=x.get("neighbors", neighbors),
+                **{key: x.get(key, value) for key, value in options.items()},
+            )
+        return self._build_output(x, chunks)
+
+    def _build_output(self, x: Dict[str, Any], chunks) -> Dict[str, Any]:
+        docs, stats = self._format_docs(chunks)
+        return {
+            "question": x["question"],
+            "docs": docs,
+            "context_stats": stats,
+            "user_prompt": x.get("user_prompt", "")
+        }
+
+    def as_runnable(
+        self,
+        default_k: int = 2,
+        neighbors: int = 0,
+        max_distance: float = None,
+        elbow: float = None,
+        mmr_lambda: float = None,
+        fetch_k: int = None,
+        kbs: List[str] = None,
+    ):
+        """返回 LangChain Runnable 对象
+
+        参数:
+            default_k: 默认 (最大) 检索数量
+            neighbors: 为每个命中附带的同文档前后邻近分块数
+            max_distance: 距离阈值，超过的分块不进入 Prompt
+            elbow: 分数断层截断阈值 (0~1)
+            mmr_lambda: 设置后启用 MMR 多样化
+            fetch_k: MMR 候选池大小
+            kbs: 检索的知识库，多个时并发检索并合并 (默认为当前知识库)
+        """
+        options = {
+            "max_distance": max_distance, "elbow": elbow, "mmr_lambda": mmr_lambda, "fetch_k": fetch_k, "kbs": kbs,
+        }
+
+        async def _aretrieve(x):
+            return await self._aretrieve(x, default_k, neighbors, options)
+
+        return RunnableLambda(lambda x: self._retrieve(x, default_k, neighbors, options), afunc=_aretrieve)
@@ -1,18 +1,27 @@
 import click
+import os
 import sys
 from functools import wraps
 from rich.console import Console
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.live import Live
+from rich.spinner import Spinner
+from rich.text import Text
 from rich import box
-from x1ayu_rag.api.ingest_api import IngestAPI
 from x1ayu_rag.api.system_api import SystemAPI
-from x1ayu_rag.cli.ui import main_config_menu
-from x1ayu_rag.cli.decorators import require_init, require_chat_config, require_embedding_config
+from x1ayu_rag.cli.decorators import (
+    kb_option, kbs_option, require_init, require_chat_config, require_embedding_config, warn_model_change,
+)
 
 console = Console()
 system_api = SystemAPI()
 
+def _connect_daemon():
+    """连接运行中的常驻服务，未运行时返回 None (客户端在用到时才导入，不拖慢启动)"""
+    from x1ayu_rag.daemon.client import DaemonClient
+    return DaemonClient.connect()
+
 def _init_env():
     """初始化 RAG 运行环境（创建目录并初始化数据库）"""
     with Progress(
@@ -31,30 +40,88 @@ def _init_env():
             pass
 
 @click.group()
-def cli():
+@click.option('--profile', is_flag=True, help="退出时输出各阶段耗时统计")
+@click.option('--trace', 'trace_file', type=click.Path(dir_okay=False), help="写出 Chrome trace-event 文件 (隐含 --profile)")
+@click.option('--cprofile', 'cprofile_file', type=click.Path(dir_okay=False), help="写出 cProfile 统计文件 (隐含 --profile)")
+@click.option('--metrics-file', type=click.Path(dir_okay=False), help="退出时写出 Prometheus 文本格式指标 (供 node_exporter textfile collector)")
+@click.pass_context
+def cli(ctx, profile, trace_file, cprofile_file, metrics_file):
     """x1ayu RAG"""
-    pass
+    if profile or trace_file or cprofile_file:
+        _start_profiling(ctx, trace_file, cprofile_file)
+    if metrics_file:
+        # 在本进程中执行，指标才能反映本次命令
+        os.environ["RAG_NO_DAEMON"] = "1"
+        ctx.call_on_close(lambda: _write_metrics(metrics_file))
+
+
+def _write_metrics(path):
+    from x1ayu_rag.utils.metrics import MetricsRegistry
+    try:
+        MetricsRegistry.write_textfile(path)
+    except OSError as e:
+        Console(stderr=True).print(f"[red]Error: Cannot write metrics file: {e}[/red]")
+
+
+def _start_profiling(ctx, trace_file, cprofile_file):
+    """启用分阶段计时，并在命令结束时输出统计"""
+    from x1ayu_rag.utils.profiling import Profiler
+    # 在本进程中执行，常驻服务内的耗时无法计入
+    os.environ["RAG_NO_DAEMON"] = "1"
+    Profiler.enable()
+    profiler = None
+    if cprofile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def _report():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_file)
+        Profiler.disable()
+        rows = Profiler.summary()
+        table = Table(title=f"Profile ({Profiler.elapsed_ms():.0f} ms)", box=box.ROUNDED)
+        for column in ["Stage", "Count", "Total", "p50", "p95"]:
+            table.add_column(column, justify="left" if column == "Stage" else "right")
+        for r in rows:
+            table.add_row(
+                r["name"], str(r["count"]), f"{r['total_ms']:.1f} ms",
+                f"{r['p50_ms']:.2f} ms", f"{r['p95_ms']:.2f} ms",
+            )
+        err_console = Console(stderr=True)
+        err_console.print(table)
+        if trace_file:
+            Profiler.write_trace(trace_file)
+            err_console.print(f"[dim]Trace written to {trace_file}[/dim]")
+        if cprofile_file:
+            err_console.print(f"[dim]cProfile stats written to {cprofile_file}[/dim]")
+
+    ctx.call_on_close(_report)
 
 @cli.command()
-@click.option('--chat-provider', type=click.Choice(["ollama", "openai"]), help="聊天模型提供商")
+@click.option('--chat-provider', type=click.Choice(["ollama", "openai", "echo"]), help="聊天模型提供商 (echo 为离线回显模型)")
 @click.option('--chat-model', help="聊天模型名称")
 @click.option('--chat-base-url', help="聊天模型基础 URL")
 @click.option('--chat-api-key', help="聊天模型 API 密钥")
-@click.option('--emb-provider', type=click.Choice(["ollama", "openai"]), help="Embedding 模型提供商")
+@click.option('--emb-provider', type=click.Choice(["ollama", "openai", "hash"]), help="Embedding 模型提供商 (hash 为离线特征哈希)")
 @click.option('--emb-model', help="Embedding 模型名称")
 @click.option('--emb-base-url', help="Embedding 模型基础 URL")
 @click.option('--emb-api-key', help="Embedding 模型 API 密钥")
+@click.option('--vector-backend', type=click.Choice(["milvus", "numpy"]), help="向量库后端")
 def init(chat_provider, chat_model, chat_base_url, chat_api_key, 
-         emb_provider, emb_model, emb_base_url, emb_api_key):
+         emb_provider, emb_model, emb_base_url, emb_api_key, vector_backend):
     """初始化 RAG 环境并配置模型。"""
     _init_env()
     
     # 如果提供了任何标志，则对这些部分使用非交互模式
     # 否则，进入交互模式
     is_interactive = not any([chat_provider, chat_model, chat_base_url, chat_api_key,
-                            emb_provider, emb_model, emb_base_url, emb_api_key])
+                            emb_provider, emb_model, emb_base_url, emb_api_key,
+                            vector_backend])
     
     if is_interactive:
+        from x1ayu_rag.cli.ui import main_config_menu
         # 直接进入配置菜单，不再询问
         main_config_menu(startup_message="[green]✓ RAG 环境初始化完成。[/green]")
         
@@ -83,6 +150,8 @@ def init(chat_provider, chat_model, chat_base_url, chat_api_key,
                 "base_url": emb_base_url,
                 "api_key": emb_api_key,
             }
+        if vector_backend:
+            updates["vector"] = {"backend": vector_backend}
         
         system_api.update_configuration(updates)
         console.print("[green]模型配置已保存。[/green]")
@@ -92,6 +161,7 @@ def init(chat_provider, chat_model, chat_base_url, chat_api_key,
 @require_init
 def config():
     """管理系统配置"""
+    from x1ayu_rag.cli.ui import main_config_menu
     # 默认行为：进入交互式配置更新
     main_config_menu()
 
@@ -99,11 +169,20 @@ def config():
 @cli.command()
 @click.argument('file_path')
 @require_init
+@kb_option(create=True)
 @require_embedding_config
+@warn_model_change
 def add(file_path):
-    """添加文档"""
-    api = IngestAPI()
-    success, message, results = api.ingest_document(file_path)
+    """添加文档 (--kb 指定的知识库不存在时自动创建)"""
+    from x1ayu_rag.config.kb_context import current_kb
+    api = _connect_daemon()
+    if api is None:
+        from x1ayu_rag.api.ingest_api import IngestAPI
+        api = IngestAPI()
+    before = api.embedding_stats()
+    success, message, results = api.ingest_document(file_path, kb=current_kb())
+    from x1ayu_rag.llm.rate_limit import stats_delta
+    stats = stats_delta(before, api.embedding_stats())
     if success:
         if results:
             for action, path, detail in results:
@@ -123,50 +202,144 @@ def add(file_path):
                     elif "skipped" in action: color = "dim blue"
                     
                     console.print(f"[{color}]{safe_action}[/{color}] {safe_path} {detail}")
+            if "auto-compact" in message:
+                console.print(f"[dim]{escape(message)}[/dim]")
         else:
             click.echo(click.style(message, fg='green'))
     else:
         click.echo(message)
+    if stats["requests"] or stats["failures"]:
+        console.print(
+            f"[dim]Embedding: {stats['texts']} texts / {stats['requests']} requests, "
+            f"{stats['texts_per_second']} texts/s, throttled {stats['throttled']}, "
+            f"retries {stats['retries']}, splits {stats['splits']}, "
+            f"concurrency {stats['concurrency_limit']}[/dim]"
+        )
 
 @cli.command()
+@click.option('--sort', type=click.Choice(["name", "path", "created", "chunks", "size"]), default="name", help="排序键")
+@click.option('--desc', 'descending', is_flag=True, help="降序")
+@click.option('--limit', type=int, help="每页行数 (表格默认 50；jsonl / csv 默认输出全部)")
+@click.option('--cursor', help="从上一页输出的游标处继续")
+@click.option('-s', '--search', help="只列出名称或路径包含该子串的文档")
+@click.option('--format', 'output_format', type=click.Choice(["table", "jsonl", "csv"]), default="table",
+              help="输出格式 (jsonl / csv 逐行流式输出全部匹配的文档)")
 @require_init
-def show():
-    """列出所有已摄取的文档"""
+@kb_option()
+def show(sort, descending, limit, cursor, search, output_format):
+    """列出已摄取的文档 (分页，附带分块数与大小)"""
+    from x1ayu_rag.api.ingest_api import IngestAPI
     api = IngestAPI()
-    docs = api.list_documents()
-    
-    if not docs:
-        console.print("[yellow]暂无已摄取文档。使用 'rag add <file/dir>' 添加文档。[/yellow]")
+
+    if output_format != "table" and limit is None and not cursor:
+        success, message, rows = api.iter_documents(sort, descending, search)
+        if not success:
+            console.print(f"[red]{message}[/red]")
+            sys.exit(2)
+        _write_rows(rows, output_format)
+        return
+
+    success, message, rows, next_cursor = api.list_documents_page(sort, descending, limit or 50, cursor, search)
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(2)
+    if output_format != "table":
+        _write_rows(iter(rows), output_format)
+        if next_cursor:
+            click.echo(f"Next page: --cursor {next_cursor}", err=True)
+        return
+
+    if not rows and not cursor:
+        if search:
+            console.print(f"[yellow]没有名称或路径包含 '{search}' 的文档。[/yellow]")
+        else:
+            console.print("[yellow]暂无已摄取文档。使用 'rag add <file/dir>' 添加文档。[/yellow]")
         return
 
     table = Table(title="文档", box=box.ROUNDED)
     table.add_column("Filename", style="cyan")
     table.add_column("Path", style="dim")
+    table.add_column("Chunks", justify="right")
+    table.add_column("Size", justify="right")
     table.add_column("UUID", style="green")
     table.add_column("Hash", style="dim")
     
-    for doc in docs:
+    for row in rows:
         table.add_row(
-            doc.name,
-            doc.path or ".",
-            doc.uuid,
-            doc.hash[:8] + "..." if doc.hash else "N/A"
+            row["name"],
+            row["path"],
+            str(row["chunks"]),
+            _format_size(row["size"]),
+            row["uuid"],
+            row["hash"][:8] + "..." if row["hash"] else "N/A"
         )
         
     console.print(table)
-    console.print(f"\n[dim]Total: {len(docs)} documents[/dim]")
+    if next_cursor:
+        console.print(f"\n[dim]Showing {len(rows)} documents. Next page: rag show --sort {sort}"
+                      f"{' --desc' if descending else ''}{f' --limit {limit}' if limit else ''} --cursor {next_cursor}[/dim]",
+                      soft_wrap=True)
+    else:
+        console.print(f"\n[dim]Showing {len(rows)} documents[/dim]")
+
+
+def _format_size(size):
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
 
+def _write_rows(rows, output_format):
+    """逐行写出文档列表 (jsonl / csv)"""
+    import json
+    columns = ["name", "path", "uuid", "hash", "created_at", "chunks", "size"]
+    if output_format == "csv":
+        import csv
+        writer = csv.DictWriter(sys.stdout, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    else:
+        for row in rows:
+            sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
 
 @cli.command()
-@click.argument('query')
+@click.argument('query', required=False)
 @click.option('-k', default=2, help="相似结果数量")
+@click.option('-n', '--neighbors', default=0, help="附带命中分块前后各 N 个邻近分块")
+@click.option('--max-distance', type=float, help="距离阈值，丢弃 score 大于该值的结果")
+@click.option('--elbow', type=float, help="分数断层截断阈值 (0~1)，尾部明显不相关时缩小 k")
+@click.option('--mmr-lambda', type=float, help="启用 MMR 多样化并设置 λ (1 为纯相关性，0 为纯多样性)")
+@click.option('--fetch-k', type=int, help="MMR 候选池大小 (默认 4*k，至少 20)")
+@click.option('--batch', 'batch_file', type=click.File('r', encoding='utf-8'),
+              help="批量查询 JSONL 文件 (每行 {\"query\": ...}，- 表示标准输入)，结果以 JSONL 输出")
 @require_init
+@kbs_option
 @require_embedding_config
-def select(query, k):
+@warn_model_change
+def select(query, k, neighbors, max_distance, elbow, mmr_lambda, fetch_k, batch_file, kbs):
     """查询相关分块"""
-    from x1ayu_rag.api.query_api import QueryAPI
-    api = QueryAPI()
-    results = api.search_chunks(query, k)
+    api = _connect_daemon()
+    if api is None:
+        from x1ayu_rag.api.query_api import QueryAPI
+        api = QueryAPI()
+
+    if batch_file:
+        lines = api.stream_batch_results(
+            batch_file, top_k=k, neighbors=neighbors, max_distance=max_distance, elbow=elbow,
+            mmr_lambda=mmr_lambda, fetch_k=fetch_k, kbs=kbs,
+        )
+        for line in lines:
+            click.echo(line)
+        return
+    if not query:
+        raise click.UsageError("Missing argument 'QUERY' (or use --batch).")
+
+    results = api.search_chunks(
+        query, k, neighbors=neighbors, max_distance=max_distance, elbow=elbow,
+        mmr_lambda=mmr_lambda, fetch_k=fetch_k, kbs=kbs,
+    )
     
     if not results:
         console.print("[yellow]未找到相关分块。[/yellow]")
@@ -183,7 +356,13 @@ def select(query, k):
         path_info = f"{dir_path}/{file_name}" if dir_path else file_name
         
         console.print(f"\n[bold cyan]Result #{i}[/bold cyan]")
+        if kbs and len(kbs) > 1:
+            console.print(f"[green]KB:[/green] {meta.get('kb')}")
         console.print(f"[green]File:[/green] {path_info}")
+        if res["score"] is not None:
+            normalized = meta.get("normalized_score")
+            suffix = f", normalized {normalized:.4f}" if normalized is not None else ""
+            console.print(f"[magenta]Score:[/magenta] {res['score']:.4f} (L2{suffix})")
         if mk_struct:
              console.print(f"[blue]Structure:[/blue] {mk_struct}")
         console.print("-" * 40)
@@ -195,29 +374,480 @@ def select(query, k):
 @click.argument('query')
 @click.option('-m', '--mode', type=click.Choice(["debug"]), help="RAG 链模式")
 @click.option('-k', default=2, help="前 K 个相似块")
+@click.option('-n', '--neighbors', default=0, help="附带命中分块前后各 N 个邻近分块")
+@click.option('--context-tokens', type=int, help="上下文 token 预算 (默认读取配置 retrieval.context_tokens)")
+@click.option('--max-distance', type=float, help="距离阈值，超过的分块不进入 Prompt")
+@click.option('--elbow', type=float, help="分数断层截断阈值 (0~1)")
+@click.option('--mmr-lambda', type=float, help="启用 MMR 多样化并设置 λ (1 为纯相关性，0 为纯多样性)")
+@click.option('--fetch-k', type=int, help="MMR 候选池大小 (默认 4*k，至少 20)")
 @require_init
+@kbs_option
 @require_embedding_config
+@warn_model_change
 @require_chat_config
-def chain(query, mode, k):
+def chain(query, mode, k, neighbors, context_tokens, max_distance, elbow, mmr_lambda, fetch_k, kbs):
     """使用查询运行 RAG 链。"""
     try:
-        from x1ayu_rag.chain.rag_chain import RAGChain
-        
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            transient=True,
-        ) as progress:
-            task = progress.add_task(description="思考中...", total=None)
-            
-            rag = RAGChain()
-            chain_instance = rag.get_chain(mode=mode, k=k)
-            result = chain_instance.invoke({"question": query, "k": k})
-            
-        console.print("\n[bold green]================ 链执行结果 ================[/bold green]")
-        console.print(result)
+        options = dict(
+            k=k, neighbors=neighbors, max_distance=max_distance, elbow=elbow,
+            mmr_lambda=mmr_lambda, fetch_k=fetch_k, kbs=kbs,
+        )
+        # debug 输出在链执行进程中打印，因此 debug 模式总是在本地运行
+        client = _connect_daemon() if mode != "debug" else None
+        if client is not None:
+            rag = client
+            tokens = client.stream_chain(query, context_tokens=context_tokens, **options)
+        else:
+            from x1ayu_rag.chain.rag_chain import RAGChain
+            rag = RAGChain(context_tokens=context_tokens)
+            tokens = rag.stream(query, mode=mode, **options)
+        answer = Text()
+        # 首个 token 到达前显示等待动画，之后实时渲染回答
+        with Live(Spinner("dots", text="思考中..."), console=console, refresh_per_second=12) as live:
+            for token in tokens:
+                if not answer:
+                    console.print("\n[bold green]================ 链执行结果 ================[/bold green]")
+                    live.update(answer)
+                answer.append(token)
+                live.refresh()
+        if not console.is_terminal:
+            # 非终端输出时 Live 不会在结尾换行
+            console.print()
+
+        stats = rag.last_stream_stats
+        context = (stats or {}).get("context")
+        if context and mode != "debug":
+            console.print(
+                f"\n[dim]Context {context['tokens']} tokens, saved {context['saved']} "
+                f"vs. JSON ({context['baseline_tokens']})[/dim]"
+            )
+        if mode == "debug" and stats and stats["ttft"] is not None:
+            speed = f"{stats['tokens_per_second']:.1f} tokens/s" if stats["tokens_per_second"] else "n/a"
+            console.print(
+                f"\n[dim]TTFT {stats['ttft']:.2f}s, {stats['tokens']} tokens in "
+                f"{stats['elapsed']:.2f}s, {speed}[/dim]"
+            )
         
     except Exception as e:
         # 其他未预料的错误
         console.print(f"[red]Error executing chain:[/red] {str(e)}")
 
+
+
+@cli.command()
+@click.option('--method', type=click.Choice(["pca", "truncate", "none"]), default="pca", help="降维方式 (none 表示恢复原始维度)")
+@click.option('--dim', type=int, help="目标维度")
+@click.option('--index-type', type=click.Choice(["FLAT", "IVF_FLAT", "IVF_SQ8", "HNSW"]), default="FLAT", help="向量索引类型")
+@click.option('--sample', default=200, help="评估召回率的样本查询数")
+@require_init
+@kb_option()
+@require_embedding_config
+def compress(method, dim, index_type, sample):
+    """压缩向量集合（降维 / 量化索引）"""
+    from x1ayu_rag.api.compression_api import CompressionAPI
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        transient=True,
+    ) as progress:
+        progress.add_task(description="正在压缩向量集合...", total=None)
+        success, message, report = CompressionAPI().compress(
+            method=method,
+            dim=dim,
+            index_type=index_type,
+            sample_size=sample,
+        )
+
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        return
+
+    table = Table(title="向量压缩", box=box.ROUNDED)
+    table.add_column("Item", style="cyan")
+    table.add_column("Before", style="dim")
+    table.add_column("After", style="green")
+    table.add_row("Vectors", str(report["vectors"]), str(report["vectors"]))
+    table.add_row("Dim", str(report["dim_before"]), str(report["dim_after"]))
+    table.add_row("Index", report["index_before"], report["index_after"])
+    table.add_row(
+        "Memory",
+        f"{report['bytes_before'] / 1024:.1f} KiB",
+        f"{report['bytes_after'] / 1024:.1f} KiB",
+    )
+    console.print(table)
+    console.print(f"[green]内存节省:[/green] {report['memory_saved']:.1%}")
+    if report["recall"] is not None:
+        console.print(
+            f"[green]Recall@{report['k']}:[/green] {report['recall']:.3f} "
+            f"(召回损失 {1 - report['recall']:.1%})"
+        )
+
+
+@cli.command()
+@click.option('--status', 'show_status', is_flag=True, help="查看当前集合的模型与重建进度")
+@click.option('--cancel', is_flag=True, help="放弃未完成的重建并删除影子集合")
+@click.option('--foreground', is_flag=True, help="在当前进程中执行并显示进度 (默认在后台执行)")
+@click.option('--worker', is_flag=True, hidden=True)
+@require_init
+@kb_option()
+def reindex(show_status, cancel, foreground, worker):
+    """按 config.json 中的 Embedding 模型重建向量集合 (写入影子集合，完成后原子切换，期间检索照常)"""
+    from x1ayu_rag.api.reindex_api import ReindexAPI
+    api = ReindexAPI()
+
+    if show_status:
+        success, message, report = api.status()
+        if not success:
+            console.print(f"[red]{message}[/red]")
+            sys.exit(1)
+        _print_reindex_status(report)
+        return
+    if cancel:
+        success, message = api.cancel()
+        console.print(f"[{'green' if success else 'red'}]{message}[/]")
+        sys.exit(0 if success else 1)
+    if worker:
+        # 后台进程：输出写入 reindex.log
+        success, message, report = api.run()
+        click.echo(message if not success else f"{message} {report['embedded']} chunks in {report['seconds']:.1f}s")
+        sys.exit(0 if success else 1)
+
+    success, message = system_api.validate_embedding_config()
+    if not success:
+        console.print(f"{message}")
+        sys.exit(1)
+    success, message, job = api.start(background=not foreground)
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(1)
+    if not foreground:
+        console.print(f"[green]{message}[/green]")
+        console.print(f"[dim]{job['source']} -> {job['identity']}; progress: rag reindex --status[/dim]")
+        return
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        TextColumn("{task.completed}/{task.total}"),
+        transient=True,
+    ) as progress:
+        task = progress.add_task("正在重建索引...", total=job["total"], completed=job["done"])
+        success, message, report = api.run(
+            progress=lambda done, total: progress.update(task, completed=done, total=total)
+        )
+    if not success:
+        console.print(f"[red]{message}[/red] [dim](rerun 'rag reindex' to resume)[/dim]")
+        sys.exit(1)
+    console.print(f"[green]{message}[/green]")
+    console.print(
+        f"[dim]{report['embedded']} chunks embedded, {report['added']} added and {report['removed']} removed "
+        f"during catch-up, {report['seconds']:.1f}s; collection {report['collection']['location']}[/dim]"
+    )
+
+
+def _print_reindex_status(report):
+    collection = report["collection"]
+    console.print(f"Collection: {collection['location']} ({collection['backend']}) {collection['identity']}")
+    if not report["up_to_date"]:
+        console.print(f"[yellow]config.json: {report['config']} (run 'rag reindex' to migrate)[/yellow]")
+    job = report["job"]
+    if job is None:
+        console.print("[dim]No reindex in progress.[/dim]")
+        return
+    percent = job["done"] / job["total"] * 100 if job["total"] else 100.0
+    line = f"Reindex: {job['identity']} -> {job['location']}, {job['done']}/{job['total']} ({percent:.0f}%), {job['status']}"
+    if job["running"]:
+        line += f" (pid {job['pid']})"
+    console.print(line)
+    if job["error"]:
+        console.print(f"[red]{job['error']}[/red]")
+    if not job["running"]:
+        console.print("[dim]Run 'rag reindex' to resume or 'rag reindex --cancel' to discard.[/dim]")
+
+
+@cli.command()
+@click.option('--repair', is_flag=True, help="修复发现的问题 (删除孤立项，只为缺少向量的分块重新嵌入)")
+@click.option('--force', is_flag=True, help="多数文档的源文件缺失时仍然删除这些文档 (默认保留)")
+@require_init
+@kb_option()
+@require_embedding_config
+def fsck(repair, force):
+    """检查 SQLite 与向量库的一致性 (孤立向量、缺少向量的分块、源文件已删除的文档)"""
+    if _connect_daemon() is not None:
+        console.print("[red]Error: Stop the running daemon ('rag serve --stop') before running fsck.[/red]")
+        sys.exit(1)
+    from x1ayu_rag.api.fsck_api import FsckAPI
+    with console.status("正在检查...") as status:
+        success, message, report = FsckAPI().check(
+            repair=repair, progress=lambda stage: status.update(f"{stage}..."), force=force
+        )
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(2)
+
+    console.print(
+        f"[dim]{report['documents']} documents, {report['chunks']} chunks, "
+        f"{report['vectors']} vectors scanned in {report['seconds']:.2f}s[/dim]"
+    )
+    table = Table(title="一致性检查", box=box.ROUNDED)
+    table.add_column("Issue", style="cyan")
+    table.add_column("Found", justify="right")
+    if repair:
+        table.add_column("Repaired", justify="right")
+    table.add_column("Examples", style="dim")
+    repaired = report["repaired"] or {}
+    issues = [
+        ("vanished_documents", "源文件已删除的文档"),
+        ("dangling_chunks", "所属文档不存在的分块"),
+        ("orphan_vectors", "孤立向量"),
+        ("missing_vectors", "缺少向量的分块"),
+        ("lost_chunks", "无文本且无向量的分块"),
+    ]
+    for key, label in issues:
+        found = report[key]
+        cells = [label, f"[{'red' if found else 'green'}]{found}[/]"]
+        if repair:
+            done = repaired.get("reingested_documents" if key == "lost_chunks" else key, 0)
+            cells.append(f"{done} docs re-ingested" if key == "lost_chunks" and found else str(done))
+        samples = report["samples"][key]
+        cells.append(", ".join(samples[:3]) + (" ..." if found > 3 else ""))
+        table.add_row(*cells)
+    console.print(table)
+    found = report["issues"]
+    console.print(f"[{'green' if not found or (repair and not report['vanished_kept']) else 'yellow'}]{message}[/]")
+    if found and not repair:
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--threshold', type=float, help="只在删除比例 (向量库已删除记录或 SQLite 空闲页) 达到该值时压缩，如 0.2")
+@require_init
+@kb_option()
+@require_embedding_config
+def compact(threshold):
+    """压缩存储：合并向量段、重建向量索引、VACUUM / ANALYZE SQLite，并报告前后大小与检索延迟"""
+    if _connect_daemon() is not None:
+        console.print("[red]Error: Stop the running daemon ('rag serve --stop') before running compact.[/red]")
+        sys.exit(1)
+    from x1ayu_rag.api.compact_api import CompactAPI
+    with console.status("正在压缩...") as status:
+        success, message, report = CompactAPI().compact(
+            threshold=threshold, progress=lambda stage: status.update(f"{stage}...")
+        )
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(2)
+    if not report:
+        console.print(f"[dim]{message}[/dim]")
+        return
+
+    def _ratio(value):
+        return "-" if value is None else f"{value:.1%}"
+
+    def _latency(value):
+        return "-" if value is None else f"{value:.2f} ms"
+
+    before, after = report["before"], report["after"]
+    table = Table(title="存储压缩", box=box.ROUNDED)
+    table.add_column("Metric", style="cyan")
+    table.add_column("Before", justify="right")
+    table.add_column("After", justify="right")
+    rows = [
+        ("目录大小", _format_size(before["bytes"]), _format_size(after["bytes"])),
+        ("向量数", str(before["vectors"]), str(after["vectors"])),
+        ("已删除向量比例", _ratio(before["deleted_ratio"]), _ratio(after["deleted_ratio"])),
+        ("SQLite 空闲页比例", _ratio(before["sqlite_free_ratio"]), _ratio(after["sqlite_free_ratio"])),
+        ("检索延迟 (p50)", _latency(before["latency_ms"]), _latency(after["latency_ms"])),
+    ]
+    for row in rows:
+        table.add_row(*row)
+    console.print(table)
+    console.print(
+        f"[green]{message}[/green] [dim]({report['reclaimed_vectors']} deleted vectors purged "
+        f"in {report['seconds']:.2f}s)[/dim]"
+    )
+
+
+@cli.command(name="export")
+@click.argument('bundle_path', type=click.Path(dir_okay=False))
+@require_init
+@kb_option()
+@require_embedding_config
+def export_bundle(bundle_path):
+    """导出知识库快照 (元数据、分块文本与向量，导入时无需重新嵌入)"""
+    from x1ayu_rag.api.bundle_api import BundleAPI
+    with console.status("正在导出知识库..."):
+        success, message, manifest = BundleAPI().export_bundle(bundle_path)
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(1)
+    console.print(f"[green]{message}[/green]")
+    console.print(
+        f"[dim]{manifest['chunks']} chunks, {manifest['vectors']} vectors (dim {manifest['dim']}), "
+        f"{manifest['bytes'] / 1024:.1f} KiB, model {manifest['embedding']}[/dim]"
+    )
+    if manifest["orphan_vectors_skipped"]:
+        console.print(f"[yellow]跳过 {manifest['orphan_vectors_skipped']} 个没有分块记录的孤立向量。[/yellow]")
+
+
+@cli.command(name="import")
+@click.argument('bundle_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help="替换当前知识库中已有的文档")
+@require_init
+@kb_option(create=True)
+@require_embedding_config
+def import_bundle(bundle_path, replace):
+    """导入知识库快照 (直接写入向量，Embedding 模型须与快照一致)"""
+    if _connect_daemon() is not None:
+        console.print("[red]Error: Stop the running daemon ('rag serve --stop') before importing.[/red]")
+        sys.exit(1)
+    from x1ayu_rag.api.bundle_api import BundleAPI
+    with console.status("正在导入知识库..."):
+        success, message, report = BundleAPI().import_bundle(bundle_path, replace=replace)
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(1)
+    console.print(f"[green]{message}[/green]")
+    console.print(f"[dim]{report['chunks']} chunks, {report['vectors']} vectors loaded without re-embedding[/dim]")
+
+
+@cli.command()
+@require_init
+def kbs():
+    """列出知识库"""
+    rows = system_api.list_kbs()
+    table = Table(title="知识库", box=box.ROUNDED)
+    table.add_column("Name", style="cyan")
+    table.add_column("Documents", justify="right")
+    table.add_column("Chunks", justify="right")
+    table.add_column("Path", style="dim")
+    for row in rows:
+        table.add_row(row["name"], str(row["documents"]), str(row["chunks"]), row["path"])
+    console.print(table)
+
+
+@cli.command()
+@click.option('--host', default="127.0.0.1", help="监听地址")
+@click.option('--port', default=0, type=int, help="监听端口 (0 表示自动分配)")
+@click.option('--stop', is_flag=True, help="停止当前目录下运行中的服务")
+@require_init
+def serve(host, port, stop):
+    """启动常驻服务，保持模型与向量库常驻 (其他 rag 命令会自动经由服务执行)"""
+    client = _connect_daemon()
+    if stop:
+        if client is None:
+            console.print("[yellow]服务未运行。[/yellow]")
+            return
+        client.shutdown()
+        console.print("[green]服务已停止。[/green]")
+        return
+    if client is not None:
+        console.print("[yellow]服务已在运行。[/yellow]")
+        return
+
+    success, msg = system_api.validate_embedding_config()
+    if not success:
+        console.print(f"{msg}")
+        sys.exit(1)
+
+    from x1ayu_rag.daemon.server import RAGDaemon
+    daemon = RAGDaemon(host=host, port=port)
+    with console.status("正在加载模型与向量库..."):
+        daemon.warm_up()
+    console.print(f"[green]服务已启动[/green] (pid {os.getpid()})，按 Ctrl+C 或运行 'rag serve --stop' 停止。")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help="写入文件 (原子替换) 而非输出到终端")
+@require_init
+def metrics(output):
+    """输出 Prometheus 文本格式指标 (服务运行时读取服务进程的指标)"""
+    from x1ayu_rag.error.exceptions import DaemonError
+    from x1ayu_rag.utils.metrics import MetricsRegistry
+    text = None
+    client = _connect_daemon()
+    if client is not None:
+        try:
+            text = client.metrics()
+        except DaemonError as e:
+            Console(stderr=True).print(f"[yellow]{e}; 改为输出本进程指标。[/yellow]")
+    if output:
+        MetricsRegistry.write_textfile(output, text)
+        console.print(f"[green]指标已写入 {output}[/green]")
+        return
+    click.echo(text if text is not None else MetricsRegistry.render(), nl=False)
+
+
+@cli.command()
+@click.option('--sizes', default="50,200", help="语料规模 (文件数，逗号分隔)")
+@click.option('--depth', 'heading_depth', default=3, help="标题层级深度")
+@click.option('--sections', default=6, help="每个文件的章节数")
+@click.option('--queries', default=50, help="每个规模的检索次数")
+@click.option('-k', default=4, help="每次检索返回的分块数")
+@click.option('--backend', type=click.Choice(["milvus", "numpy"]), default="milvus", help="向量库后端")
+@click.option('--embed-latency', type=float, default=0.0, help="模拟每次 Embedding 请求的耗时 (毫秒)")
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help="结果 JSON 保存路径")
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help="与基线结果 JSON 对比")
+@click.option('--tolerance', default=0.1, help="对比时允许的相对退化比例")
+def bench(sizes, heading_depth, sections, queries, k, backend, embed_latency, output, baseline, tolerance):
+    """运行离线基准 (摄取吞吐、重新同步、检索延迟、峰值内存)"""
+    from x1ayu_rag.api.bench_api import BenchAPI
+
+    try:
+        size_list = [int(s) for s in sizes.split(",") if s.strip()]
+    except ValueError:
+        console.print("[red]Error: --sizes must be comma-separated integers.[/red]")
+        sys.exit(2)
+
+    api = BenchAPI()
+    options = {
+        "sizes": size_list,
+        "heading_depth": heading_depth,
+        "sections": sections,
+        "queries": queries,
+        "k": k,
+        "backend": backend,
+        "embed_latency_ms": embed_latency,
+    }
+    with console.status("正在运行基准..."):
+        success, message, report = api.run(options, output=output)
+    if not success:
+        console.print(f"[red]{message}[/red]")
+        sys.exit(1)
+
+    table = Table(title=f"基准 ({backend})", box=box.ROUNDED)
+    for column in ["Files", "Chunks", "Files/s", "Chunks/s", "Resync", "Cold", "p50", "p95", "p99", "Peak RSS"]:
+        table.add_column(column, justify="right")
+    for r in report["results"]:
+        table.add_row(
+            str(r["files"]), str(r["chunks"]),
+            f"{r['files_per_second']:.1f}", f"{r['chunks_per_second']:.1f}",
+            f"{r['resync_seconds'] * 1000:.0f} ms",
+            f"{r['select_cold_ms']:.1f} ms",
+            f"{r['select_p50_ms']:.2f} ms", f"{r['select_p95_ms']:.2f} ms", f"{r['select_p99_ms']:.2f} ms",
+            f"{r['peak_rss_mb']:.0f} MB" if r["peak_rss_mb"] is not None else "-",
+        )
+    console.print(table)
+    console.print(f"[green]{message}[/green]")
+
+    if baseline:
+        ok, compare_message, rows = api.compare(report, baseline, tolerance)
+        if rows:
+            diff = Table(title="与基线对比", box=box.ROUNDED)
+            for column in ["Size", "Metric", "Baseline", "Current", "Change"]:
+                diff.add_column(column, justify="right")
+            for row in rows:
+                color = "red" if row["regressed"] else ("green" if row["change"] > 0 else "dim")
+                diff.add_row(
+                    str(row["size"]), row["metric"], f"{row['baseline']:g}", f"{row['current']:g}",
+                    f"[{color}]{row['change']:+.1%}[/{color}]",
+                )
+            console.print(diff)
+        console.print(f"[{'green' if ok else 'red'}]{compare_message}[/]")
+        if not ok:
+            sys.exit(1)
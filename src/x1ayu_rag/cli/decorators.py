@@ -1,7 +1,10 @@
 from functools import wraps
 import sys
+import click
 from rich.console import Console
 from x1ayu_rag.api.system_api import SystemAPI
+from x1ayu_rag.config.kb_context import kb_exists, use_kb
+from x1ayu_rag.error.exceptions import ConfigurationError
 
 console = Console()
 system_api = SystemAPI()
@@ -37,3 +40,74 @@ def require_chat_config(f):
             sys.exit(1)
         return f(*args, **kwargs)
     return wrapper
+
+def warn_model_change(f):
+    """装饰器：config.json 中的 Embedding 模型与向量集合不一致时提示运行 rag reindex"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        change = system_api.pending_model_change()
+        if change:
+            Console(stderr=True).print(
+                f"[yellow]Embedding model in config.json {change['config']} differs from the indexed collection "
+                f"{change['collection']}; the collection's model stays in use until 'rag reindex' completes.[/yellow]"
+            )
+        return f(*args, **kwargs)
+    return wrapper
+
+def kb_option(create: bool = False):
+    """装饰器：添加 --kb 选项，命令在所选知识库的上下文中执行
+
+    参数:
+        create: 知识库不存在时是否创建 (否则提示并退出)
+    """
+    def decorator(f):
+        @click.option('--kb', help="知识库名称 (默认为默认知识库)")
+        @wraps(f)
+        def wrapper(*args, kb=None, **kwargs):
+            try:
+                with use_kb(kb) as name:
+                    if create:
+                        success, msg = system_api.ensure_kb(name)
+                        if not success:
+                            console.print(f"[red]{msg}[/red]")
+                            sys.exit(1)
+                        if msg:
+                            console.print(f"[green]{msg}[/green]")
+                    elif not kb_exists(name):
+                        console.print(f"[red]Error: Knowledge base not found: {name}[/red]")
+                        sys.exit(1)
+                    return f(*args, **kwargs)
+            except ConfigurationError as e:
+                console.print(f"[red]Error: {e.message}[/red]")
+                sys.exit(2)
+        return wrapper
+    return decorator
+
+def kbs_option(f):
+    """装饰器：添加可重复的 --kb 选项 (all 表示全部知识库)，解析后以 kbs 列表传入命令
+
+    只选择一个知识库时命令在该知识库的上下文中执行；未指定时 kbs 为 None (默认知识库)。
+    """
+    @click.option('--kb', 'kb_names', multiple=True,
+                  help="检索的知识库，可重复指定以并发检索多个知识库并合并结果；all 表示全部知识库")
+    @wraps(f)
+    def wrapper(*args, kb_names=(), **kwargs):
+        names = []
+        for name in kb_names:
+            if name == "all":
+                names.extend(kb["name"] for kb in system_api.list_kbs())
+            else:
+                names.append(name)
+        names = list(dict.fromkeys(names))
+        try:
+            for name in names:
+                with use_kb(name):
+                    if not kb_exists(name):
+                        console.print(f"[red]Error: Knowledge base not found: {name}[/red]")
+                        sys.exit(1)
+            with use_kb(names[0] if len(names) == 1 else None):
+                return f(*args, kbs=names or None, **kwargs)
+        except ConfigurationError as e:
+            console.print(f"[red]Error: {e.message}[/red]")
+            sys.exit(2)
+    return wrapper
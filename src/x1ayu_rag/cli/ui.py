@@ -106,7 +106,7 @@ def model_config_menu(model_type: str):
             q_prov = [
                 inquirer.List('provider',
                               message=f"Select {model_type} provider",
-                              choices=['ollama', 'openai'],
+                              choices=['ollama', 'openai', 'echo' if model_key == "chat" else 'hash'],
                               default=config_data.get("provider", "ollama")
                               ),
             ]
@@ -6,6 +6,12 @@ CONFIG_DIR_NAME = ".x1ayu_rag"
 # 默认配置目录路径（当前工作目录下的隐藏文件夹）
 DEFAULT_CONFIG_DIR = CONFIG_DIR_NAME
 
+# 默认知识库名称 (数据直接位于配置目录下)
+DEFAULT_KB_NAME = "default"
+
+# 命名知识库的上级目录 (<配置目录>/kb/<name>/，各自独立的 SQLite 与向量集合，共享 config.json)
+KB_DIR_NAME = "kb"
+
 # SQLite 数据库路径
 SQLITE_DB_NAME = "sqlite.db"
 SQLITE_DB_PATH = os.path.join(DEFAULT_CONFIG_DIR, SQLITE_DB_NAME)
@@ -14,6 +20,36 @@ SQLITE_DB_PATH = os.path.join(DEFAULT_CONFIG_DIR, SQLITE_DB_NAME)
 MILVUS_DB_NAME = "milvus.db"
 MILVUS_DB_PATH = os.path.join(DEFAULT_CONFIG_DIR, MILVUS_DB_NAME)
 
+# Milvus 集合删除计数文件的后缀 (<集合文件>.deletes.json，自动压缩据此判断删除比例)
+MILVUS_DELETE_COUNTER_SUFFIX = ".deletes.json"
+
 # 配置文件名
 CONFIG_FILE_NAME = "config.json"
 CONFIG_FILE_PATH = os.path.join(DEFAULT_CONFIG_DIR, CONFIG_FILE_NAME)
+
+# 向量降维投影文件（与向量集合一同持久化）
+PROJECTION_FILE_NAME = "projection.npz"
+PROJECTION_FILE_PATH = os.path.join(DEFAULT_CONFIG_DIR, PROJECTION_FILE_NAME)
+
+# NumPy 内存映射向量库目录
+NUMPY_STORE_DIR_NAME = "numpy_store"
+NUMPY_STORE_DIR = os.path.join(DEFAULT_CONFIG_DIR, NUMPY_STORE_DIR_NAME)
+
+# 向量集合状态文件 (当前集合的位置与建立集合时的 Embedding 配置)
+VECTOR_STATE_FILE_NAME = "vectors.json"
+VECTOR_STATE_FILE_PATH = os.path.join(DEFAULT_CONFIG_DIR, VECTOR_STATE_FILE_NAME)
+
+# 重建索引 (rag reindex) 的影子集合与进度
+REINDEX_STATE_FILE_NAME = "reindex.json"
+REINDEX_STATE_FILE_PATH = os.path.join(DEFAULT_CONFIG_DIR, REINDEX_STATE_FILE_NAME)
+
+# 后台重建索引的日志文件
+REINDEX_LOG_FILE_NAME = "reindex.log"
+REINDEX_LOG_FILE_PATH = os.path.join(DEFAULT_CONFIG_DIR, REINDEX_LOG_FILE_NAME)
+
+# 常驻服务 (rag serve) 的连接信息文件
+DAEMON_FILE_NAME = "daemon.json"
+DAEMON_FILE_PATH = os.path.join(DEFAULT_CONFIG_DIR, DAEMON_FILE_NAME)
+
+# 常驻服务请求头中携带的访问令牌 (令牌写入仅当前用户可读的 daemon.json)
+DAEMON_TOKEN_HEADER = "X-Rag-Token"
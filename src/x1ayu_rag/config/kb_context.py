@@ -0,0 +1,79 @@
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+from x1ayu_rag.config.constants import DEFAULT_CONFIG_DIR, DEFAULT_KB_NAME, KB_DIR_NAME, SQLITE_DB_NAME
+
+# 知识库名称：字母、数字、下划线与连字符
+_KB_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# 保留名称 (CLI 中 --kb all 表示全部知识库)
+RESERVED_KB_NAMES = ("all",)
+
+# 当前上下文 (线程 / 协程) 操作的知识库
+_current_kb: ContextVar[str] = ContextVar("x1ayu_rag_kb", default=DEFAULT_KB_NAME)
+
+
+def validate_kb_name(name: str) -> str:
+    """校验知识库名称，非法时抛出 ConfigurationError"""
+    if not name or not _KB_NAME_RE.match(name) or name in RESERVED_KB_NAMES:
+        from x1ayu_rag.error.exceptions import ConfigurationError
+        raise ConfigurationError(
+            f"Invalid knowledge base name: {name!r} (use letters, digits, '_' and '-')"
+        )
+    return name
+
+
+def current_kb() -> str:
+    """当前上下文的知识库名称"""
+    return _current_kb.get()
+
+
+@contextmanager
+def use_kb(name: Optional[str]) -> Iterator[str]:
+    """在 with 块内切换当前知识库 (name 为空时沿用当前知识库)
+
+    ContextVar 不会传递给新线程，工作线程需在各自的任务中调用。
+    """
+    if not name:
+        yield current_kb()
+        return
+    token = _current_kb.set(validate_kb_name(name))
+    try:
+        yield name
+    finally:
+        _current_kb.reset(token)
+
+
+def kb_dir(name: Optional[str] = None) -> str:
+    """知识库的数据目录
+
+    默认知识库沿用配置目录本身 (兼容旧版本的数据)，命名知识库位于 <配置目录>/kb/<name>/。
+    """
+    name = name or current_kb()
+    if name == DEFAULT_KB_NAME:
+        return DEFAULT_CONFIG_DIR
+    return os.path.join(DEFAULT_CONFIG_DIR, KB_DIR_NAME, name)
+
+
+def kb_path(file_name: str, name: Optional[str] = None) -> str:
+    """知识库数据目录下的文件路径 (SQLite、向量集合、投影等)"""
+    return os.path.join(kb_dir(name), file_name)
+
+
+def kb_exists(name: str) -> bool:
+    """知识库是否已建立 (SQLite 数据库存在)"""
+    return os.path.exists(kb_path(SQLITE_DB_NAME, name))
+
+
+def list_kbs() -> List[str]:
+    """已建立的知识库名称，默认知识库在前"""
+    names = [DEFAULT_KB_NAME] if kb_exists(DEFAULT_KB_NAME) else []
+    root = os.path.join(DEFAULT_CONFIG_DIR, KB_DIR_NAME)
+    if os.path.isdir(root):
+        names += sorted(
+            n for n in os.listdir(root)
+            if n != DEFAULT_KB_NAME and _KB_NAME_RE.match(n) and kb_exists(n)
+        )
+    return names
@@ -0,0 +1,132 @@
+import itertools
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional
+from x1ayu_rag.config.constants import DAEMON_FILE_PATH, DAEMON_TOKEN_HEADER
+from x1ayu_rag.error.exceptions import DaemonError
+
+
+class DaemonClient:
+    """rag serve 常驻服务的轻量客户端
+
+    只依赖标准库，CLI 在服务运行时通过它转发请求，避免加载 LangChain / pymilvus。
+    """
+
+    # 探测服务是否存活的超时 (秒)
+    PING_TIMEOUT = 0.5
+    # 批量检索时每个请求携带的输入行数 (默认与 QueryAPI.stream_batch_results 的批大小一致)
+    BATCH_LINES = 256
+
+    def __init__(self, host: str, port: int, token: str):
+        self.base_url = f"http://{host}:{port}"
+        self.token = token
+        self.last_stream_stats: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def connect(cls) -> Optional["DaemonClient"]:
+        """连接当前目录下运行中的服务，未运行 (或已失效) 时返回 None"""
+        if os.environ.get("RAG_NO_DAEMON") or not os.path.exists(DAEMON_FILE_PATH):
+            return None
+        try:
+            with open(DAEMON_FILE_PATH, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            client = cls(info["host"], info["port"], info["token"])
+            client.request("ping", timeout=cls.PING_TIMEOUT)
+            return client
+        except (OSError, ValueError, KeyError, DaemonError):
+            return None
+
+    def _open(self, op: str, payload: Dict[str, Any], timeout: Optional[float]):
+        # 仅在服务运行时才需要 urllib，避免拖慢普通命令的启动
+        import urllib.error
+        import urllib.request
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(
+            f"{self.base_url}/{op}",
+            data=data,
+            headers={"Content-Type": "application/json", DAEMON_TOKEN_HEADER: self.token},
+            method="POST",
+        )
+        try:
+            return urllib.request.urlopen(req, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise DaemonError(f"Daemon request '{op}' failed: {message}", e)
+        except (urllib.error.URLError, OSError) as e:
+            raise DaemonError(f"Cannot reach daemon: {e}", e)
+
+    def request(self, op: str, payload: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """发送请求并返回 JSON 响应"""
+        with self._open(op, payload or {}, timeout) as resp:
+            return json.loads(resp.read())
+
+    def stream(self, op: str, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """发送请求并逐行产出 NDJSON 响应记录"""
+        with self._open(op, payload, None) as resp:
+            for line in resp:
+                if line.strip():
+                    record = json.loads(line)
+                    if "error" in record and len(record) == 1:
+                        raise DaemonError(f"Daemon request '{op}' failed: {record['error']}")
+                    yield record
+
+    # ---- 与 API 层对应的操作 ----
+
+    def ingest_document(self, file_path: str, kb: Optional[str] = None):
+        """同 IngestAPI.ingest_document，kb 指定写入的知识库 (默认为默认知识库)"""
+        body = self.request("ingest", {"path": os.path.abspath(file_path), "kb": kb})
+        return body["success"], body["message"], [tuple(r) for r in body["results"]]
+
+    def embedding_stats(self) -> Dict[str, Any]:
+        """同 IngestAPI.embedding_stats"""
+        return self.request("stats")["embedding"]
+
+    def metrics(self) -> str:
+        """读取服务进程的 Prometheus 文本格式指标"""
+        import urllib.error
+        import urllib.request
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/metrics", timeout=self.PING_TIMEOUT * 10) as resp:
+                return resp.read().decode("utf-8")
+        except (urllib.error.URLError, OSError) as e:
+            raise DaemonError(f"Cannot reach daemon: {e}", e)
+
+    def search_chunks(self, query: str, top_k: int = 2, **options) -> list:
+        """同 QueryAPI.search_chunks"""
+        options["top_k"] = top_k
+        return self.request("select", {"query": query, "options": options})["results"]
+
+    def stream_batch_results(self, lines: Iterable[str], top_k: int = 2, **options) -> Iterator[str]:
+        """同 QueryAPI.stream_batch_results
+
+        输入按 batch_size (默认 BATCH_LINES) 行分段，每段一个请求，边读边发送，
+        不把整个输入读入内存，第一段的结果返回后即开始输出。
+        """
+        options["top_k"] = top_k
+        size = max(1, int(options.get("batch_size") or self.BATCH_LINES))
+        lines = iter(lines)
+        while True:
+            chunk = list(itertools.islice(lines, size))
+            if not chunk:
+                return
+            for record in self.stream("select_batch", {"lines": chunk, "options": options}):
+                yield json.dumps(record, ensure_ascii=False)
+
+    def stream_chain(self, question: str, context_tokens: Optional[int] = None, **options) -> Iterator[str]:
+        """同 RAGChain.stream，逐段产出回答文本
+
+        流结束后 last_stream_stats 为服务端记录的统计。
+        """
+        self.last_stream_stats = None
+        payload = {"question": question, "context_tokens": context_tokens, "options": options}
+        for record in self.stream("chain", payload):
+            if "stats" in record:
+                self.last_stream_stats = record["stats"]
+            else:
+                yield record["token"]
+
+    def shutdown(self) -> None:
+        self.request("shutdown")
@@ -0,0 +1,256 @@
+import json
+import os
+import queue
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+from x1ayu_rag.config.constants import CONFIG_FILE_PATH, DAEMON_FILE_PATH, DAEMON_TOKEN_HEADER
+from x1ayu_rag.error.exceptions import DaemonError
+
+# 不访问存储、直接在请求线程中处理的操作 (长时间的流式请求进行中也能立即响应)
+CONCURRENT_OPS = ("ping", "shutdown")
+
+# 存储线程与请求线程之间传递流式输出的标记
+_STREAM = object()
+_END = object()
+
+
+class RAGDaemon:
+    """本地常驻服务
+
+    在进程内保持 SQLite 连接、向量库、Embedding 与聊天模型客户端常驻，
+    通过 localhost HTTP 提供 ingest / select / chain 操作；请求中的 kb / kbs 指定操作的知识库。
+    每个请求由独立线程接收，访问存储的操作提交到唯一的存储线程串行执行 (SQLite 连接与向量库只在该线程使用)，
+    并发的请求排队等待；ping 等不访问存储的操作直接响应，因此流式请求进行中其他命令不会误判服务已失效。
+    config.json 变更后自动重建缓存的组件。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.token = secrets.token_hex(16)
+        self._config_mtime: Optional[float] = None
+        self._ingest_api = None
+        self._query_api = None
+        self._chains: Dict[Any, Any] = {}
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self._store_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-daemon-store")
+
+    def _refresh(self) -> None:
+        """配置文件变化时丢弃已缓存的 API、链与向量库"""
+        mtime = os.path.getmtime(CONFIG_FILE_PATH) if os.path.exists(CONFIG_FILE_PATH) else None
+        if mtime == self._config_mtime:
+            return
+        from x1ayu_rag.db.vector_db import VectorDB
+        VectorDB.reset_all()
+        self._ingest_api = None
+        self._query_api = None
+        self._chains.clear()
+        self._config_mtime = mtime
+
+    @property
+    def ingest_api(self):
+        if self._ingest_api is None:
+            from x1ayu_rag.api.ingest_api import IngestAPI
+            self._ingest_api = IngestAPI()
+        return self._ingest_api
+
+    @property
+    def query_api(self):
+        if self._query_api is None:
+            from x1ayu_rag.api.query_api import QueryAPI
+            self._query_api = QueryAPI()
+        return self._query_api
+
+    def get_chain(self, context_tokens: Optional[int] = None):
+        """按上下文预算缓存 RAGChain (同一预算复用同一个聊天模型客户端)"""
+        from x1ayu_rag.utils.metrics import CACHE_REQUESTS
+        CACHE_REQUESTS.inc(cache="chain", result="hit" if context_tokens in self._chains else "miss")
+        if context_tokens not in self._chains:
+            from x1ayu_rag.chain.rag_chain import RAGChain
+            self._chains[context_tokens] = RAGChain(context_tokens=context_tokens)
+        return self._chains[context_tokens]
+
+    def warm_up(self) -> None:
+        """在存储线程中预先构建各组件并打开向量库"""
+        self._store_worker.submit(self._warm_up).result()
+
+    def _warm_up(self) -> None:
+        from x1ayu_rag.db.vector_db import VectorDB
+        self._refresh()
+        VectorDB.get_vector_store()
+        self.ingest_api
+        self.query_api
+
+    # ---- 操作 ----
+
+    def op_ping(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"ok": True, "pid": os.getpid()}
+
+    def op_ingest(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        success, message, results = self.ingest_api.ingest_document(payload["path"], payload.get("kb"))
+        return {"success": success, "message": message, "results": [list(r) for r in results]}
+
+    def op_stats(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"embedding": self.ingest_api.embedding_stats()}
+
+    def op_select(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"results": self.query_api.search_chunks(payload["query"], **payload.get("options", {}))}
+
+    def op_select_batch(self, payload: Dict[str, Any]) -> Iterator[str]:
+        return self.query_api.stream_batch_results(payload["lines"], **payload.get("options", {}))
+
+    def op_chain(self, payload: Dict[str, Any]) -> Iterator[str]:
+        rag = self.get_chain(payload.get("context_tokens"))
+        for token in rag.stream(payload["question"], **payload.get("options", {})):
+            yield json.dumps({"token": token}, ensure_ascii=False)
+        yield json.dumps({"stats": rag.last_stream_stats})
+
+    def op_shutdown(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # 在请求线程中调用：等待服务循环停止接收新请求，已接收的请求仍会处理完毕
+        self.httpd.shutdown()
+        return {"ok": True}
+
+    def dispatch(self, op: str, payload: Dict[str, Any]):
+        handler: Optional[Callable] = getattr(self, f"op_{op}", None)
+        if handler is None:
+            raise DaemonError(f"Unknown operation: {op}")
+        if op not in CONCURRENT_OPS:
+            self._refresh()
+        return handler(payload)
+
+    def execute(self, op: str, payload: Dict[str, Any]) -> Union[Dict[str, Any], Iterator[str]]:
+        """执行操作
+
+        CONCURRENT_OPS 在请求线程中直接处理；其余操作提交到存储线程串行执行，
+        流式操作也在存储线程中逐行生成，经队列交给请求线程写出。
+
+        返回:
+            dict 响应，或逐行产出 NDJSON 记录的迭代器
+        """
+        if op in CONCURRENT_OPS:
+            return self.dispatch(op, payload)
+        out: queue.Queue = queue.Queue()
+        self._store_worker.submit(self._run, op, payload, out)
+        first = out.get()
+        if isinstance(first, Exception):
+            raise first
+        if first is not _STREAM:
+            return first
+        return self._drain(out)
+
+    def _run(self, op: str, payload: Dict[str, Any], out: queue.Queue) -> None:
+        """(存储线程) 执行操作，结果、流式输出的各行或异常依次放入 out"""
+        try:
+            result = self.dispatch(op, payload)
+            if isinstance(result, dict):
+                out.put(result)
+                return
+            out.put(_STREAM)
+            for line in result:
+                out.put(line)
+        except Exception as e:
+            out.put(e)
+            return
+        out.put(_END)
+
+    @staticmethod
+    def _drain(out: queue.Queue) -> Iterator[str]:
+        while True:
+            item = out.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    # ---- 服务生命周期 ----
+
+    def _write_daemon_file(self) -> None:
+        info = {"pid": os.getpid(), "host": self.host, "port": self.port, "token": self.token}
+        fd = os.open(DAEMON_FILE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+
+    def _remove_daemon_file(self) -> None:
+        try:
+            with open(DAEMON_FILE_PATH, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") != os.getpid():
+                    return
+            os.remove(DAEMON_FILE_PATH)
+        except (OSError, ValueError):
+            pass
+
+    def serve_forever(self) -> None:
+        """启动服务并阻塞，直至收到 shutdown 请求或 KeyboardInterrupt"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        # 关闭时等待进行中的请求 (包括 shutdown 请求本身的响应) 写完
+        self.httpd.daemon_threads = False
+        self.port = self.httpd.server_address[1]
+        self._write_daemon_file()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self._remove_daemon_file()
+            self.httpd.server_close()
+            self._store_worker.shutdown(wait=True)
+
+
+def _make_handler(daemon: RAGDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.0：每个请求一个连接，流式响应以关闭连接结束
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # /metrics 供 Prometheus 抓取，只读且仅监听 localhost，不要求令牌
+            if self.path.rstrip("/") != "/metrics":
+                self._send_json(404, {"error": "Not found"})
+                return
+            from x1ayu_rag.utils.metrics import MetricsRegistry
+            data = MetricsRegistry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.headers.get(DAEMON_TOKEN_HEADER) != daemon.token:
+                self._send_json(403, {"error": "Invalid daemon token"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                result = daemon.execute(self.path.strip("/"), payload)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            if isinstance(result, dict):
+                self._send_json(200, result)
+                return
+            # 流式响应：NDJSON，每行一条记录
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for line in result:
+                    self.wfile.write(line.encode("utf-8") + b"\n")
+                    self.wfile.flush()
+            except BrokenPipeError:
+                pass
+            except Exception as e:
+                self.wfile.write(json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    return Handler
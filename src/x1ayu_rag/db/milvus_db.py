@@ -1,17 +1,259 @@
+import json
+import time
+from typing import Any, Dict, List
+import numpy as np
+from langchain_core.documents import Document as LC_Document
 from langchain_milvus import Milvus
-from x1ayu_rag.config.constants import MILVUS_DB_PATH
-from x1ayu_rag.llm.factory import LLMFactory
+from pymilvus import MilvusException
+from x1ayu_rag.config.constants import MILVUS_DB_PATH, MILVUS_DELETE_COUNTER_SUFFIX
+from x1ayu_rag.config.app_config import load_config
+from x1ayu_rag.db.vector_store import VectorStore, PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD
+from x1ayu_rag.error.exceptions import ConfigurationError, DatabaseError
+from x1ayu_rag.utils.path_utils import write_json_atomic
+from x1ayu_rag.utils.vector_math import as_matrix
 
-class MilvusDB:
-    _vector_store = None
+# 各索引类型的默认构建参数 (Milvus Lite 可加载的类型；IVF_PQ 需连接完整的 Milvus 服务)
+# IVF_SQ8 为标量量化 (每维 1 字节)
+DEFAULT_INDEX_PARAMS = {
+    "FLAT": {},
+    "IVF_FLAT": {"nlist": 128},
+    "IVF_SQ8": {"nlist": 128},
+    "HNSW": {"M": 16, "efConstruction": 200},
+}
+
+
+class MilvusVectorStore(VectorStore):
+    """基于 Milvus Lite 的向量存储后端
+
+    Milvus Lite 的数据文件由打开它的进程独占，直到该进程退出；
+    其他进程 (如刚完成切换的 rag reindex) 尚未退出时，打开操作在 OPEN_TIMEOUT 内重试。
+    """
+
+    # 等待其他进程释放数据文件的最长时间 (秒)
+    OPEN_TIMEOUT = 10.0
+
+    def __init__(self, embeddings, index_params: dict, uri: str = MILVUS_DB_PATH):
+        self.embeddings = embeddings
+        self.index_params = index_params
+        self.uri = uri
+        deadline = time.monotonic() + self.OPEN_TIMEOUT
+        while True:
+            try:
+                self.store = Milvus(
+                    embedding_function=embeddings,
+                    connection_args={"uri": uri},
+                    index_params=index_params,
+                    auto_id=False, # 我们自己管理 ID
+                    primary_field=PRIMARY_FIELD,
+                    text_field=TEXT_FIELD,
+                    vector_field=VECTOR_FIELD,
+                )
+                return
+            except MilvusException:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    @property
+    def client(self):
+        return self.store.client
+
+    @property
+    def collection_name(self) -> str:
+        return self.store.collection_name
+
+    def _exists(self) -> bool:
+        return self.client.has_collection(self.collection_name)
+
+    def _field_names(self) -> List[str]:
+        return [f["name"] for f in self.client.describe_collection(self.collection_name)["fields"]]
+
+    def add_documents(self, documents: List[LC_Document], ids: List[str]) -> None:
+        self.store.add_documents(documents=documents, ids=ids)
+
+    def add_embeddings(self, texts, embeddings, metadatas, ids) -> None:
+        self.store.add_embeddings(texts=texts, embeddings=embeddings, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        result = self.client.delete(self.collection_name, ids=ids)
+        # 返回删除计数时按实际删除数累加；返回主键列表时 (部分版本) 只能按请求的主键数计
+        deleted = len(result) if isinstance(result, list) else int(result.get("delete_count", 0))
+        if deleted:
+            self._set_deleted(self._get_deleted() + deleted)
+
+    @property
+    def _counter_path(self) -> str:
+        # collection stats 只报告存活行数，上次压缩以来删除的行数由持有数据文件的进程自行记录
+        return self.uri + MILVUS_DELETE_COUNTER_SUFFIX
+
+    def _get_deleted(self) -> int:
+        try:
+            with open(self._counter_path, "r", encoding="utf-8") as f:
+                return int(json.load(f).get("deleted", 0))
+        except (OSError, ValueError):
+            return 0
+
+    def _set_deleted(self, deleted: int) -> None:
+        write_json_atomic(self._counter_path, {"deleted": deleted})
+
+    def _search(self, vectors, k: int, with_vectors: bool):
+        output_fields = self._field_names()
+        if not with_vectors:
+            output_fields = [f for f in output_fields if f != VECTOR_FIELD]
+        return self.client.search(
+            self.collection_name,
+            data=[list(v) for v in vectors],
+            anns_field=VECTOR_FIELD,
+            limit=k,
+            output_fields=output_fields,
+        )
 
+    def search_by_vectors(self, vectors, k):
+        if not vectors:
+            return []
+        if not self._exists():
+            return [[] for _ in vectors]
+        return [
+            [(self._to_document(hit["entity"]), hit["distance"]) for hit in hits]
+            for hits in self._search(vectors, k, with_vectors=False)
+        ]
+
+    def search_with_vectors(self, vectors, k):
+        if not vectors:
+            return []
+        if not self._exists():
+            return [([], np.empty((0, 0), dtype=np.float32)) for _ in vectors]
+        output = []
+        for hits in self._search(vectors, k, with_vectors=True):
+            entities = [dict(hit["entity"]) for hit in hits]
+            vecs = [entity.pop(VECTOR_FIELD) for entity in entities]
+            output.append((
+                [(self._to_document(e), hit["distance"]) for e, hit in zip(entities, hits)],
+                as_matrix(vecs) if vecs else np.empty((0, 0), dtype=np.float32),
+            ))
+        return output
+
+    def _to_document(self, entity: Dict[str, Any]) -> LC_Document:
+        metadata = dict(entity)
+        text = metadata.pop(TEXT_FIELD, "")
+        return LC_Document(id=metadata.get(PRIMARY_FIELD), page_content=text, metadata=metadata)
+
+    def get_by_ids(self, ids: List[str]) -> List[LC_Document]:
+        if not ids or not self._exists():
+            return []
+        output_fields = [f for f in self._field_names() if f != VECTOR_FIELD]
+        rows = self.client.get(self.collection_name, ids=list(ids), output_fields=output_fields)
+        return [self._to_document(row) for row in rows]
+
+    def iter_records(self, batch_size: int = 1000, with_vectors: bool = True):
+        if not self._exists():
+            return
+        fields = self._field_names()
+        if not with_vectors:
+            fields = [f for f in fields if f != VECTOR_FIELD]
+        iterator = self.client.query_iterator(
+            self.collection_name,
+            batch_size=batch_size,
+            output_fields=fields,
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                yield batch
+        finally:
+            iterator.close()
+
+    def iter_ids(self, batch_size: int = 1000):
+        if not self._exists():
+            return
+        iterator = self.client.query_iterator(
+            self.collection_name,
+            batch_size=batch_size,
+            output_fields=[PRIMARY_FIELD],
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                yield [r[PRIMARY_FIELD] for r in batch]
+        finally:
+            iterator.close()
+
+    def stats(self) -> Dict[str, Any]:
+        rows = 0
+        if self._exists():
+            rows = int(self.client.get_collection_stats(self.collection_name).get("row_count", 0))
+        return {"rows": rows, "deleted": self._get_deleted()}
+
+    def compact(self, timeout: float = 600.0) -> int:
+        """合并段并清除删除标记，完成后 flush 落盘
+
+        返回:
+            int: 上次压缩以来删除的记录数
+        """
+        deleted = self._get_deleted()
+        if not self._exists():
+            return 0
+        job_id = self.client.compact(self.collection_name)
+        deadline = time.monotonic() + timeout
+        while str(self.client.get_compaction_state(job_id)) != "Completed":
+            if time.monotonic() > deadline:
+                raise DatabaseError(f"Milvus compaction {job_id} did not finish within {timeout:.0f}s")
+            time.sleep(0.2)
+        self.client.flush(self.collection_name)
+        self._set_deleted(0)
+        return deleted
+
+    def rebuild_index(self) -> None:
+        """释放集合，按 index_params 删除并重建向量索引后重新加载"""
+        if not self._exists():
+            return
+        name = self.collection_name
+        self.client.release_collection(name)
+        try:
+            for index_name in self.client.list_indexes(name):
+                self.client.drop_index(name, index_name)
+            index_params = self.client.prepare_index_params()
+            index_params.add_index(field_name=VECTOR_FIELD, **self.index_params)
+            self.client.create_index(name, index_params=index_params)
+        finally:
+            self.client.load_collection(name)
+
+    def drop(self) -> None:
+        self.store.drop()
+        self._set_deleted(0)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class MilvusDB:
     @classmethod
-    def get_vector_store(cls):
-        if cls._vector_store is None:
-            cls._vector_store = Milvus(
-                embedding_function=LLMFactory.get_embeddings(),
-                connection_args={"uri": MILVUS_DB_PATH},
-                index_params={"index_type": "FLAT", "metric_type": "L2"},
-                auto_id=False # 我们自己管理 ID
+    def get_index_params(cls, vector_config: dict | None = None) -> dict:
+        """根据 config.json 中的 vector 配置生成索引参数"""
+        if vector_config is None:
+            vector_config = load_config().get("vector", {})
+        index_type = str(vector_config.get("index_type", "FLAT")).upper()
+        if index_type not in DEFAULT_INDEX_PARAMS:
+            raise ConfigurationError(
+                f"Unsupported vector index type: {index_type} (use one of {', '.join(DEFAULT_INDEX_PARAMS)})"
             )
-        return cls._vector_store
+        params = dict(DEFAULT_INDEX_PARAMS[index_type])
+        params.update(vector_config.get("index_params") or {})
+        return {"index_type": index_type, "metric_type": "L2", "params": params}
+
+    @classmethod
+    def create_vector_store(
+        cls, embeddings, uri: str = MILVUS_DB_PATH, vector_config: dict | None = None
+    ) -> MilvusVectorStore:
+        """按 vector 配置 (默认为当前配置) 创建 Milvus 向量存储
+
+        参数:
+            uri: Milvus Lite 数据库文件 (每个文件同一时间只能被一个进程打开)
+        """
+        return MilvusVectorStore(embeddings, cls.get_index_params(vector_config), uri)
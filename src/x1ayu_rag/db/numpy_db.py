@@ -0,0 +1,348 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, List
+import numpy as np
+from langchain_core.documents import Document as LC_Document
+from x1ayu_rag.config.constants import NUMPY_STORE_DIR
+from x1ayu_rag.db.vector_store import VectorStore, PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD
+from x1ayu_rag.error.exceptions import DatabaseError
+from x1ayu_rag.utils.vector_math import as_matrix, squared_l2_distances, top_k_smallest
+
+
+class NumpyVectorStore(VectorStore):
+    """基于内存映射 .npy 矩阵的内嵌向量存储后端
+
+    - vectors.npy: float32 向量矩阵 (预留容量，按需倍增)，以 mmap 方式读写；
+      压缩后写入新版本文件 vectors.<版本>.npy，当前版本号记录在 index.db 中
+    - index.db: SQLite 中的 ID -> 行号映射、文本与元数据
+    删除只移除映射 (行成为墓碑)，墓碑比例超过阈值时自动压缩矩阵。
+    检索为向量化的精确 top-k，无需启动任何服务。
+    index.db 的连接可被多个线程使用 (联邦检索线程池、存储线程)，各操作由实例锁串行化。
+    """
+
+    MATRIX_FILE = "vectors.npy"
+    INDEX_FILE = "index.db"
+    INITIAL_CAPACITY = 1024
+    # 墓碑占比超过该阈值 (且至少 COMPACT_MIN_DELETED 行) 时自动压缩
+    COMPACT_RATIO = 0.3
+    COMPACT_MIN_DELETED = 256
+
+    def __init__(self, embeddings, store_dir: str = NUMPY_STORE_DIR):
+        self.embeddings = embeddings
+        self.store_dir = store_dir
+        self.index_path = os.path.join(store_dir, self.INDEX_FILE)
+        self._conn = None
+        self._lock = threading.RLock()
+        # 存活行掩码及其对应的 (rows, deleted, matrix_version)，写入、删除与压缩都会改变该键
+        self._mask = None
+        self._mask_key = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(self.store_dir, exist_ok=True)
+                self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+                self._conn.row_factory = sqlite3.Row
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS vectors (
+                        pk TEXT PRIMARY KEY,
+                        row INTEGER NOT NULL UNIQUE,
+                        text TEXT NOT NULL,
+                        metadata TEXT NOT NULL
+                    )
+                """)
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS meta (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    )
+                """)
+                self._conn.commit()
+            return self._conn
+
+    def _get_meta(self, key: str, default: int = 0) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _matrix_file(self, version: int) -> str:
+        """指定版本的矩阵文件 (版本 0 为 vectors.npy)"""
+        if not version:
+            return os.path.join(self.store_dir, self.MATRIX_FILE)
+        base, ext = os.path.splitext(self.MATRIX_FILE)
+        return os.path.join(self.store_dir, f"{base}.{version}{ext}")
+
+    @property
+    def matrix_path(self) -> str:
+        """当前版本的矩阵文件"""
+        return self._matrix_file(self._get_meta("matrix_version"))
+
+    def _open_matrix(self, mode: str = "r"):
+        """以 mmap 方式打开向量矩阵，不存在时返回 None"""
+        if not os.path.exists(self.matrix_path):
+            return None
+        return np.load(self.matrix_path, mmap_mode=mode)
+
+    def _ensure_capacity(self, needed: int, dim: int):
+        """确保矩阵容量不小于 needed 行，必要时倍增扩容"""
+        matrix = self._open_matrix("r+")
+        if matrix is not None and matrix.shape[0] >= needed:
+            return matrix
+        capacity = max(needed, self.INITIAL_CAPACITY)
+        if matrix is not None:
+            capacity = max(capacity, matrix.shape[0] * 2)
+        tmp_path = self.matrix_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if matrix is not None:
+            used = self._get_meta("rows")
+            grown[:used] = matrix[:used]
+            del matrix
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.matrix_path)
+        return self._open_matrix("r+")
+
+    def add_embeddings(self, texts, embeddings, metadatas, ids) -> None:
+        if not ids:
+            return
+        with self._lock:
+            vectors = as_matrix(embeddings)
+            dim = self._get_meta("dim", vectors.shape[1])
+            if vectors.shape[1] != dim:
+                raise DatabaseError(f"Vector dim mismatch: store has {dim}, got {vectors.shape[1]}")
+            try:
+                # 同 ID 重复写入视为覆盖
+                self._delete_rows(ids)
+                start = self._get_meta("rows")
+                matrix = self._ensure_capacity(start + len(ids), dim)
+                matrix[start:start + len(ids)] = vectors
+                matrix.flush()
+                del matrix
+                self.conn.executemany(
+                    "INSERT INTO vectors (pk, row, text, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (pk, start + i, text, json.dumps(meta or {}, ensure_ascii=False))
+                        for i, (pk, text, meta) in enumerate(zip(ids, texts, metadatas))
+                    ],
+                )
+                self._set_meta("dim", dim)
+                self._set_meta("rows", start + len(ids))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def _delete_rows(self, ids: List[str]) -> int:
+        """移除映射 (不提交)，返回删除行数"""
+        deleted = 0
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            cursor = self.conn.execute(f"DELETE FROM vectors WHERE pk IN ({placeholders})", batch)
+            deleted += cursor.rowcount
+        if deleted:
+            self._set_meta("deleted", self._get_meta("deleted") + deleted)
+            self._mask = self._mask_key = None
+        return deleted
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            try:
+                self._delete_rows(ids)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            rows, deleted = self._get_meta("rows"), self._get_meta("deleted")
+            if deleted >= self.COMPACT_MIN_DELETED and deleted > rows * self.COMPACT_RATIO:
+                self.compact()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows, deleted = self._get_meta("rows"), self._get_meta("deleted")
+            return {"rows": rows - deleted, "deleted": deleted}
+
+    def compact(self) -> int:
+        """压缩矩阵，移除墓碑行
+
+        新矩阵写入下一个版本的文件，行号映射与版本号在同一个事务中提交，提交后才删除旧文件：
+        提交前失败时旧文件与旧映射保持不变，提交后旧文件不再被引用。
+
+        返回:
+            int: 回收的行数
+        """
+        with self._lock:
+            deleted = self._get_meta("deleted")
+            matrix = self._open_matrix()
+            if matrix is None or not deleted:
+                return 0
+            version = self._get_meta("matrix_version")
+            new_path = self._matrix_file(version + 1)
+            rows = [r["row"] for r in self.conn.execute("SELECT row FROM vectors ORDER BY row")]
+            alive = np.asarray(rows, dtype=np.int64)
+            capacity = max(len(alive), self.INITIAL_CAPACITY)
+            compacted = np.lib.format.open_memmap(
+                new_path, mode="w+", dtype=np.float32, shape=(capacity, matrix.shape[1])
+            )
+            compacted[:len(alive)] = matrix[alive]
+            compacted.flush()
+            del compacted, matrix
+            try:
+                # 先整体平移到负数区间，避免 UNIQUE(row) 在重排过程中冲突
+                self.conn.execute("UPDATE vectors SET row = -row - 1")
+                self.conn.executemany(
+                    "UPDATE vectors SET row = ? WHERE row = ?",
+                    [(new, -old - 1) for new, old in enumerate(rows)],
+                )
+                self._set_meta("rows", len(alive))
+                self._set_meta("deleted", 0)
+                self._set_meta("matrix_version", version + 1)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                os.remove(new_path)
+                raise
+            self._remove_stale_matrices(version + 1)
+            return deleted
+
+    def _remove_stale_matrices(self, current: int) -> None:
+        """删除非当前版本的矩阵文件 (包括此前在提交后、删除前中断而残留的文件)"""
+        base, ext = os.path.splitext(self.MATRIX_FILE)
+        keep = os.path.basename(self._matrix_file(current))
+        for name in os.listdir(self.store_dir):
+            if name != keep and name.startswith(base) and name.endswith(ext):
+                try:
+                    os.remove(os.path.join(self.store_dir, name))
+                except OSError:
+                    # 其他进程可能同时在清理
+                    pass
+
+    def _alive_mask(self, rows: int) -> np.ndarray | None:
+        """有墓碑时返回存活行掩码 (按 rows / deleted / 矩阵版本缓存)，否则返回 None"""
+        deleted = self._get_meta("deleted")
+        if not deleted:
+            return None
+        key = (rows, deleted, self._get_meta("matrix_version"))
+        if self._mask_key != key:
+            mask = np.zeros(rows, dtype=bool)
+            alive = [r["row"] for r in self.conn.execute("SELECT row FROM vectors")]
+            mask[np.asarray(alive, dtype=np.int64)] = True
+            self._mask, self._mask_key = mask, key
+        return self._mask
+
+    def _search_rows(self, vectors, k):
+        """精确检索，返回 (矩阵, 每个查询的 [(行号, Document, 距离)])"""
+        rows = self._get_meta("rows")
+        matrix = self._open_matrix()
+        if matrix is None or rows == 0:
+            return None, [[] for _ in vectors]
+        distances = squared_l2_distances(as_matrix(vectors), matrix[:rows])
+        mask = self._alive_mask(rows)
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+        indices, values = top_k_smallest(distances, k)
+
+        hit_rows = sorted({int(r) for r, v in zip(indices.ravel(), values.ravel()) if np.isfinite(v)})
+        docs = self._load_rows(hit_rows)
+        return matrix, [
+            [
+                (int(r), docs[int(r)], float(v))
+                for r, v in zip(row_idx, row_val)
+                if np.isfinite(v) and int(r) in docs
+            ]
+            for row_idx, row_val in zip(indices, values)
+        ]
+
+    def search_by_vectors(self, vectors, k):
+        if not len(vectors):
+            return []
+        with self._lock:
+            _, results = self._search_rows(vectors, k)
+            return [[(doc, dist) for _, doc, dist in hits] for hits in results]
+
+    def search_with_vectors(self, vectors, k):
+        if not len(vectors):
+            return []
+        with self._lock:
+            matrix, results = self._search_rows(vectors, k)
+            output = []
+            for hits in results:
+                hit_rows = np.asarray([r for r, _, _ in hits], dtype=np.int64)
+                vecs = np.asarray(matrix[hit_rows]) if len(hits) else np.empty((0, 0), dtype=np.float32)
+                output.append(([(doc, dist) for _, doc, dist in hits], vecs))
+            return output
+
+    def _load_rows(self, rows: List[int], column: str = "row") -> Dict[Any, LC_Document]:
+        """按行号 (或 pk) 批量加载文档，返回 {键: Document}"""
+        docs = {}
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for r in self.conn.execute(
+                f"SELECT pk, row, text, metadata FROM vectors WHERE {column} IN ({placeholders})", batch
+            ):
+                docs[r[column]] = LC_Document(
+                    id=r["pk"], page_content=r["text"], metadata=json.loads(r["metadata"])
+                )
+        return docs
+
+    def get_by_ids(self, ids: List[str]) -> List[LC_Document]:
+        with self._lock:
+            docs = self._load_rows(list(ids), column="pk")
+            return [docs[pk] for pk in ids if pk in docs]
+
+    def iter_records(self, batch_size: int = 1000, with_vectors: bool = True):
+        # 生成器在两批之间挂起，只在读取每一批时持有锁
+        with self._lock:
+            matrix = self._open_matrix() if with_vectors else None
+            cursor = self.conn.execute("SELECT pk, row, text, metadata FROM vectors ORDER BY row")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = []
+            for r in rows:
+                record: Dict[str, Any] = json.loads(r["metadata"])
+                record[PRIMARY_FIELD] = r["pk"]
+                record[TEXT_FIELD] = r["text"]
+                if matrix is not None:
+                    record[VECTOR_FIELD] = matrix[r["row"]].tolist()
+                batch.append(record)
+            yield batch
+
+    def iter_ids(self, batch_size: int = 1000):
+        with self._lock:
+            cursor = self.conn.execute("SELECT pk FROM vectors ORDER BY row")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [r["pk"] for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def drop(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            shutil.rmtree(self.store_dir, ignore_errors=True)
@@ -1,19 +1,104 @@
 import sqlite3
-from x1ayu_rag.config.constants import SQLITE_DB_PATH
+import threading
+from urllib.parse import quote
+from x1ayu_rag.config.constants import SQLITE_DB_NAME
+from x1ayu_rag.config.kb_context import kb_path
 import os
 
 class SqliteDB:
-    _conn = None
-    
+    """SQLite 连接管理
+
+    - 每个线程各自持有一个写连接与一个只读连接，连接不跨线程共享
+    - WAL 模式：读连接读取已提交的快照，不会被正在进行的写事务 (包括其他进程的 rag add) 阻塞
+    - 写连接之间的锁冲突由 busy_timeout 等待，而不是立即报 "database is locked"
+    - 连接按当前知识库 (kb_context.current_kb) 的数据库文件区分
+    """
+    # 等待写锁的最长时间 (毫秒)
+    BUSY_TIMEOUT_MS = 30000
+    # 当前 Schema 版本，init_db 完成迁移后写入 PRAGMA user_version
+    SCHEMA_VERSION = 5
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _connections: list = []
+
+    @staticmethod
+    def db_path() -> str:
+        """当前知识库的 SQLite 数据库路径"""
+        return kb_path(SQLITE_DB_NAME)
+
+    @classmethod
+    def _thread_conns(cls, kind: str) -> dict:
+        conns = getattr(cls._local, kind, None)
+        if conns is None:
+            conns = {}
+            setattr(cls._local, kind, conns)
+        return conns
+
+    @classmethod
+    def _connect(cls, path: str, read_only: bool = False) -> sqlite3.Connection:
+        if read_only:
+            uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=cls.BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            if not os.path.exists(os.path.dirname(path)):
+                 os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, timeout=cls.BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+            # WAL 为数据库文件的持久属性，设置一次后对所有连接生效
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {cls.BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        with cls._lock:
+            cls._connections.append(conn)
+        return conn
+
+    @classmethod
+    def get_conn(cls) -> sqlite3.Connection:
+        """获取当前线程对当前知识库的写连接"""
+        path = cls.db_path()
+        conns = cls._thread_conns("write_conns")
+        conn = conns.get(path)
+        if conn is None:
+            conn = conns[path] = cls._connect(path)
+        return conn
+
+    @classmethod
+    def get_read_conn(cls) -> sqlite3.Connection:
+        """获取当前线程对当前知识库的只读连接 (数据库尚未创建时返回写连接)"""
+        path = cls.db_path()
+        conns = cls._thread_conns("read_conns")
+        conn = conns.get(path)
+        if conn is None:
+            if not os.path.exists(path):
+                return cls.get_conn()
+            conn = conns[path] = cls._connect(path, read_only=True)
+        return conn
+
+    @classmethod
+    def close(cls) -> None:
+        """关闭所有线程的连接"""
+        with cls._lock:
+            for conn in cls._connections:
+                conn.close()
+            cls._connections = []
+            cls._local = threading.local()
+
     @classmethod
-    def get_conn(cls):
-        if cls._conn is None:
-            if not os.path.exists(os.path.dirname(SQLITE_DB_PATH)):
-                 os.makedirs(os.path.dirname(SQLITE_DB_PATH), exist_ok=True)
-            cls._conn = sqlite3.connect(SQLITE_DB_PATH)
-            cls._conn.row_factory = sqlite3.Row
-            cls._conn.execute("PRAGMA foreign_keys = ON")
-        return cls._conn
+    def schema_current(cls) -> bool:
+        """当前知识库的数据库是否已迁移到最新 Schema (经只读连接检查，不写入)"""
+        if not os.path.exists(cls.db_path()):
+            return False
+        version = cls.get_read_conn().execute("PRAGMA user_version").fetchone()[0]
+        return version >= cls.SCHEMA_VERSION
+
+    @classmethod
+    def ensure_schema(cls) -> None:
+        """数据库不是最新 Schema 时执行迁移，供只读路径使用 (已是最新时不打开写连接)"""
+        if not cls.schema_current():
+            cls.init_db()
 
     @classmethod
     def init_db(cls):
@@ -42,5 +127,164 @@ class SqliteDB:
                 FOREIGN KEY(document_id) REFERENCES documents(uuid) ON DELETE CASCADE
             )
         """)
+
+        # v3: 本地保存分块文本与标题结构，用于邻近分块扩展 (无需再访问向量库)
+        columns = {row["name"] for row in cursor.execute("PRAGMA table_info(chunks)")}
+        if "content" not in columns:
+            cursor.execute("ALTER TABLE chunks ADD COLUMN content TEXT")
+        if "mk_struct" not in columns:
+            cursor.execute("ALTER TABLE chunks ADD COLUMN mk_struct TEXT")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chunks_document_position ON chunks(document_id, position)"
+        )
+
+        # v4: 文档列表分页排序 (键集分页，排序列 + uuid) 与名称 / 路径查找的索引
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_name ON documents(name, uuid)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(path, name)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_at, uuid)")
+        cls._init_chunk_stats(conn)
+        cls._init_fts(cursor)
+        cursor.execute(f"PRAGMA user_version = {cls.SCHEMA_VERSION}")
         
         conn.commit()
+
+    @staticmethod
+    def _init_chunk_stats(conn: sqlite3.Connection) -> None:
+        """v5: 文档的分块数与分块文本字节数 (chunk_count / content_bytes)
+
+        由 chunks 表上的触发器随分块写入、删除与修改维护，按分块数 / 大小排序的分页沿索引读取，
+        不再每页聚合整个 chunks 表。升级时在写锁内加列、建触发器并回填，避免其他进程在此期间写入的分块漏计。
+        """
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+        if "chunk_count" in columns:
+            return
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+            if "chunk_count" not in columns:
+                conn.execute("ALTER TABLE documents ADD COLUMN chunk_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE documents ADD COLUMN content_bytes INTEGER NOT NULL DEFAULT 0")
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS chunks_stats_insert AFTER INSERT ON chunks BEGIN
+                        UPDATE documents SET chunk_count = chunk_count + 1,
+                            content_bytes = content_bytes + COALESCE(LENGTH(CAST(new.content AS BLOB)), 0)
+                        WHERE uuid = new.document_id;
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS chunks_stats_delete AFTER DELETE ON chunks BEGIN
+                        UPDATE documents SET chunk_count = chunk_count - 1,
+                            content_bytes = content_bytes - COALESCE(LENGTH(CAST(old.content AS BLOB)), 0)
+                        WHERE uuid = old.document_id;
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS chunks_stats_update AFTER UPDATE OF content, document_id ON chunks BEGIN
+                        UPDATE documents SET chunk_count = chunk_count - 1,
+                            content_bytes = content_bytes - COALESCE(LENGTH(CAST(old.content AS BLOB)), 0)
+                        WHERE uuid = old.document_id;
+                        UPDATE documents SET chunk_count = chunk_count + 1,
+                            content_bytes = content_bytes + COALESCE(LENGTH(CAST(new.content AS BLOB)), 0)
+                        WHERE uuid = new.document_id;
+                    END
+                """)
+                conn.execute("""
+                    UPDATE documents SET
+                        chunk_count = (SELECT COUNT(*) FROM chunks WHERE document_id = documents.uuid),
+                        content_bytes = (
+                            SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0)
+                            FROM chunks WHERE document_id = documents.uuid
+                        )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_chunks ON documents(chunk_count, uuid)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_size ON documents(content_bytes, uuid)")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    @classmethod
+    def _init_fts(cls, cursor: sqlite3.Cursor) -> None:
+        """创建名称 / 路径的 FTS5 trigram 索引，由触发器与 documents 表保持同步
+
+        trigram 分词支持任意子串匹配 (至少 3 个字符)；SQLite 低于 3.34 或未编译 FTS5 时跳过，
+        搜索退回 LIKE 扫描。索引行以 documents 的 rowid 关联。
+        """
+        if cls.has_fts(cursor.connection):
+            return
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE documents_fts USING fts5(name, path, tokenize = 'trigram')")
+        except sqlite3.OperationalError:
+            return
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts (rowid, name, path) VALUES (new.rowid, new.name, new.path);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+                DELETE FROM documents_fts WHERE rowid = old.rowid;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF name, path ON documents BEGIN
+                UPDATE documents_fts SET name = new.name, path = new.path WHERE rowid = old.rowid;
+            END
+        """)
+        cls.rebuild_fts(cursor.connection, commit=False)
+
+    @staticmethod
+    def has_fts(conn: sqlite3.Connection) -> bool:
+        """数据库中是否存在名称 / 路径全文索引"""
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'"
+        ).fetchone() is not None
+
+    @classmethod
+    def rebuild_fts(cls, conn: sqlite3.Connection | None = None, commit: bool = True) -> None:
+        """按 documents 表重建全文索引
+
+        VACUUM 可能重新编号没有 INTEGER PRIMARY KEY 的表的 rowid，执行 VACUUM 后需调用此方法。
+        """
+        conn = conn or cls.get_conn()
+        if not cls.has_fts(conn):
+            return
+        conn.execute("DELETE FROM documents_fts")
+        conn.execute("INSERT INTO documents_fts (rowid, name, path) SELECT rowid, name, path FROM documents")
+        if commit:
+            conn.commit()
+
+    @classmethod
+    def page_stats(cls) -> dict:
+        """当前知识库数据库的页统计
+
+        返回:
+            dict: pages (总页数)、free_pages (空闲页数)、page_size (字节)
+        """
+        conn = cls.get_conn()
+        return {
+            "pages": conn.execute("PRAGMA page_count").fetchone()[0],
+            "free_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+        }
+
+    @classmethod
+    def optimize(cls) -> None:
+        """整理当前知识库的数据库文件
+
+        VACUUM 回收空闲页，随后重建全文索引；重建释放的旧索引页再由一次 VACUUM 回收，
+        否则整理后仍留有空闲页，自动压缩会被再次触发。ANALYZE 与 PRAGMA optimize 更新查询规划统计，
+        最后将 WAL 写回主文件并截断。VACUUM 不能在事务中执行，先提交当前连接上未完成的事务。
+        """
+        conn = cls.get_conn()
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        cls.rebuild_fts(conn)
+        if conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            conn.execute("VACUUM")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
@@ -0,0 +1,32 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class StoreExecutor:
+    """异步安全的存储访问层
+
+    所有 SQLite / 向量库操作都提交到同一个单线程执行器串行执行：
+    事件循环不被阻塞，而共享的 SQLite 连接也不会被并发使用。
+    网络调用 (Embedding / 聊天模型) 应直接在事件循环上并发执行，不要放入这里。
+    """
+    _executor: ThreadPoolExecutor = None
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-store")
+        return cls._executor
+
+    @classmethod
+    async def run(cls, fn: Callable, *args, **kwargs) -> Any:
+        """在存储线程中执行 fn(*args, **kwargs) 并等待结果"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.get_executor(), functools.partial(fn, *args, **kwargs))
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=True)
+            cls._executor = None
@@ -0,0 +1,283 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from x1ayu_rag.config.app_config import load_config
+from x1ayu_rag.config.constants import (
+    MILVUS_DB_NAME,
+    MILVUS_DELETE_COUNTER_SUFFIX,
+    NUMPY_STORE_DIR_NAME,
+    PROJECTION_FILE_NAME,
+    VECTOR_STATE_FILE_NAME,
+)
+from x1ayu_rag.config.kb_context import current_kb, kb_dir, kb_path
+from x1ayu_rag.error.exceptions import ConfigurationError
+from x1ayu_rag.utils.path_utils import write_json_atomic
+
+if TYPE_CHECKING:
+    from x1ayu_rag.db.vector_store import VectorStore
+
+
+class VectorDB:
+    """向量存储入口
+
+    根据 config.json 中的 vector.backend 选择后端：
+    - milvus (默认): Milvus Lite
+    - numpy: 内存映射 .npy 矩阵 + SQLite 映射，启动开销极低
+
+    向量集合带有模型标签：vectors.json 记录当前集合的位置 (Milvus Lite 文件或 NumPy 目录)
+    及建立集合时的 embedding 配置。config.json 中的 Embedding 模型变更后，检索与摄取仍使用
+    集合自身的模型，直到 rag reindex 在影子集合中重建完成并切换。
+
+    每个知识库 (kb_context) 有各自的 vectors.json、集合与投影，打开的向量库按知识库缓存。
+    """
+    # 知识库名称 -> 已打开的向量库
+    _vector_stores: Dict[str, VectorStore] = {}
+    # 打开向量库时 vectors.json 的 (mtime_ns, size)，其他进程切换集合后据此重新打开
+    _state_stamps: Dict[str, Optional[tuple]] = {}
+    # 联邦检索时多个线程可能同时打开向量库
+    _lock = threading.RLock()
+
+    BACKENDS = ("milvus", "numpy")
+    # 未打标签 (旧版本) 的集合所在位置，相对于配置目录
+    DEFAULT_LOCATIONS = {"milvus": MILVUS_DB_NAME, "numpy": NUMPY_STORE_DIR_NAME}
+
+    @classmethod
+    def get_backend(cls) -> str:
+        backend = str(load_config().get("vector", {}).get("backend", "milvus")).lower()
+        if backend not in cls.BACKENDS:
+            raise ConfigurationError(f"Unsupported vector backend: {backend}")
+        return backend
+
+    # ---- 集合标签 ----
+
+    @staticmethod
+    def _state_file_stamp() -> Optional[tuple]:
+        try:
+            st = os.stat(kb_path(VECTOR_STATE_FILE_NAME))
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    @classmethod
+    def load_state(cls) -> Dict[str, Any]:
+        """读取 vectors.json (不存在时返回空字典)"""
+        try:
+            with open(kb_path(VECTOR_STATE_FILE_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @classmethod
+    def save_state(cls, state: Dict[str, Any]) -> None:
+        """原子写入 vectors.json (切换集合的提交点)"""
+        os.makedirs(kb_dir(), exist_ok=True)
+        write_json_atomic(kb_path(VECTOR_STATE_FILE_NAME), state)
+
+    @classmethod
+    def make_tag(cls, backend: str, location: str, emb_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """生成集合标签
+
+        参数:
+            backend: 向量库后端
+            location: 集合位置 (相对于知识库数据目录的文件或目录名)
+            emb_config: 建立集合所用的 embedding 配置段，默认取 config.json 中的配置
+        """
+        from x1ayu_rag.llm.factory import LLMFactory
+        if emb_config is None:
+            emb_config = load_config().get("embedding") or {}
+        return {
+            "backend": backend,
+            "location": location,
+            "embedding": dict(emb_config),
+            "identity": LLMFactory.embedding_identity({"embedding": emb_config}),
+            "tagged_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    @classmethod
+    def active_collection(cls) -> Dict[str, Any]:
+        """当前向量集合的标签
+
+        旧版本的数据目录没有 vectors.json (或 config 切换了后端) 时，
+        返回按当前 embedding 配置为该后端默认位置生成的标签，但不写入 vectors.json
+        (只读的检索不改动状态文件，其他进程据其时间戳判断集合是否切换)，见 tag_active。
+
+        返回:
+            dict: backend, location, embedding (配置段), identity (模型身份)
+        """
+        backend = cls.get_backend()
+        active = cls.load_state().get("active")
+        if active is None or active.get("backend") != backend:
+            return cls.make_tag(backend, cls.DEFAULT_LOCATIONS[backend])
+        return active
+
+    @classmethod
+    def tag_active(cls) -> Dict[str, Any]:
+        """为尚未打标签的当前集合写入标签 (在摄取、重建等写入向量的操作开始时调用)
+
+        返回:
+            dict: 当前集合的标签
+        """
+        state = cls.load_state()
+        active = cls.active_collection()
+        if state.get("active") != active:
+            state["active"] = active
+            cls.save_state(state)
+        return active
+
+    @classmethod
+    def retag(cls) -> None:
+        """按当前 embedding 配置重新标记当前集合 (集合已用该模型整体重建后调用)"""
+        state = cls.load_state()
+        active = cls.active_collection()
+        state["active"] = cls.make_tag(active["backend"], active["location"])
+        cls.save_state(state)
+
+    @classmethod
+    def pending_model_change(cls) -> Optional[Dict[str, Any]]:
+        """config.json 中的 Embedding 模型与当前集合不一致时返回两者的身份，否则返回 None
+
+        返回:
+            dict: {"collection": 集合的模型身份, "config": 配置中的模型身份}
+        """
+        from x1ayu_rag.llm.factory import LLMFactory
+        active = cls.load_state().get("active")
+        if active is None:
+            return None
+        configured = LLMFactory.embedding_identity(load_config())
+        if active.get("identity") == configured:
+            return None
+        return {"collection": active.get("identity"), "config": configured}
+
+    @staticmethod
+    def location_path(location: str) -> str:
+        return kb_path(location)
+
+    @classmethod
+    def new_location(cls, backend: str, tag: str) -> str:
+        """在后端默认位置名后加上 tag 生成新集合的位置 (如 milvus-<tag>.db)"""
+        base = cls.DEFAULT_LOCATIONS[backend]
+        if base.endswith(".db"):
+            return f"{base[:-3]}-{tag}.db"
+        return f"{base}-{tag}"
+
+    @classmethod
+    def projection_path(cls, location: Optional[str] = None) -> str:
+        """集合的降维投影文件 (默认为当前集合)
+
+        投影属于集合本身，随集合一同切换与删除；后端默认位置的集合沿用旧版本的 projection.npz。
+        """
+        location = location or cls.active_collection()["location"]
+        if location in cls.DEFAULT_LOCATIONS.values():
+            return kb_path(PROJECTION_FILE_NAME)
+        return kb_path(f"{location}.{PROJECTION_FILE_NAME}")
+
+    @classmethod
+    def remove_location(cls, location: str) -> None:
+        """删除集合的数据文件 (Milvus Lite 文件及其删除计数，或 NumPy 目录) 与降维投影"""
+        path = cls.location_path(location)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+        for extra in (path + MILVUS_DELETE_COUNTER_SUFFIX, cls.projection_path(location)):
+            if os.path.exists(extra):
+                os.remove(extra)
+
+    @classmethod
+    def switch_collection(cls, tag: Dict[str, Any]) -> None:
+        """原子替换 vectors.json 切换到 tag 所指的集合
+
+        原集合记入 retired，由 ReindexService.cleanup_retired 在常驻服务停止后删除。
+        """
+        state = cls.load_state()
+        previous = state.get("active") or cls.active_collection()
+        state["active"] = tag
+        if previous.get("location") and previous["location"] != tag["location"]:
+            state.setdefault("retired", []).append(previous["location"])
+        cls.save_state(state)
+        cls.reset()
+
+    # ---- 打开集合 ----
+
+    @classmethod
+    def get_model_embeddings(cls):
+        """当前集合所用的 Embedding 模型 (不含降维投影)
+
+        config.json 中的模型与集合标签一致时使用最新配置 (地址、密钥等可随时修改)，
+        否则使用建立集合时的配置，保证查询向量与集合处于同一向量空间。
+        """
+        from x1ayu_rag.llm.factory import LLMFactory
+        active = cls.active_collection()
+        if active["identity"] == LLMFactory.embedding_identity():
+            return LLMFactory.get_embeddings()
+        return LLMFactory.get_embeddings(active["embedding"])
+
+    @classmethod
+    def get_embeddings(cls):
+        """获取向量库使用的 Embedding 模型（如存在降维投影则自动套用）"""
+        from x1ayu_rag.llm.projection import Projection, ProjectedEmbeddings
+
+        embeddings = cls.get_model_embeddings()
+        projection = Projection.load_if_exists(cls.projection_path())
+        if projection:
+            return ProjectedEmbeddings(embeddings, projection)
+        return embeddings
+
+    @classmethod
+    def open_store(
+        cls, backend: str, location: str, embeddings, vector_config: Optional[Dict[str, Any]] = None
+    ) -> VectorStore:
+        """打开指定位置的集合 (用于当前集合与重建索引、压缩、导入时新建的集合)
+
+        参数:
+            vector_config: 建立索引所用的 vector 配置段，默认取 config.json 中的配置
+        """
+        if backend == "numpy":
+            from x1ayu_rag.db.numpy_db import NumpyVectorStore
+            return NumpyVectorStore(embeddings, cls.location_path(location))
+        from x1ayu_rag.db.milvus_db import MilvusDB
+        return MilvusDB.create_vector_store(embeddings, cls.location_path(location), vector_config)
+
+    @classmethod
+    def get_vector_store(cls) -> VectorStore:
+        """当前知识库的向量库 (首次访问时打开并缓存)"""
+        kb = current_kb()
+        with cls._lock:
+            stamp = cls._state_file_stamp()
+            if kb in cls._vector_stores and stamp != cls._state_stamps.get(kb):
+                # 其他进程 (rag reindex) 切换了集合
+                cls.reset()
+            if kb not in cls._vector_stores:
+                from x1ayu_rag.utils.profiling import span
+                # 按需导入后端，numpy 后端无需加载 pymilvus
+                with span("vector.open"):
+                    active = cls.active_collection()
+                    cls._vector_stores[kb] = cls.open_store(active["backend"], active["location"], cls.get_embeddings())
+                cls._state_stamps[kb] = cls._state_file_stamp()
+            return cls._vector_stores[kb]
+
+    @classmethod
+    def reset(cls):
+        """关闭并丢弃当前知识库缓存的向量库实例，下次访问时按最新配置重建"""
+        kb = current_kb()
+        with cls._lock:
+            store = cls._vector_stores.pop(kb, None)
+            cls._state_stamps.pop(kb, None)
+        if store is not None:
+            try:
+                store.close()
+            except Exception:
+                # 关闭失败不影响重新打开 (如集合文件已被删除)
+                pass
+
+    @classmethod
+    def reset_all(cls):
+        """关闭所有知识库的向量库实例 (配置变更后)"""
+        from x1ayu_rag.config.kb_context import use_kb
+        for kb in list(cls._vector_stores):
+            with use_kb(kb):
+                cls.reset()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Tuple
+import numpy as np
+from langchain_core.documents import Document as LC_Document
+from langchain_core.embeddings import Embeddings
+
+# 记录字段名 (iter_records 返回的每条记录均包含这些键及元数据字段)
+PRIMARY_FIELD = "pk"
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+
+
+class VectorStore(ABC):
+    """向量存储后端接口
+
+    ChunkRepository 只依赖该接口，具体后端 (Milvus / NumPy) 由 VectorDB 按配置选择。
+    检索结果中的 LangChain Document 的 id 均为分块 pkid。
+    """
+
+    embeddings: Embeddings
+
+    @abstractmethod
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+    ) -> None:
+        """写入已计算好的向量"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        """按 ID 删除向量"""
+
+    @abstractmethod
+    def search_by_vectors(
+        self, vectors: List[List[float]], k: int
+    ) -> List[List[Tuple[LC_Document, float]]]:
+        """批量向量检索
+
+        返回:
+            每个查询向量对应一组 (Document, L2 距离平方) 列表，按距离升序
+        """
+
+    @abstractmethod
+    def search_with_vectors(
+        self, vectors: List[List[float]], k: int
+    ) -> List[Tuple[List[Tuple[LC_Document, float]], np.ndarray]]:
+        """批量向量检索，同时返回命中记录的已存储向量
+
+        返回:
+            每个查询向量对应 (hits, matrix)：hits 同 search_by_vectors，
+            matrix 为形状 (len(hits), dim) 的命中向量矩阵，行与 hits 一一对应
+        """
+
+    @abstractmethod
+    def get_by_ids(self, ids: List[str]) -> List[LC_Document]:
+        """按 ID 取回文档 (不含向量)，不存在的 ID 被忽略"""
+
+    @abstractmethod
+    def iter_records(self, batch_size: int = 1000, with_vectors: bool = True) -> Iterator[List[Dict[str, Any]]]:
+        """分批遍历全部记录"""
+
+    def iter_ids(self, batch_size: int = 1000) -> Iterator[List[str]]:
+        """分批遍历全部主键 (不读取向量)"""
+        for batch in self.iter_records(batch_size, with_vectors=False):
+            yield [r[PRIMARY_FIELD] for r in batch]
+
+    @abstractmethod
+    def drop(self) -> None:
+        """删除全部数据"""
+
+    def close(self) -> None:
+        """释放连接与文件占用 (之后不应再使用该实例)"""
+
+    def stats(self) -> Dict[str, Any]:
+        """存储统计
+
+        返回:
+            dict: rows (存活记录数)、deleted (上次压缩以来删除的记录数，后端无法统计时为 None)
+        """
+        return {"rows": sum(len(batch) for batch in self.iter_ids()), "deleted": None}
+
+    def compact(self) -> int:
+        """回收已删除记录占用的空间
+
+        返回:
+            int: 回收的记录数
+        """
+        return 0
+
+    def rebuild_index(self) -> None:
+        """按当前数据重建检索索引 (没有索引的后端为空操作)"""
+
+    def add_documents(self, documents: List[LC_Document], ids: List[str]) -> None:
+        """嵌入并写入文档"""
+        if not documents:
+            return
+        texts = [doc.page_content for doc in documents]
+        self.add_embeddings(
+            texts=texts,
+            embeddings=self.embeddings.embed_documents(texts),
+            metadatas=[dict(doc.metadata or {}) for doc in documents],
+            ids=ids,
+        )
+
+    def similarity_search(self, query: str, k: int = 4) -> List[LC_Document]:
+        """按文本检索最相似的 k 个文档"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[LC_Document, float]]:
+        """按文本检索最相似的 k 个文档及其 L2 距离平方"""
+        return self.search_by_vectors([self.embeddings.embed_query(query)], k)[0]
@@ -20,3 +20,15 @@ class ModelConnectionError(RAGError):
 class DatabaseError(RAGError):
     """Raised when a database operation fails."""
     pass
+
+class DaemonError(RAGError):
+    """Raised when communication with the local daemon fails."""
+    pass
+
+class BundleError(RAGError):
+    """Raised when a knowledge base bundle is invalid or incompatible."""
+    pass
+
+class ReindexError(RAGError):
+    """Raised when re-embedding into a shadow collection cannot start or complete."""
+    pass
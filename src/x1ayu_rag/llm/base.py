@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
 
@@ -7,16 +7,30 @@ class ChatModelProvider(ABC):
     """聊天模型提供商接口"""
     
     @abstractmethod
-    def get_chat_model(self, config: Dict[str, Any]) -> BaseChatModel:
-        """获取聊天模型实例"""
+    def get_chat_model(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> BaseChatModel:
+        """获取聊天模型实例
+
+        参数:
+            config: chat 配置
+            http_options: HTTP 连接池设置，见 llm.http_pool
+        """
         pass
 
 class EmbeddingModelProvider(ABC):
     """Embedding 模型提供商接口"""
 
+    # 模型对查询使用单独的指令或前缀时为 True：批量查询只能逐条 embed_query，
+    # 否则 (embed_query 即 embed_documents([text])[0]) 批量查询走批量的 embed_documents
+    QUERY_INSTRUCTION = False
+
     @abstractmethod
-    def get_embeddings(self, config: Dict[str, Any]) -> Embeddings:
-        """获取 Embedding 模型实例"""
+    def get_embeddings(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> Embeddings:
+        """获取 Embedding 模型实例
+
+        参数:
+            config: embedding 配置
+            http_options: HTTP 连接池设置，见 llm.http_pool
+        """
         pass
 
 class LLMProvider(ChatModelProvider, EmbeddingModelProvider):
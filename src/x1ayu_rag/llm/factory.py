@@ -1,37 +1,124 @@
-from typing import Optional, Union, Type
-from langchain_core.language_models import BaseChatModel
-from langchain_core.embeddings import Embeddings
+from __future__ import annotations
+import hashlib
+import importlib
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union, Type
 from x1ayu_rag.config.app_config import load_config
-from x1ayu_rag.llm.base import ChatModelProvider, EmbeddingModelProvider
-from x1ayu_rag.llm.openai_provider import OpenAIProvider
-from x1ayu_rag.llm.ollama_provider import OllamaProvider
+from x1ayu_rag.config.constants import CONFIG_FILE_PATH
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.embeddings import Embeddings
+    from x1ayu_rag.llm.base import ChatModelProvider, EmbeddingModelProvider
 
 class LLMFactory:
-    """LLM 工厂类"""
-    
+    """LLM 工厂类
+
+    - 提供商注册表：名称 -> "模块:类名"，按需导入，可通过 register_provider 扩展
+    - 客户端缓存：按配置指纹 (提供商配置 + HTTP 连接池设置) 缓存模型实例，
+      同一配置的多次调用复用同一客户端及其 keep-alive 连接
+    - config.json 仅在 mtime 变化时重新读取，并丢弃指纹已失效的客户端
+    - Embedding 客户端包装为 ResilientEmbeddings，按提供商限流、重试并拆分失败批次
+    """
+
+    # 提供商实现按需导入 ("模块:类名")，校验配置时无需加载 LangChain 集成包
     _providers = {
-        "openai": OpenAIProvider,
-        "ollama": OllamaProvider
+        "openai": "x1ayu_rag.llm.openai_provider:OpenAIProvider",
+        "ollama": "x1ayu_rag.llm.ollama_provider:OllamaProvider",
+        # 离线提供商 (基准测试 / CI)，无需模型服务
+        "hash": "x1ayu_rag.llm.offline_provider:HashProvider",
+        "echo": "x1ayu_rag.llm.offline_provider:EchoProvider",
     }
+    # 不访问网络的提供商，配置中只需 provider
+    _offline_providers = {"hash", "echo"}
+
+    # (类型, 指纹) -> 模型实例
+    _clients: Dict[tuple, Any] = {}
+    # (mtime_ns, size) 与对应的配置
+    _config_stamp: Optional[tuple] = None
+    _config: Dict[str, Any] = {}
+
+    @classmethod
+    def register_provider(cls, name: str, target: str) -> None:
+        """注册提供商
+
+        参数:
+            name: 提供商名称 (config.json 中的 provider)
+            target: 实现类路径，格式为 "模块:类名"
+        """
+        cls._providers[name.lower()] = target
 
     @classmethod
     def get_provider(cls, provider_name: str) -> Union[ChatModelProvider, EmbeddingModelProvider]:
-        provider_cls = cls._providers.get(provider_name.lower())
-        if not provider_cls:
+        target = cls._providers.get(provider_name.lower())
+        if not target:
             raise ValueError(f"Unsupported provider: {provider_name}")
+        module_name, class_name = target.split(":")
+        provider_cls = getattr(importlib.import_module(module_name), class_name)
         return provider_cls()
 
+    @classmethod
+    def _load_config(cls) -> Dict[str, Any]:
+        """读取配置 (文件未变化时直接返回缓存)"""
+        try:
+            st = os.stat(CONFIG_FILE_PATH)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        from x1ayu_rag.utils.metrics import CACHE_REQUESTS
+        hit = stamp is not None and stamp == cls._config_stamp
+        CACHE_REQUESTS.inc(cache="config", result="hit" if hit else "miss")
+        if not hit:
+            cls._config = load_config()
+            cls._config_stamp = stamp
+            cls._evict_stale()
+        return cls._config
+
+    @classmethod
+    def _fingerprint(cls, section: str, config: Optional[Dict[str, Any]] = None) -> str:
+        """计算某类客户端的配置指纹"""
+        from x1ayu_rag.llm.http_pool import http_options
+        config = cls._config if config is None else config
+        payload = {"model": config.get(section, {}), "http": http_options(config)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _evict_stale(cls) -> None:
+        """丢弃与当前配置指纹不符的客户端，并关闭不再使用的 HTTP 连接池"""
+        from x1ayu_rag.llm.http_pool import HttpClientPool, http_options
+        current = {(kind, cls._fingerprint(kind)) for kind in ("chat", "embedding")}
+        for key in [k for k in cls._clients if k not in current]:
+            del cls._clients[key]
+        HttpClientPool.close_stale([http_options(cls._config)])
+
+    @classmethod
+    def _count_client_lookup(cls, key: tuple) -> None:
+        from x1ayu_rag.utils.metrics import CACHE_REQUESTS
+        CACHE_REQUESTS.inc(cache=f"{key[0]}_client", result="hit" if key in cls._clients else "miss")
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """清空客户端与配置缓存"""
+        from x1ayu_rag.llm.http_pool import HttpClientPool
+        cls._clients.clear()
+        cls._config_stamp = None
+        HttpClientPool.close_all()
+
     @classmethod
     def _validate_config(cls, config: dict, config_type: str):
         """验证配置完整性"""
-        required_fields = ["provider", "model", "base_url"]
         provider = config.get("provider")
-        
+        if provider in cls._offline_providers:
+            required_fields = ["provider"]
+        else:
+            required_fields = ["provider", "model", "base_url"]
+
         # 1. 检查通用必填项
         missing = [f for f in required_fields if not config.get(f)]
         if missing:
             raise ValueError(f"Missing required {config_type} configuration: {', '.join(missing)}")
-            
+
         # 2. OpenAI 特有检查
         if provider == "openai" and not config.get("api_key"):
             raise ValueError(f"Missing required {config_type} configuration: api_key (required for OpenAI)")
@@ -39,7 +126,7 @@ class LLMFactory:
     @classmethod
     def validate_chat_config(cls):
         """校验 Chat 配置"""
-        config = load_config()
+        config = cls._load_config()
         chat_config = config.get("chat", {})
         if not chat_config:
              raise ValueError("Chat configuration is empty. Please run 'rag config' to set it up.")
@@ -48,7 +135,7 @@ class LLMFactory:
     @classmethod
     def validate_embedding_config(cls):
         """校验 Embedding 配置"""
-        config = load_config()
+        config = cls._load_config()
         emb_config = config.get("embedding", {})
         if not emb_config:
              raise ValueError("Embedding configuration is empty. Please run 'rag config' to set it up.")
@@ -56,28 +143,80 @@ class LLMFactory:
 
     @classmethod
     def get_chat_model(cls) -> BaseChatModel:
-        """根据配置获取 Chat 模型"""
+        """根据配置获取 Chat 模型 (按配置指纹复用实例)"""
         cls.validate_chat_config()
-        config = load_config()
-        chat_config = config.get("chat", {})
-        
-        provider_name = chat_config.get("provider")
-        
-        provider = cls.get_provider(provider_name)
-        if not isinstance(provider, ChatModelProvider):
-            raise TypeError(f"Provider {provider_name} does not support Chat operations")
-        return provider.get_chat_model(chat_config)
+        key = ("chat", cls._fingerprint("chat"))
+        cls._count_client_lookup(key)
+        if key not in cls._clients:
+            from x1ayu_rag.llm.base import ChatModelProvider
+            from x1ayu_rag.llm.http_pool import http_options
+            chat_config = cls._config.get("chat", {})
+            provider_name = chat_config.get("provider")
+            provider = cls.get_provider(provider_name)
+            if not isinstance(provider, ChatModelProvider):
+                raise TypeError(f"Provider {provider_name} does not support Chat operations")
+            cls._clients[key] = provider.get_chat_model(chat_config, http_options(cls._config))
+        return cls._clients[key]
 
     @classmethod
-    def get_embeddings(cls) -> Embeddings:
-        """根据配置获取 Embedding 模型"""
-        cls.validate_embedding_config()
-        config = load_config()
-        emb_config = config.get("embedding", {})
-        
-        provider_name = emb_config.get("provider")
-        
-        provider = cls.get_provider(provider_name)
-        if not isinstance(provider, EmbeddingModelProvider):
-             raise TypeError(f"Provider {provider_name} does not support Embedding operations")
-        return provider.get_embeddings(emb_config)
+    def get_embeddings(cls, emb_config: Optional[Dict[str, Any]] = None) -> Embeddings:
+        """根据配置获取 Embedding 模型 (按配置指纹复用实例)
+
+        参数:
+            emb_config: 指定的 embedding 配置段 (如向量集合建立时使用的模型)，默认使用 config.json 中的配置
+        """
+        if emb_config is None:
+            cls.validate_embedding_config()
+            emb_config = cls._config.get("embedding", {})
+        else:
+            cls._load_config()
+            cls._validate_config(emb_config, "embedding")
+        key = ("embedding", cls._fingerprint("embedding", {**cls._config, "embedding": emb_config}))
+        cls._count_client_lookup(key)
+        if key not in cls._clients:
+            from x1ayu_rag.llm.base import EmbeddingModelProvider
+            from x1ayu_rag.llm.http_pool import http_options
+            provider_name = emb_config.get("provider")
+            provider = cls.get_provider(provider_name)
+            if not isinstance(provider, EmbeddingModelProvider):
+                 raise TypeError(f"Provider {provider_name} does not support Embedding operations")
+            from x1ayu_rag.llm.rate_limit import RateLimiter, rate_limit_options
+            from x1ayu_rag.llm.resilient_embeddings import ResilientEmbeddings
+            limiter = RateLimiter.get(
+                provider_name, emb_config.get("base_url"), rate_limit_options({**cls._config, "embedding": emb_config})
+            )
+            cls._clients[key] = ResilientEmbeddings(
+                provider.get_embeddings(emb_config, http_options(cls._config)),
+                limiter,
+                query_instruction=provider.QUERY_INSTRUCTION,
+            )
+        return cls._clients[key]
+
+    # 决定向量空间的 Embedding 配置项 (连接地址、密钥、限流等不影响向量)
+    IDENTITY_FIELDS = ("provider", "model", "dim", "dimensions", "ngram_range")
+
+    @classmethod
+    def embedding_identity(cls, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """当前 Embedding 模型的身份标识 (用于判断两组向量是否可比)
+
+        返回:
+            dict: 提供商、模型名及影响向量的参数，如 {"provider": "ollama", "model": "bge-m3"}
+        """
+        config = cls._load_config() if config is None else config
+        emb_config = config.get("embedding") or {}
+        return {
+            k: list(v) if isinstance(v, tuple) else v
+            for k in cls.IDENTITY_FIELDS
+            if (v := emb_config.get(k)) is not None
+        }
+
+    @classmethod
+    def provider_name(cls, kind: str) -> str:
+        """当前配置中某类模型 (chat / embedding) 的提供商名称，未配置时为空字符串"""
+        return (cls._load_config().get(kind) or {}).get("provider") or ""
+
+    @classmethod
+    def embedding_stats(cls) -> Dict[str, Any]:
+        """Embedding 请求的吞吐与限流计数 (见 RateLimiter.totals)"""
+        from x1ayu_rag.llm.rate_limit import RateLimiter
+        return RateLimiter.totals()
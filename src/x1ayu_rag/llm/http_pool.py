@@ -0,0 +1,146 @@
+from __future__ import annotations
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# 模型客户端 HTTP 连接池默认设置 (可在 config.json 的 http 中覆盖)
+DEFAULT_HTTP_OPTIONS = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,
+    "timeout": 120.0,
+}
+
+
+def http_options(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并默认值与 config.json 中的 http 配置"""
+    return {**DEFAULT_HTTP_OPTIONS, **((config or {}).get("http") or {})}
+
+
+_loop_bound_class = None
+
+
+def _loop_bound_async_client():
+    """按事件循环分派连接的 httpx.AsyncClient 子类 (首次使用时定义，避免启动时导入 httpx)
+
+    httpx.AsyncClient 的连接绑定在创建它们的事件循环上，跨循环复用会出错
+    (如每次 asyncio.run 都是新的循环)。该类本身只作为提供商 SDK 持有的入口，
+    实际请求转交给当前运行循环专属的 AsyncClient；已关闭的循环的客户端在下次请求时丢弃。
+    """
+    global _loop_bound_class
+    if _loop_bound_class is not None:
+        return _loop_bound_class
+    import httpx
+
+    class LoopBoundAsyncClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._client_kwargs = kwargs
+            # 客户端的连接引用着所属循环，不能用弱引用字典，改为按循环是否已关闭清理
+            self._loop_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+            self._loop_lock = threading.Lock()
+
+        def _current(self) -> httpx.AsyncClient:
+            loop = asyncio.get_running_loop()
+            with self._loop_lock:
+                for closed in [lp for lp in self._loop_clients if lp.is_closed()]:
+                    del self._loop_clients[closed]
+                client = self._loop_clients.get(loop)
+                if client is None:
+                    client = self._loop_clients[loop] = httpx.AsyncClient(**self._client_kwargs)
+                return client
+
+        async def send(self, request, **kwargs):
+            return await self._current().send(request, **kwargs)
+
+        async def aclose(self) -> None:
+            """关闭当前循环的客户端"""
+            loop = asyncio.get_running_loop()
+            with self._loop_lock:
+                client = self._loop_clients.pop(loop, None)
+            if client is not None:
+                await client.aclose()
+
+        def close_all(self) -> None:
+            """关闭各循环的客户端：运行中的循环上提交关闭任务，已结束的循环的连接无法再关闭，直接丢弃"""
+            with self._loop_lock:
+                clients = list(self._loop_clients.items())
+                self._loop_clients.clear()
+            for loop, client in clients:
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    _loop_bound_class = LoopBoundAsyncClient
+    return _loop_bound_class
+
+
+class HttpClientPool:
+    """共享的 httpx 连接池
+
+    相同设置的提供商客户端共用同一个 httpx.Client / AsyncClient，
+    跨调用保持 keep-alive 连接。异步客户端按事件循环各自持有连接，见 _loop_bound_async_client。
+    """
+
+    _clients: Dict[Tuple, Any] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(options: Dict[str, Any]) -> Tuple:
+        return tuple(sorted(options.items()))
+
+    @staticmethod
+    def client_kwargs(options: Dict[str, Any]) -> Dict[str, Any]:
+        """构造 httpx 客户端参数 (连接上限与超时)"""
+        import httpx
+        return {
+            "limits": httpx.Limits(
+                max_connections=options["max_connections"],
+                max_keepalive_connections=options["max_keepalive_connections"],
+                keepalive_expiry=options["keepalive_expiry"],
+            ),
+            "timeout": options["timeout"],
+        }
+
+    @classmethod
+    def get_client(cls, options: Dict[str, Any]):
+        key = ("sync", cls._key(options))
+        with cls._lock:
+            if key not in cls._clients:
+                import httpx
+                cls._clients[key] = httpx.Client(**cls.client_kwargs(options))
+            return cls._clients[key]
+
+    @classmethod
+    def get_async_client(cls, options: Dict[str, Any]):
+        key = ("async", cls._key(options))
+        with cls._lock:
+            if key not in cls._clients:
+                cls._clients[key] = _loop_bound_async_client()(**cls.client_kwargs(options))
+            return cls._clients[key]
+
+    @staticmethod
+    def _close(kind: str, client) -> None:
+        if kind == "sync":
+            client.close()
+        else:
+            client.close_all()
+
+    @classmethod
+    def close_stale(cls, current: Iterable[Dict[str, Any]]) -> None:
+        """关闭设置不在 current 中的客户端 (配置变更后被替换的连接池)"""
+        keep = {cls._key(options) for options in current}
+        with cls._lock:
+            stale = [(key, client) for key, client in cls._clients.items() if key[1] not in keep]
+            for key, _ in stale:
+                del cls._clients[key]
+        for (kind, _), client in stale:
+            cls._close(kind, client)
+
+    @classmethod
+    def close_all(cls) -> None:
+        """关闭全部连接池 (异步客户端在其仍在运行的事件循环上关闭)"""
+        with cls._lock:
+            clients = list(cls._clients.items())
+            cls._clients.clear()
+        for (kind, _), client in clients:
+            cls._close(kind, client)
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from x1ayu_rag.llm.base import ChatModelProvider, EmbeddingModelProvider
+
+# 词 (含单个 CJK 字符) 切分
+_WORD_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]|[^\W_]+", re.UNICODE)
+
+
+class HashEmbeddings(Embeddings):
+    """特征哈希 Embedding (离线、确定性)
+
+    将词与字符 n-gram 经 blake2b 哈希到固定维度 (带符号)，累加后 L2 归一化。
+    相同文本总得到相同向量，共享 n-gram 越多的文本距离越近；不需要任何模型服务，
+    用于基准测试与离线 CI。latency_ms 可模拟每次请求的网络耗时。
+    """
+
+    def __init__(self, dim: int = 256, ngram_range: tuple = (2, 4), latency_ms: float = 0.0):
+        self.dim = int(dim)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.latency = float(latency_ms) / 1000
+
+    def _features(self, text: str) -> List[str]:
+        text = text.lower()
+        features = _WORD_PATTERN.findall(text)
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            features.extend(text[i:i + n] for i in range(len(text) - n + 1))
+        return features
+
+    def _matrix(self, texts: List[str]) -> List[List[float]]:
+        """一次性计算整批文本的向量 (所有特征合并后做一次 bincount)"""
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                hashes.append(int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"))
+                rows.append(row)
+        matrix = np.zeros((len(texts), self.dim))
+        if hashes:
+            h = np.array(hashes, dtype=np.uint64)
+            cells = np.array(rows, dtype=np.int64) * self.dim + (h % np.uint64(self.dim)).astype(np.int64)
+            # 取哈希最高位作为符号，使碰撞相互抵消而非累积
+            signs = np.where(h >> np.uint64(63), -1.0, 1.0)
+            matrix = np.bincount(cells, weights=signs, minlength=len(texts) * self.dim).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix.astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._matrix(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._matrix(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class EchoChatModel(BaseChatModel):
+    """回显聊天模型 (离线、确定性)
+
+    回答为最后一条消息的前 max_tokens 个词，按词流式输出。
+    latency_ms 模拟首 Token 延迟，token_latency_ms 模拟逐 Token 间隔。
+    """
+
+    max_tokens: int = 64
+    latency_ms: float = 0.0
+    token_latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        content = messages[-1].content if messages else ""
+        if not isinstance(content, str):
+            content = str(content)
+        return re.findall(r"\S+\s*", content)[: self.max_tokens]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep((self.latency_ms + self.token_latency_ms * len(tokens)) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        for token in self._tokens(messages):
+            time.sleep(self.token_latency_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        for token in self._tokens(messages):
+            await asyncio.sleep(self.token_latency_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class HashProvider(EmbeddingModelProvider):
+    """hash 提供商：离线特征哈希 Embedding
+
+    配置项: dim (默认 256)、ngram_range (默认 [2, 4])、latency_ms (默认 0)
+    """
+
+    def get_embeddings(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> HashEmbeddings:
+        return HashEmbeddings(
+            dim=config.get("dim", 256),
+            ngram_range=tuple(config.get("ngram_range", (2, 4))),
+            latency_ms=config.get("latency_ms", 0.0),
+        )
+
+
+class EchoProvider(ChatModelProvider):
+    """echo 提供商：离线回显聊天模型
+
+    配置项: max_tokens (默认 64)、latency_ms、token_latency_ms (默认 0)
+    """
+
+    def get_chat_model(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> EchoChatModel:
+        return EchoChatModel(
+            max_tokens=config.get("max_tokens", 64),
+            latency_ms=config.get("latency_ms", 0.0),
+            token_latency_ms=config.get("token_latency_ms", 0.0),
+        )
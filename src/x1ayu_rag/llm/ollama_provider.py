@@ -1,19 +1,30 @@
 from typing import Dict, Any, Optional
 from langchain_ollama import ChatOllama, OllamaEmbeddings
 from x1ayu_rag.llm.base import ChatModelProvider, EmbeddingModelProvider
+from x1ayu_rag.llm.http_pool import HttpClientPool, DEFAULT_HTTP_OPTIONS
 
 class OllamaProvider(ChatModelProvider, EmbeddingModelProvider):
-    """Ollama 提供商实现"""
+    """Ollama 提供商实现
 
-    def get_chat_model(self, config: Dict[str, Any]) -> ChatOllama:
+    ollama 客户端自行创建 httpx 客户端，这里只传入连接池上限与超时；
+    实例由 LLMFactory 缓存复用，连接因此保持 keep-alive。
+    """
+
+    @staticmethod
+    def _client_kwargs(http_options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return HttpClientPool.client_kwargs(http_options or DEFAULT_HTTP_OPTIONS)
+
+    def get_chat_model(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> ChatOllama:
         return ChatOllama(
             model=config["model"],
             base_url=config["base_url"],
-            temperature=0
+            temperature=0,
+            client_kwargs=self._client_kwargs(http_options),
         )
 
-    def get_embeddings(self, config: Dict[str, Any]) -> OllamaEmbeddings:
+    def get_embeddings(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> OllamaEmbeddings:
         return OllamaEmbeddings(
             model=config["model"],
-            base_url=config["base_url"]
+            base_url=config["base_url"],
+            client_kwargs=self._client_kwargs(http_options),
         )
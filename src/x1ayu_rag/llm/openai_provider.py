@@ -1,21 +1,37 @@
 from typing import Dict, Any, Optional
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from x1ayu_rag.llm.base import ChatModelProvider, EmbeddingModelProvider
+from x1ayu_rag.llm.http_pool import HttpClientPool, DEFAULT_HTTP_OPTIONS
 
 class OpenAIProvider(ChatModelProvider, EmbeddingModelProvider):
-    """OpenAI 提供商实现"""
+    """OpenAI 提供商实现
 
-    def get_chat_model(self, config: Dict[str, Any]) -> ChatOpenAI:
+    聊天与 Embedding 客户端共用 HttpClientPool 中的 keep-alive 连接池。
+    """
+
+    @staticmethod
+    def _http_clients(http_options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        options = http_options or DEFAULT_HTTP_OPTIONS
+        return {
+            "http_client": HttpClientPool.get_client(options),
+            "http_async_client": HttpClientPool.get_async_client(options),
+        }
+
+    def get_chat_model(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> ChatOpenAI:
         return ChatOpenAI(
             model=config["model"],
             api_key=config["api_key"],
             base_url=config["base_url"],
-            temperature=0
+            temperature=0,
+            **self._http_clients(http_options),
         )
 
-    def get_embeddings(self, config: Dict[str, Any]) -> OpenAIEmbeddings:
+    def get_embeddings(self, config: Dict[str, Any], http_options: Optional[Dict[str, Any]] = None) -> OpenAIEmbeddings:
         return OpenAIEmbeddings(
             model=config["model"],
             api_key=config["api_key"],
-            base_url=config["base_url"]
+            base_url=config["base_url"],
+            # 重试由 ResilientEmbeddings 负责，以便限流错误参与并发调节
+            max_retries=0,
+            **self._http_clients(http_options),
         )
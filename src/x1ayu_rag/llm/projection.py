@@ -0,0 +1,141 @@
+from __future__ import annotations
+import os
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from x1ayu_rag.utils.vector_math import as_matrix
+
+PROJECTION_METHODS = ("pca", "truncate")
+
+
+class Projection:
+    """向量降维投影
+
+    支持两种方式：
+    - pca: 在语料向量上拟合主成分，投影到前 dim 个主成分方向。
+    - truncate: Matryoshka 式截断，保留前 dim 维并重新归一化。
+    """
+
+    def __init__(
+        self,
+        method: str,
+        input_dim: int,
+        output_dim: int,
+        mean: np.ndarray | None = None,
+        components: np.ndarray | None = None,
+    ):
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"Unsupported projection method: {method}")
+        if output_dim <= 0 or output_dim > input_dim:
+            raise ValueError(f"Invalid projection dim {output_dim} for {input_dim}-dim vectors")
+        self.method = method
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.mean = mean
+        self.components = components
+
+    @classmethod
+    def fit_pca(cls, vectors, dim: int) -> Projection:
+        """在给定向量上拟合 PCA 投影"""
+        matrix = as_matrix(vectors).astype(np.float64)
+        n, input_dim = matrix.shape
+        if dim > min(n, input_dim):
+            raise ValueError(f"PCA dim {dim} exceeds min(vectors={n}, dim={input_dim})")
+        mean = matrix.mean(axis=0)
+        # 经济型 SVD：右奇异向量即主成分方向
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls(
+            method="pca",
+            input_dim=input_dim,
+            output_dim=dim,
+            mean=mean.astype(np.float32),
+            components=vt[:dim].astype(np.float32),
+        )
+
+    @classmethod
+    def truncate(cls, input_dim: int, dim: int) -> Projection:
+        """构建 Matryoshka 式截断投影"""
+        return cls(method="truncate", input_dim=input_dim, output_dim=dim)
+
+    def apply(self, vectors) -> np.ndarray:
+        """对向量执行投影，返回 float32 矩阵"""
+        matrix = as_matrix(vectors)
+        if matrix.shape[1] != self.input_dim:
+            raise ValueError(
+                f"Projection expects {self.input_dim}-dim vectors, got {matrix.shape[1]}"
+            )
+        if self.method == "pca":
+            return ((matrix - self.mean) @ self.components.T).astype(np.float32)
+        truncated = matrix[:, : self.output_dim]
+        norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (truncated / norms).astype(np.float32)
+
+    def save(self, path: str) -> None:
+        """保存投影到 .npz 文件"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {
+            "method": np.array(self.method),
+            "input_dim": np.array(self.input_dim),
+            "output_dim": np.array(self.output_dim),
+        }
+        if self.method == "pca":
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components
+        # 先写临时文件再替换，避免中途失败留下损坏的投影
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Projection:
+        """从 .npz 文件加载投影"""
+        with np.load(path) as data:
+            method = str(data["method"])
+            return cls(
+                method=method,
+                input_dim=int(data["input_dim"]),
+                output_dim=int(data["output_dim"]),
+                mean=data["mean"] if "mean" in data else None,
+                components=data["components"] if "components" in data else None,
+            )
+
+    @classmethod
+    def load_if_exists(cls, path: str) -> Projection | None:
+        """投影文件存在时加载，否则返回 None"""
+        if not os.path.exists(path):
+            return None
+        return cls.load(path)
+
+
+class ProjectedEmbeddings(Embeddings):
+    """对底层 Embedding 模型的输出施加降维投影
+
+    文档与查询使用同一投影，保证二者处于同一向量空间。
+    """
+
+    def __init__(self, base: Embeddings, projection: Projection):
+        self.base = base
+        self.projection = projection
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.projection.apply(self.base.embed_documents(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.projection.apply(self.base.embed_query(text))[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        from x1ayu_rag.llm.resilient_embeddings import embed_queries
+        return self.projection.apply(embed_queries(self.base, texts)).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.projection.apply(await self.base.aembed_documents(texts)).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.projection.apply(await self.base.aembed_query(text))[0].tolist()
@@ -0,0 +1,298 @@
+from __future__ import annotations
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Embedding 请求限流与重试默认设置 (可在 config.json 的 embedding.rate_limit 中覆盖)
+DEFAULT_RATE_LIMIT_OPTIONS = {
+    # 每分钟请求数 / Token 数上限，为空表示不限
+    "requests_per_minute": None,
+    "tokens_per_minute": None,
+    # 自适应并发的上限与下限
+    "max_concurrency": 4,
+    "min_concurrency": 1,
+    # 每次请求提交的文本数
+    "batch_size": 64,
+    # 单个批次的最大重试次数及指数退避参数 (秒)
+    "max_retries": 6,
+    "backoff_base": 0.5,
+    "backoff_max": 30.0,
+}
+
+# 错误分类
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+
+# 视为限流的 HTTP 状态码 (Ollama 队列已满时返回 503)
+THROTTLE_STATUS = {429, 503}
+# 可重试的错误类型名片段 (httpx / openai / ollama 的超时与连接错误)
+TRANSIENT_NAME_HINTS = ("Timeout", "Connect", "RemoteProtocol", "ServiceUnavailable")
+# 由请求内容引起的 HTTP 状态码 (请求非法 / 请求体过大 / 无法处理)
+INPUT_ERROR_STATUS = {400, 413, 422}
+# 由请求内容引起的错误类型名片段 (openai 的 BadRequestError / UnprocessableEntityError 等)
+INPUT_ERROR_NAME_HINTS = ("BadRequest", "UnprocessableEntity", "TooLarge")
+
+# 统计计数器
+COUNTER_FIELDS = (
+    "requests", "texts", "tokens", "retries", "throttled", "splits", "failures",
+    "wait_seconds", "active_seconds",
+)
+
+
+def rate_limit_options(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并默认值与 config.json 中的 embedding.rate_limit 配置"""
+    embedding = (config or {}).get("embedding") or {}
+    return {**DEFAULT_RATE_LIMIT_OPTIONS, **(embedding.get("rate_limit") or {})}
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """判断错误是否可重试
+
+    返回:
+        THROTTLED (限流)、TRANSIENT (超时、连接中断、服务端错误) 或 None (不可重试，如输入非法)
+    """
+    for e in (error, error.__cause__):
+        if e is None:
+            continue
+        status = _status_code(e)
+        name = type(e).__name__
+        if status in THROTTLE_STATUS or "RateLimit" in name:
+            return THROTTLED
+        if status is not None and (status >= 500 or status == 408):
+            return TRANSIENT
+        if isinstance(e, (TimeoutError, ConnectionError)) or any(h in name for h in TRANSIENT_NAME_HINTS):
+            return TRANSIENT
+    return None
+
+
+def is_input_error(error: BaseException) -> bool:
+    """错误是否由请求内容引起 (400/413/422 或 BadRequest 类错误)
+
+    鉴权 (401/403)、不存在 (404) 等与输入无关的错误返回 False。
+    """
+    for e in (error, error.__cause__):
+        if e is None:
+            continue
+        status = _status_code(e)
+        if status is not None:
+            return status in INPUT_ERROR_STATUS
+        if any(h in type(e).__name__ for h in INPUT_ERROR_NAME_HINTS):
+            return True
+    return False
+
+
+def is_timeout(error: BaseException) -> bool:
+    """错误是否为超时"""
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """读取响应中的 Retry-After (秒)"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """两次 RateLimiter.totals() 之间的计数差值 (并重新计算吞吐)"""
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in COUNTER_FIELDS}
+    delta["texts_per_second"] = (
+        round(delta["texts"] / delta["active_seconds"], 1) if delta["active_seconds"] > 0 else 0.0
+    )
+    delta["concurrency_limit"] = after.get("concurrency_limit")
+    return delta
+
+
+class TokenBucket:
+    """令牌桶
+
+    以 per_minute / 60 的速率补充令牌，容量为一分钟的额度。
+    reserve 允许透支并返回需要等待的秒数，同步与异步调用方各自 sleep 即可。
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+
+class AIMDLimiter:
+    """AIMD 自适应并发上限
+
+    每次成功请求使上限增加 1/limit (约每轮 +1)，遇到限流时减半，范围 [minimum, maximum]。
+    """
+
+    # 异步获取并发槽位时的轮询间隔 (秒)
+    POLL_INTERVAL = 0.02
+
+    def __init__(self, maximum: int, minimum: int = 1):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    def release(self, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """单个 Embedding 提供商的限流器
+
+    组合请求数 / Token 数令牌桶与 AIMD 并发上限，并提供带抖动的指数退避与统计计数。
+    同一提供商 (提供商名 + base_url + 限流设置) 的所有客户端共用一个实例。
+    """
+
+    _instances: Dict[Tuple, "RateLimiter"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, options: Dict[str, Any], provider: str = ""):
+        self.options = options
+        self.provider = provider
+        rpm, tpm = options.get("requests_per_minute"), options.get("tokens_per_minute")
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.concurrency = AIMDLimiter(options["max_concurrency"], options["min_concurrency"])
+        self._counters = dict.fromkeys(COUNTER_FIELDS, 0)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._active_since = 0.0
+
+    @classmethod
+    def get(cls, provider: str, base_url: str, options: Dict[str, Any]) -> "RateLimiter":
+        key = (provider, base_url, tuple(sorted(options.items())))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(options, provider)
+            return cls._instances[key]
+
+    @classmethod
+    def totals(cls) -> Dict[str, Any]:
+        """汇总所有限流器的计数 (供 CLI / 服务展示)"""
+        totals: Dict[str, Any] = dict.fromkeys(COUNTER_FIELDS, 0)
+        limits = []
+        with cls._instances_lock:
+            limiters = list(cls._instances.values())
+        for limiter in limiters:
+            for k, v in limiter.stats().items():
+                if k in totals:
+                    totals[k] += v
+            limits.append(limiter.concurrency.limit)
+        totals["concurrency_limit"] = round(min(limits), 2) if limits else None
+        totals["texts_per_second"] = (
+            round(totals["texts"] / totals["active_seconds"], 1) if totals["active_seconds"] > 0 else 0.0
+        )
+        return totals
+
+    # ---- 统计 ----
+
+    def count(self, **increments: float) -> None:
+        with self._lock:
+            for k, v in increments.items():
+                self._counters[k] += v
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            if self._active:
+                counters["active_seconds"] += time.monotonic() - self._active_since
+        counters["concurrency_limit"] = round(self.concurrency.limit, 2)
+        return counters
+
+    def _begin(self) -> None:
+        with self._lock:
+            if self._active == 0:
+                self._active_since = time.monotonic()
+            self._active += 1
+
+    def _end(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._counters["active_seconds"] += time.monotonic() - self._active_since
+
+    # ---- 限流与退避 ----
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        if wait:
+            self.count(wait_seconds=wait)
+        return wait
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """第 attempt 次重试前的等待秒数 (全抖动指数退避，优先遵循 Retry-After)"""
+        delay = retry_after(error)
+        if delay is None:
+            ceiling = min(self.options["backoff_max"], self.options["backoff_base"] * 2 ** attempt)
+            delay = random.uniform(0, ceiling)
+        self.count(wait_seconds=delay)
+        return delay
+
+    def acquire(self, tokens: int) -> None:
+        """等待令牌与并发槽位 (同步)"""
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        self.concurrency.acquire()
+        self._begin()
+
+    async def aacquire(self, tokens: int) -> None:
+        """等待令牌与并发槽位 (异步)"""
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+        await self.concurrency.aacquire()
+        self._begin()
+
+    def release(self, throttled: bool = False) -> None:
+        self._end()
+        self.concurrency.release(throttled)
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from x1ayu_rag.chain.context_packer import TokenCounter
+from x1ayu_rag.error.exceptions import ModelConnectionError
+from x1ayu_rag.llm.rate_limit import THROTTLED, RateLimiter, classify_error, is_input_error, is_timeout
+from x1ayu_rag.utils.metrics import (
+    EMBEDDING_REQUESTS, EMBEDDING_RETRIES, EMBEDDING_TEXTS, EMBEDDING_TOKENS, PROVIDER_ERRORS,
+)
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """按查询方式嵌入多条文本
+
+    包装类 (ResilientEmbeddings / ProjectedEmbeddings) 提供 embed_queries：查询与文档嵌入方式相同的模型
+    走批量的 embed_documents，带查询指令的模型并发逐条 embed_query。其余模型逐条调用 embed_query。
+    """
+    batch = getattr(embeddings, "embed_queries", None)
+    if batch is not None:
+        return batch(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def _splittable(error: Exception) -> bool:
+    """输入引起的错误 (可能是某条输入非法) 或超时 (批次过大) 时拆分批次，其他错误 (鉴权、不存在等) 直接抛出"""
+    return is_input_error(error) or is_timeout(error)
+
+
+class ResilientEmbeddings(Embeddings):
+    """带限流、重试与失败批次拆分的 Embedding 包装
+
+    - 文本按 batch_size 分批，每批请求前等待令牌桶与 AIMD 并发槽位
+    - 限流 (429/503) 与超时等临时错误按带抖动的指数退避重试，限流同时使并发上限减半
+    - 输入引起的错误 (400/413/422) 与重试耗尽的超时将批次对半拆分重试，以定位出错的单条输入；
+      单条输入仍失败时抛出 ModelConnectionError 并指明其序号。鉴权 (401/403)、不存在 (404)
+      等其他不可重试的错误直接抛出
+    - 同一批次拆分出的各子批次共享 max_retries 次超时重试，耗尽后子批次超时即继续拆分
+    - 异步接口并发提交各批次，并发数由 AIMD 上限控制
+    - 批量查询 (embed_queries) 与文档同样分批；仅 query_instruction 为 True (模型对查询另加指令) 时逐条嵌入
+    """
+
+    def __init__(self, inner: Embeddings, limiter: RateLimiter, query_instruction: bool = False):
+        self.inner = inner
+        self.limiter = limiter
+        self.query_instruction = query_instruction
+        self._counter = TokenCounter()
+
+    def _tokens(self, texts: List[str]) -> int:
+        return sum(self._counter.count(t) for t in texts)
+
+    def _batches(self, texts: List[str]):
+        size = max(1, int(self.limiter.options["batch_size"]))
+        return [(start, texts[start:start + size]) for start in range(0, len(texts), size)]
+
+    def _record_success(self, texts: List[str], tokens: int) -> None:
+        self.limiter.count(requests=1, texts=len(texts), tokens=tokens)
+        provider = self.limiter.provider
+        EMBEDDING_REQUESTS.inc(provider=provider)
+        EMBEDDING_TEXTS.inc(len(texts), provider=provider)
+        EMBEDDING_TOKENS.inc(tokens, provider=provider)
+
+    def _timeout_budget(self) -> Dict[str, int]:
+        """一个批次 (连同拆分出的子批次) 共享的超时重试次数"""
+        return {"timeouts": int(self.limiter.options["max_retries"])}
+
+    def _record_failure(self, error: Exception, attempt: int, budget: Optional[Dict[str, int]] = None) -> None:
+        """记录失败；不可重试、重试次数耗尽或超时重试次数 (budget) 耗尽时重新抛出"""
+        PROVIDER_ERRORS.inc(kind="embedding", provider=self.limiter.provider, error=type(error).__name__)
+        kind = classify_error(error)
+        if kind == THROTTLED:
+            self.limiter.count(throttled=1)
+        exhausted = attempt >= self.limiter.options["max_retries"]
+        if budget is not None and is_timeout(error):
+            exhausted = exhausted or budget["timeouts"] <= 0
+            budget["timeouts"] -= 1
+        if kind is None or exhausted:
+            self.limiter.count(failures=1)
+            raise error
+        self.limiter.count(retries=1)
+        EMBEDDING_RETRIES.inc(provider=self.limiter.provider)
+
+    # ---- 同步 ----
+
+    def _call(self, fn: Callable[[], list], texts: List[str], budget: Optional[Dict[str, int]] = None):
+        tokens = self._tokens(texts)
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                self.limiter.release(throttled=classify_error(e) == THROTTLED)
+                self._record_failure(e, attempt, budget)
+                time.sleep(self.limiter.backoff(attempt, e))
+                attempt += 1
+                continue
+            self.limiter.release()
+            self._record_success(texts, tokens)
+            return result
+
+    def _embed_batch(self, texts: List[str], offset: int, budget: Dict[str, int]) -> List[List[float]]:
+        try:
+            return self._call(lambda: self.inner.embed_documents(texts), texts, budget)
+        except Exception as e:
+            if not _splittable(e):
+                raise
+            if len(texts) == 1:
+                raise ModelConnectionError(f"Embedding failed for input #{offset}: {e}", e)
+        self.limiter.count(splits=1)
+        mid = len(texts) // 2
+        return self._embed_batch(texts[:mid], offset, budget) + self._embed_batch(texts[mid:], offset + mid, budget)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start, batch in self._batches(texts):
+            vectors.extend(self._embed_batch(batch, start, self._timeout_budget()))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(lambda: self.inner.embed_query(text), [text])
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """批量嵌入查询
+
+        查询与文档嵌入方式相同时走 embed_documents (分批、限流与失败拆分)；
+        模型带查询指令时逐条 embed_query，并发数不超过 AIMD 并发上限 (提供商没有批量的查询嵌入接口)。
+        """
+        if not self.query_instruction:
+            return self.embed_documents(texts)
+        if len(texts) <= 1:
+            return [self.embed_query(text) for text in texts]
+        workers = min(len(texts), max(1, int(self.limiter.options["max_concurrency"])))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-embed") as pool:
+            return list(pool.map(self.embed_query, texts))
+
+    # ---- 异步 ----
+
+    async def _acall(self, fn: Callable[[], Awaitable], texts: List[str], budget: Optional[Dict[str, int]] = None):
+        tokens = self._tokens(texts)
+        attempt = 0
+        while True:
+            await self.limiter.aacquire(tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                self.limiter.release(throttled=classify_error(e) == THROTTLED)
+                self._record_failure(e, attempt, budget)
+                await asyncio.sleep(self.limiter.backoff(attempt, e))
+                attempt += 1
+                continue
+            self.limiter.release()
+            self._record_success(texts, tokens)
+            return result
+
+    async def _aembed_batch(self, texts: List[str], offset: int, budget: Dict[str, int]) -> List[List[float]]:
+        try:
+            return await self._acall(lambda: self.inner.aembed_documents(texts), texts, budget)
+        except Exception as e:
+            if not _splittable(e):
+                raise
+            if len(texts) == 1:
+                raise ModelConnectionError(f"Embedding failed for input #{offset}: {e}", e)
+        self.limiter.count(splits=1)
+        mid = len(texts) // 2
+        left, right = await asyncio.gather(
+            self._aembed_batch(texts[:mid], offset, budget),
+            self._aembed_batch(texts[mid:], offset + mid, budget),
+        )
+        return left + right
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        parts = await asyncio.gather(*(
+            self._aembed_batch(batch, start, self._timeout_budget()) for start, batch in self._batches(texts)
+        ))
+        return [vector for part in parts for vector in part]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall(lambda: self.inner.aembed_query(text), [text])
@@ -1,8 +1,11 @@
 from __future__ import annotations
-from langchain_core.documents import Document as LC_Document
+from typing import TYPE_CHECKING, Any, Dict
 from uuid import uuid4
 import hashlib
 
+if TYPE_CHECKING:
+    from langchain_core.documents import Document as LC_Document
+
 def text_hash(text: str) -> str:
     """计算文本的 SHA256 哈希值。"""
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -10,32 +13,82 @@ def text_hash(text: str) -> str:
 class Chunk:
     """文档分块领域对象
     
-    表示文档的一个语义片段，包含唯一标识、所属文档ID、内容哈希以及可选的 LangChain 文档。
+    表示文档的一个语义片段，包含唯一标识、所属文档ID、位置、文本与标题结构。
+    检索得到的 Chunk 额外带有 score (L2 距离平方，越小越相似)。
+
+    为降低大批量摄取时的内存占用，使用 __slots__ 存储字段：
+    同一文档的分块共用一个 source 字典 (file_name / dir_path)，
+    标题结构 mk_struct 为驻留 (interned) 的 JSON 字符串，相同标题路径只保存一份；
+    写入向量库所需的完整元数据由 metadata 按需组装。
     """
 
+    __slots__ = ("pkid", "document_id", "position", "content", "source", "mk_struct", "extra", "score")
+
     pkid: str
-    document_id: str
-    position: int | None
-    lc_document: LC_Document | None
+    document_id: str | None
+    position: int
+    content: str | None
+    source: Dict[str, Any]
+    mk_struct: str | None
+    extra: Dict[str, Any] | None
+    score: float | None
 
     def __init__(
         self,
         document_id: str | None = None,
         pkid: str | None = None,
-        lc_document: LC_Document | None = None,
+        content: str | None = None,
+        source: Dict[str, Any] | None = None,
+        mk_struct: str | None = None,
         position: int | None = None,
+        score: float | None = None,
+        extra: Dict[str, Any] | None = None,
     ):
-        """构造函数"""
+        """构造函数
+
+        参数:
+            source: 文档级元数据 (file_name, dir_path)，同一文档的分块应传入同一个字典
+            mk_struct: 标题结构 JSON
+            extra: 其他分块级元数据 (如合并窗口的 positions)
+        """
         self.pkid = pkid if pkid else str(uuid4())
         self.document_id = document_id
-        self.lc_document = lc_document
+        self.content = content
+        self.source = source if source is not None else {}
+        self.mk_struct = mk_struct
         self.position = position if position is not None else 0
+        self.score = score
+        self.extra = extra
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """写入向量库 / 返回给调用方的元数据 (每次返回新字典)"""
+        metadata = dict(self.source)
+        if self.mk_struct is not None:
+            metadata["mk_struct"] = self.mk_struct
+        if self.extra:
+            metadata.update(self.extra)
+        return metadata
 
     @classmethod
-    def from_lc_document(cls, lc_doc: LC_Document, position: int, document_id: str | None = None) -> "Chunk":
-        """从 LangChain Document 构建 Chunk"""
+    def from_lc_document(
+        cls,
+        lc_doc: LC_Document,
+        position: int | None = None,
+        document_id: str | None = None,
+        score: float | None = None,
+    ) -> "Chunk":
+        """从向量库返回的 LangChain Document 构建 Chunk"""
+        metadata = lc_doc.metadata or {}
+        source = {k: metadata[k] for k in ("file_name", "dir_path") if k in metadata}
+        extra = {k: v for k, v in metadata.items() if k not in ("file_name", "dir_path", "mk_struct")}
         return cls(
             document_id=document_id,
-            lc_document=lc_doc,
-            position=position
+            pkid=lc_doc.id,
+            content=lc_doc.page_content,
+            source=source,
+            mk_struct=metadata.get("mk_struct"),
+            position=position,
+            score=score,
+            extra=extra or None,
         )
@@ -4,14 +4,16 @@ from uuid import uuid4
 import os
 from x1ayu_rag.model.chunk import Chunk
 from x1ayu_rag.utils.hash import text_hash
-from x1ayu_rag.splitter.base import get_splitter
 from x1ayu_rag.utils.path_utils import to_relative_path
+from x1ayu_rag.utils.profiling import span
 
 class Document:
     """文档领域对象
     
     表示一个被摄取的文件，包含唯一标识、名称、路径、内容哈希以及其拆分后的分块列表。
     """
+    __slots__ = ("uuid", "name", "path", "hash", "chunks")
+
     uuid: str
     name: str
     path: str
@@ -38,7 +40,7 @@ class Document:
     @classmethod
     def from_file(cls, file_path: str) -> Document:
         """工厂方法：从文件构建文档"""
-        with open(file_path, "r", encoding="utf-8") as f:
+        with span("ingest.read"), open(file_path, "r", encoding="utf-8") as f:
             content = f.read()
         
         file_name = os.path.basename(file_path)
@@ -56,13 +58,14 @@ class Document:
         uuid: str | None = None,
     ) -> Document:
         """工厂方法：从已知内容构建文档"""
-        doc_hash = text_hash(content)
+        with span("ingest.hash"):
+            doc_hash = text_hash(content)
         
+        from x1ayu_rag.splitter.base import get_splitter
         splitter = get_splitter()
         
         # 使用 splitter 切分内容
-        lc_docs = splitter.split_from_content(file_name, dir_path, content)
-
-        chunks = [Chunk.from_lc_document(doc, i) for i, doc in enumerate(lc_docs)]
+        with span("ingest.split"):
+            chunks = splitter.split_from_content(file_name, dir_path, content)
 
         return cls(uuid=uuid, name=file_name, path=dir_path or "", hash=doc_hash, chunks=chunks)
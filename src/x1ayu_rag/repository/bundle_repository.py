@@ -0,0 +1,117 @@
+from __future__ import annotations
+import json
+import sqlite3
+from typing import Any, Dict, Iterator, List, Tuple
+from x1ayu_rag.db.sqlite_db import SqliteDB
+
+# 批量读写的行数
+BATCH_SIZE = 1000
+
+
+class BundleRepository:
+    """知识库快照中的元数据库
+
+    快照中的 metadata.db 为 documents / chunks 表的副本 (不含全文索引，导入时由触发器重建)，
+    另有 bundle_vectors 表记录向量矩阵每一行对应的分块 pkid 及其向量库元数据。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+
+    @classmethod
+    def snapshot(cls, path: str) -> "BundleRepository":
+        """将当前知识库的元数据复制到 path (在线备份，不阻塞其他读写)"""
+        target = sqlite3.connect(path)
+        SqliteDB.get_read_conn().backup(target)
+        target.close()
+        repo = cls(path)
+        repo.conn.executescript("""
+            DROP TRIGGER IF EXISTS documents_fts_insert;
+            DROP TRIGGER IF EXISTS documents_fts_delete;
+            DROP TRIGGER IF EXISTS documents_fts_update;
+            DROP TABLE IF EXISTS documents_fts;
+            CREATE TABLE bundle_vectors (
+                row INTEGER PRIMARY KEY,
+                pk TEXT NOT NULL UNIQUE,
+                metadata TEXT NOT NULL
+            );
+        """)
+        return repo
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "documents": self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            "chunks": self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+            "vectors": self.conn.execute("SELECT COUNT(*) FROM bundle_vectors").fetchone()[0],
+        }
+
+    def known_pkids(self, pkids: List[str]) -> set:
+        """返回 pkids 中在快照 chunks 表里存在的部分"""
+        known = set()
+        for i in range(0, len(pkids), 500):
+            batch = pkids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            known.update(
+                row[0] for row in self.conn.execute(f"SELECT pkid FROM chunks WHERE pkid IN ({placeholders})", batch)
+            )
+        return known
+
+    def add_vectors(self, start: int, records: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """记录一批向量行
+
+        参数:
+            start: 本批第一行在向量矩阵中的行号
+            records: (pk, text, metadata) 列表；text 用于补全旧版本没有本地文本的分块
+        """
+        self.conn.executemany(
+            "INSERT INTO bundle_vectors (row, pk, metadata) VALUES (?, ?, ?)",
+            [(start + i, pk, json.dumps(meta, ensure_ascii=False)) for i, (pk, _, meta) in enumerate(records)],
+        )
+        self.conn.executemany(
+            "UPDATE chunks SET content = ? WHERE pkid = ? AND content IS NULL",
+            [(text, pk) for pk, text, _ in records],
+        )
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def iter_vectors(self, batch_size: int = BATCH_SIZE) -> Iterator[List[sqlite3.Row]]:
+        """按行号顺序分批读取 (row, pk, content, metadata)"""
+        cursor = self.conn.execute(
+            "SELECT v.row, v.pk, c.content, v.metadata FROM bundle_vectors v "
+            "JOIN chunks c ON c.pkid = v.pk ORDER BY v.row"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+    def load_into(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """用快照中的文档与分块替换当前知识库的元数据 (不提交，由调用方决定提交或回滚)
+
+        返回:
+            dict: documents, chunks 写入行数
+        """
+        conn.execute("DELETE FROM documents")
+        conn.execute("DELETE FROM chunks")
+        counts = {"documents": 0, "chunks": 0}
+        copies = [
+            ("documents", "uuid, name, path, hash, created_at, updated_at"),
+            ("chunks", "pkid, document_id, position, content, mk_struct"),
+        ]
+        for table, columns in copies:
+            placeholders = ",".join("?" * len(columns.split(",")))
+            cursor = self.conn.execute(f"SELECT {columns} FROM {table}")
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", [tuple(r) for r in rows])
+                counts[table] += len(rows)
+        return counts
@@ -1,47 +1,93 @@
-from typing import List
+from __future__ import annotations
+import sqlite3
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple
 from x1ayu_rag.model.chunk import Chunk
 from x1ayu_rag.db.sqlite_db import SqliteDB
-from x1ayu_rag.db.milvus_db import MilvusDB
+from x1ayu_rag.db.vector_db import VectorDB
 from x1ayu_rag.error.exceptions import DatabaseError, ModelConnectionError
+from x1ayu_rag.utils.profiling import span
+
+if TYPE_CHECKING:
+    import numpy as np
+    from x1ayu_rag.db.vector_store import VectorStore
 
 class ChunkRepository:
     """分块仓储"""
     
-    def __init__(self, db_conn):
-        self.conn = db_conn
-        self.vector_store = MilvusDB.get_vector_store()
+    def __init__(self, db_conn: sqlite3.Connection | None = None):
+        """构造函数
+
+        参数:
+            db_conn: 写事务所用的连接；为空时只用于读取，使用当前线程的只读连接
+        """
+        self._conn = db_conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._conn or SqliteDB.get_read_conn()
+
+    @property
+    def vector_store(self) -> VectorStore:
+        """向量库在首次使用时才打开 (纯 SQLite 操作无需加载 Embedding 与向量库)"""
+        return VectorDB.get_vector_store()
 
-    def store_chunks(self, chunks: List[Chunk]):
-        """存储分块到 SQLite 和 Milvus"""
+    def store_chunks(self, chunks: List[Chunk], vectors: List[List[float]] | None = None):
+        """存储分块到 SQLite 和向量库
+
+        参数:
+            chunks: 分块列表
+            vectors: 与 chunks 一一对应的已计算向量 (为空时在此处嵌入)
+        """
         if not chunks:
             return
 
         # 1. 写入 SQLite (作为事务的一部分，不 commit)
         try:
-            cursor = self.conn.cursor()
-            cursor.executemany(
-                "INSERT OR IGNORE INTO chunks (pkid, document_id, position) VALUES (?, ?, ?)",
-                [(c.pkid, c.document_id, c.position) for c in chunks],
-            )
+            with span("sqlite.insert_chunks"):
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO chunks (pkid, document_id, position, content, mk_struct) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            c.pkid,
+                            c.document_id,
+                            c.position,
+                            c.content,
+                            c.mk_struct,
+                        )
+                        for c in chunks
+                    ],
+                )
         except Exception as e:
             raise DatabaseError(f"Failed to insert chunks into SQLite: {e}", e)
 
-        # 2. 写入 Milvus
-        # 如果 Milvus 写入失败，外部会捕获异常并回滚 SQLite 事务
+        # 2. 写入向量库
+        # 如果向量库写入失败，外部会捕获异常并回滚 SQLite 事务
         try:
-            # 过滤掉没有 lc_document 的 chunk
-            valid_chunks = [c for c in chunks if c.lc_document]
-            if valid_chunks:
-                self.vector_store.add_documents(
-                    documents=[c.lc_document for c in valid_chunks],
-                    ids=[c.pkid for c in valid_chunks]
+            # 过滤掉没有文本的 chunk
+            valid = [i for i, c in enumerate(chunks) if c.content is not None]
+            valid_chunks = [chunks[i] for i in valid]
+            if not valid_chunks:
+                return
+            texts = [c.content for c in valid_chunks]
+            if vectors is None:
+                with span("embed.documents"):
+                    embeddings = self.embeddings.embed_documents(texts)
+            else:
+                embeddings = [vectors[i] for i in valid]
+            with span("vector.insert"):
+                self.vector_store.add_embeddings(
+                    texts=texts,
+                    embeddings=embeddings,
+                    metadatas=[c.metadata for c in valid_chunks],
+                    ids=[c.pkid for c in valid_chunks],
                 )
         except Exception as e:
-            raise ModelConnectionError(f"Failed to insert chunks into Milvus: {e}", e)
+            raise ModelConnectionError(f"Failed to insert chunks into vector store: {e}", e)
 
     def delete_by_document_id(self, document_id: str):
         """删除指定文档的所有分块"""
-        # 1. 先查出所有 chunk id，以便从 Milvus 删除
+        # 1. 先查出所有 chunk id，以便从向量库删除
         cursor = self.conn.cursor()
         cursor.execute("SELECT pkid FROM chunks WHERE document_id = ?", (document_id,))
         rows = cursor.fetchall()
@@ -56,20 +102,290 @@ class ChunkRepository:
         except Exception as e:
              raise DatabaseError(f"Failed to delete chunks from SQLite: {e}", e)
 
-        # 3. 从 Milvus 删除
+        # 3. 从向量库删除
+        try:
+            with span("vector.delete"):
+                self.vector_store.delete(pkids)
+        except Exception as e:
+             raise ModelConnectionError(f"Failed to delete chunks from vector store: {e}", e)
+
+    def get_locations(self, pkids: List[str]) -> Dict[str, Tuple[str, int]]:
+        """查询分块所属文档及位置
+
+        返回:
+            Dict[str, Tuple[str, int]]: pkid -> (document_id, position)
+        """
+        locations = {}
+        cursor = self.conn.cursor()
+        with span("sqlite.locations"):
+            for i in range(0, len(pkids), 500):
+                batch = pkids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(
+                    f"SELECT pkid, document_id, position FROM chunks WHERE pkid IN ({placeholders})",
+                    batch,
+                )
+                for row in cursor.fetchall():
+                    locations[row["pkid"]] = (row["document_id"], row["position"])
+        return locations
+
+    def _attach_locations(self, chunks: List[Chunk]) -> List[Chunk]:
+        """为检索得到的分块补充所属文档 ID 与位置"""
+        locations = self.get_locations([c.pkid for c in chunks])
+        for chunk in chunks:
+            if chunk.pkid in locations:
+                chunk.document_id, chunk.position = locations[chunk.pkid]
+        return chunks
+
+    def get_window(self, document_id: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """按位置区间 [start, end] 读取同一文档的分块文本
+
+        只读查询：旧版本入库的分块没有本地文本时，按主键从向量库取回 (不涉及检索或嵌入)，
+        不写回 SQLite；向量库中也不存在的分块被跳过。
+
+        返回:
+            List[dict]: 每个分块的 pkid、position、content、mk_struct，按 position 升序
+        """
+        with span("sqlite.window"):
+            rows = SqliteDB.get_read_conn().execute(
+                "SELECT pkid, position, content, mk_struct FROM chunks "
+                "WHERE document_id = ? AND position BETWEEN ? AND ? ORDER BY position",
+                (document_id, start, end),
+            ).fetchall()
+        window = [dict(row) for row in rows]
+        missing = [row["pkid"] for row in window if row["content"] is None]
+        if not missing:
+            return window
         try:
-            self.vector_store.delete(pkids)
+            docs = {doc.id: doc for doc in self.vector_store.get_by_ids(missing)}
         except Exception as e:
-             raise ModelConnectionError(f"Failed to delete chunks from Milvus: {e}", e)
+            raise DatabaseError(f"Failed to fetch chunk texts from vector store: {e}", e)
+        for row in window:
+            doc = docs.get(row["pkid"])
+            if row["content"] is None and doc is not None:
+                row["content"] = doc.page_content
+                row["mk_struct"] = doc.metadata.get("mk_struct")
+        return [row for row in window if row["content"] is not None]
 
     def search_chunks(self, query: str, top_k: int = 2) -> List[Chunk]:
-        """搜索分块"""
+        """搜索分块 (结果带 score，按距离升序)"""
         try:
-            lc_docs = self.vector_store.similarity_search(query, top_k)
+            with span("vector.search"):
+                hits = self.vector_store.similarity_search_with_score(query, top_k)
             # 将 LangChain Document 转换为领域对象 Chunk
-            chunks = []
-            for i, doc in enumerate(lc_docs):
-                chunks.append(Chunk(lc_document=doc)) 
-            return chunks
+            chunks = [Chunk.from_lc_document(doc, score=score) for doc, score in hits]
+            return self._attach_locations(chunks)
+        except Exception as e:
+            raise ModelConnectionError(f"Failed to search chunks in vector store: {e}", e)
+
+    def search_chunks_batch(self, queries: List[str], top_k: int = 2) -> List[List[Chunk]]:
+        """批量搜索分块
+
+        所有查询先嵌入 (见 embed_queries)，再一次性提交多向量检索。
+
+        返回:
+            List[List[Chunk]]: 与 queries 一一对应的检索结果，Chunk 带有 score
+        """
+        if not queries:
+            return []
+        return self.search_by_vectors(self.embed_queries(queries), top_k)
+
+    def search_by_vectors(self, vectors: List[List[float]], top_k: int = 2) -> List[List[Chunk]]:
+        """按已计算好的查询向量检索分块
+
+        返回:
+            List[List[Chunk]]: 与 vectors 一一对应的检索结果，Chunk 带有 score
+        """
+        if not vectors:
+            return []
+        try:
+            with span("vector.search"):
+                results = self.vector_store.search_by_vectors(vectors, top_k)
+            batches = [
+                [Chunk.from_lc_document(doc, score=score) for doc, score in hits]
+                for hits in results
+            ]
+            self._attach_locations([c for chunks in batches for c in chunks])
+            return batches
+        except Exception as e:
+            raise ModelConnectionError(f"Failed to search chunks in vector store: {e}", e)
+
+    @property
+    def embeddings(self):
+        """向量库使用的 Embedding 模型"""
+        return self.vector_store.embeddings
+
+    def embed_query(self, query: str) -> List[float]:
+        """嵌入单个查询"""
+        try:
+            with span("embed.query"):
+                return self.embeddings.embed_query(query)
+        except Exception as e:
+            raise ModelConnectionError(f"Failed to embed query: {e}", e)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """嵌入多个查询 (按查询方式嵌入，与 embed_query 处于同一向量空间)"""
+        from x1ayu_rag.llm.resilient_embeddings import embed_queries
+        try:
+            with span("embed.queries"):
+                return embed_queries(self.embeddings, queries)
+        except Exception as e:
+            raise ModelConnectionError(f"Failed to embed queries: {e}", e)
+
+    def search_candidates(
+        self, queries: List[str], fetch_k: int
+    ) -> List[Tuple[np.ndarray, List[Chunk], np.ndarray]]:
+        """检索候选分块及其已存储的向量 (用于 MMR 等本地重排)
+
+        查询按 embed_queries 嵌入 (与单条检索同为查询方式)，单次检索同时取回候选向量，无需对候选重新嵌入。
+
+        返回:
+            与 queries 一一对应的 (查询向量, 候选 Chunk 列表, 候选向量矩阵)，
+            候选按 score 升序，矩阵行与候选一一对应
+        """
+        if not queries:
+            return []
+        return self.search_candidates_by_vectors(self.embed_queries(queries), fetch_k)
+
+    def search_candidates_by_vectors(
+        self, vectors: List[List[float]], fetch_k: int
+    ) -> List[Tuple[np.ndarray, List[Chunk], np.ndarray]]:
+        """同 search_candidates，输入为已计算好的查询向量"""
+        if not vectors:
+            return []
+        from x1ayu_rag.utils.vector_math import as_matrix
+        try:
+            with span("vector.search"):
+                results = self.vector_store.search_with_vectors(vectors, fetch_k)
+            output = []
+            for vector, (hits, matrix) in zip(vectors, results):
+                chunks = [Chunk.from_lc_document(doc, score=score) for doc, score in hits]
+                output.append((as_matrix(vector)[0], chunks, matrix))
+            self._attach_locations([c for _, chunks, _ in output for c in chunks])
+            return output
+        except Exception as e:
+            raise ModelConnectionError(f"Failed to search chunks in vector store: {e}", e)
+
+    # ---- 重建索引 ----
+
+    # 可嵌入分块 (有本地文本) 及其写入向量库所需的文档元数据
+    _EMBEDDABLE_SELECT = (
+        "SELECT c.pkid, c.content, c.mk_struct, d.name, d.path FROM chunks c "
+        "JOIN documents d ON d.uuid = c.document_id WHERE c.content IS NOT NULL"
+    )
+
+    @staticmethod
+    def _to_chunk(row: sqlite3.Row) -> Chunk:
+        return Chunk(
+            pkid=row["pkid"],
+            content=row["content"],
+            source={"file_name": row["name"], "dir_path": row["path"]},
+            mk_struct=row["mk_struct"],
+        )
+
+    def list_embeddable(self, after: str | None = None, limit: int = 256) -> List[Chunk]:
+        """按 pkid 顺序分页读取有本地文本的分块 (键集分页，after 为上一页最后一个 pkid)"""
+        if after is None:
+            rows = self.conn.execute(f"{self._EMBEDDABLE_SELECT} ORDER BY c.pkid LIMIT ?", (limit,))
+        else:
+            rows = self.conn.execute(
+                f"{self._EMBEDDABLE_SELECT} AND c.pkid > ? ORDER BY c.pkid LIMIT ?", (after, limit)
+            )
+        return [self._to_chunk(row) for row in rows]
+
+    def get_embeddable(self, pkids: List[str]) -> List[Chunk]:
+        """按 pkid 读取有本地文本的分块，不存在或没有文本的 pkid 被忽略"""
+        chunks = []
+        for i in range(0, len(pkids), 500):
+            batch = pkids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            chunks.extend(
+                self._to_chunk(row)
+                for row in self.conn.execute(f"{self._EMBEDDABLE_SELECT} AND c.pkid IN ({placeholders})", batch)
+            )
+        return chunks
+
+    def count_embeddable(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM chunks WHERE content IS NOT NULL").fetchone()[0]
+
+    def iter_pkids(self, batch_size: int = 1000, embeddable_only: bool = False) -> Iterator[List[str]]:
+        """分批流式读取分块 pkid (不加载文本)"""
+        sql = "SELECT pkid FROM chunks" + (" WHERE content IS NOT NULL" if embeddable_only else "")
+        cursor = self.conn.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [row[0] for row in rows]
+
+    # ---- 一致性检查 ----
+
+    def iter_chunk_states(self, batch_size: int = 1000) -> Iterator[List[Tuple[str, bool, bool, str]]]:
+        """分批流式读取分块状态 (不加载文本)
+
+        返回:
+            Iterator[List[(pkid, has_content, has_document, document_id)]]
+        """
+        cursor = self.conn.execute(
+            "SELECT c.pkid, c.content IS NOT NULL, d.uuid IS NOT NULL, c.document_id "
+            "FROM chunks c LEFT JOIN documents d ON d.uuid = c.document_id"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [(row[0], bool(row[1]), bool(row[2]), row[3]) for row in rows]
+
+    def existing_pkids(self, pkids: List[str]) -> set:
+        """返回 pkids 中在 chunks 表里存在的部分"""
+        existing = set()
+        for i in range(0, len(pkids), 500):
+            batch = pkids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            existing.update(
+                row[0] for row in self.conn.execute(f"SELECT pkid FROM chunks WHERE pkid IN ({placeholders})", batch)
+            )
+        return existing
+
+    def delete_dangling(self, pkids: List[str]) -> int:
+        """删除所属文档已不存在的分块行 (不提交；向量由调用方作为孤立向量删除)
+
+        返回:
+            int: 删除的行数
+        """
+        deleted = 0
+        for i in range(0, len(pkids), 500):
+            batch = pkids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            deleted += self.conn.execute(
+                f"DELETE FROM chunks WHERE pkid IN ({placeholders}) "
+                "AND document_id NOT IN (SELECT uuid FROM documents)",
+                batch,
+            ).rowcount
+        return deleted
+
+    def store_vectors(self, chunks: List[Chunk]) -> None:
+        """为已在 SQLite 中的分块嵌入并写入向量 (不修改 SQLite)"""
+        if not chunks:
+            return
+        try:
+            with span("embed.documents"):
+                embeddings = self.embeddings.embed_documents([c.content for c in chunks])
+        except Exception as e:
+            raise ModelConnectionError(f"Failed to insert chunks into vector store: {e}", e)
+        self.write_vectors(chunks, embeddings)
+
+    def write_vectors(self, chunks: List[Chunk], embeddings: List[List[float]]) -> None:
+        """写入已计算好的分块向量 (不修改 SQLite)"""
+        if not chunks:
+            return
+        try:
+            with span("vector.insert"):
+                self.vector_store.add_embeddings(
+                    texts=[c.content for c in chunks],
+                    embeddings=embeddings,
+                    metadatas=[c.metadata for c in chunks],
+                    ids=[c.pkid for c in chunks],
+                )
         except Exception as e:
-            raise ModelConnectionError(f"Failed to search chunks in Milvus: {e}", e)
+            raise ModelConnectionError(f"Failed to insert chunks into vector store: {e}", e)
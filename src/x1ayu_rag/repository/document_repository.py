@@ -1,8 +1,21 @@
-from typing import Optional
+from typing import Any, Optional
 from x1ayu_rag.model.document import Document
 from x1ayu_rag.db.sqlite_db import SqliteDB
 from x1ayu_rag.repository.chunk_repository import ChunkRepository
 from x1ayu_rag.error.exceptions import DatabaseError, ModelConnectionError
+from x1ayu_rag.utils.profiling import span
+
+# 文档列表的排序键 -> 键集分页使用的列 (最后一列 uuid 保证顺序唯一，均有对应索引)
+SORT_COLUMNS = {
+    "name": ("name", "uuid"),
+    "path": ("path", "name", "uuid"),
+    "created": ("created_at", "uuid"),
+    "chunks": ("chunk_count", "uuid"),
+    "size": ("content_bytes", "uuid"),
+}
+# trigram 全文索引可匹配的最短查询长度
+FTS_MIN_QUERY_LENGTH = 3
+
 
 class DocumentRepository:
     """文档仓储
@@ -11,8 +24,13 @@ class DocumentRepository:
     实现了原子性操作：Document 和 Chunks 要么都存成功，要么都回滚。
     """
     
-    def add(self, document: Document):
-        """原子性地添加文档及其分块"""
+    def add(self, document: Document, vectors: list | None = None):
+        """原子性地添加文档及其分块
+
+        参数:
+            document: 文档
+            vectors: 与 document.chunks 一一对应的已计算向量 (可选)
+        """
         conn = SqliteDB.get_conn()
         
         try:
@@ -20,18 +38,20 @@ class DocumentRepository:
             cursor = conn.cursor()
             
             # 1. 插入 Document
-            cursor.execute(
-                "INSERT INTO documents (uuid, name, path, hash) VALUES (?, ?, ?, ?)",
-                (document.uuid, document.name, document.path, document.hash)
-            )
+            with span("sqlite.insert_document"):
+                cursor.execute(
+                    "INSERT INTO documents (uuid, name, path, hash) VALUES (?, ?, ?, ?)",
+                    (document.uuid, document.name, document.path, document.hash)
+                )
             
             # 2. 插入 Chunks (传递 conn 给 ChunkRepo)
             if document.chunks:
                 chunk_repo = ChunkRepository(conn)
-                chunk_repo.store_chunks(document.chunks)
+                chunk_repo.store_chunks(document.chunks, vectors)
             
             # 3. 提交事务
-            conn.commit()
+            with span("sqlite.commit"):
+                conn.commit()
             
         except (DatabaseError, ModelConnectionError) as e:
             conn.rollback()
@@ -41,7 +61,7 @@ class DocumentRepository:
             raise DatabaseError(f"Unexpected error adding document: {e}", e)
 
     def get_by_path_and_name(self, path: str, name: str) -> Optional[Document]:
-        conn = SqliteDB.get_conn()
+        conn = SqliteDB.get_read_conn()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM documents WHERE path = ? AND name = ?", (path, name))
         row = cursor.fetchone()
@@ -57,7 +77,7 @@ class DocumentRepository:
 
     def list_all(self) -> list[Document]:
         """获取所有文档"""
-        conn = SqliteDB.get_conn()
+        conn = SqliteDB.get_read_conn()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM documents")
         rows = cursor.fetchall()
@@ -73,14 +93,11 @@ class DocumentRepository:
         ]
 
     def search_documents(self, query: str) -> list[Document]:
-        """模糊搜索文档 (匹配名称或路径)"""
-        conn = SqliteDB.get_conn()
+        """模糊搜索文档 (名称或路径包含 query，优先使用全文索引)"""
+        conn = SqliteDB.get_read_conn()
         cursor = conn.cursor()
-        search_pattern = f"%{query}%"
-        cursor.execute(
-            "SELECT * FROM documents WHERE name LIKE ? OR path LIKE ?", 
-            (search_pattern, search_pattern)
-        )
+        condition, params = self._match_condition(conn, query)
+        cursor.execute(f"SELECT * FROM documents d WHERE {condition} ORDER BY d.name, d.uuid", params)
         rows = cursor.fetchall()
         return [
             Document(
@@ -93,6 +110,69 @@ class DocumentRepository:
             for row in rows
         ]
 
+    def list_page(
+        self,
+        sort: str = "name",
+        descending: bool = False,
+        limit: int = 50,
+        after: Optional[list] = None,
+        query: Optional[str] = None,
+    ) -> list[dict[str, Any]]:
+        """键集分页列出文档，附带分块数与分块文本字节数
+
+        参数:
+            sort: 排序键 (SORT_COLUMNS 之一)
+            descending: 是否降序
+            limit: 本页最多返回的行数
+            after: 上一页最后一行的排序列取值 (与 SORT_COLUMNS[sort] 对应)，为空时从头开始
+            query: 名称或路径需包含的子串 (可选)
+
+        返回:
+            list[dict]: uuid, name, path, hash, created_at, chunks, size
+        """
+        conn = SqliteDB.get_read_conn()
+        columns = SORT_COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        order = ", ".join(f"{c} {direction}" for c in columns)
+        filters, params = [], []
+        if query:
+            condition, match_params = self._match_condition(conn, query)
+            filters.append(condition)
+            params.extend(match_params)
+        if after is not None:
+            filters.append(f"({', '.join(columns)}) {'<' if descending else '>'} ({', '.join('?' * len(columns))})")
+            params.extend(after)
+        # 分块数与大小由触发器维护在 documents 表中 (见 SqliteDB._init_chunk_stats)，各排序均沿索引取一页
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        sql = f"""
+            SELECT d.uuid, d.name, d.path, d.hash, d.created_at, d.chunk_count, d.content_bytes,
+                   d.chunk_count AS chunks, d.content_bytes AS size
+            FROM documents d
+            {where} ORDER BY {order} LIMIT ?
+        """
+        params.append(limit)
+        with span("sqlite.list_documents"):
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    @staticmethod
+    def _match_condition(conn, query: str) -> tuple[str, list]:
+        """名称或路径包含 query 的 WHERE 条件 (documents 表别名为 d)"""
+        if len(query) >= FTS_MIN_QUERY_LENGTH and SqliteDB.has_fts(conn):
+            phrase = '"' + query.replace('"', '""') + '"'
+            return "d.rowid IN (SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?)", [phrase]
+        # 过短的查询 trigram 无法匹配，退回 LIKE 扫描
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return "(d.name LIKE ? ESCAPE '\\' OR d.path LIKE ? ESCAPE '\\')", [pattern, pattern]
+
+    def iter_locations(self, batch_size: int = 1000):
+        """分批流式读取文档的 (uuid, name, path)"""
+        cursor = SqliteDB.get_read_conn().execute("SELECT uuid, name, path FROM documents")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [(row[0], row[1], row[2]) for row in rows]
+
     def delete_by_uuid(self, uuid: str):
         """原子性地删除文档及其分块"""
         conn = SqliteDB.get_conn()
@@ -100,13 +180,14 @@ class DocumentRepository:
             cursor = conn.cursor()
         
             chunk_repo = ChunkRepository(conn)
-            # 先调用 repo 删除逻辑，它负责 Milvus 删除和可能的 SQLite 删除
+            # 先调用 repo 删除逻辑，它负责向量库删除和可能的 SQLite 删除
             chunk_repo.delete_by_document_id(uuid)
             
             # 再删除 Document
             cursor.execute("DELETE FROM documents WHERE uuid = ?", (uuid,))
             
-            conn.commit()
+            with span("sqlite.commit"):
+                conn.commit()
         except (DatabaseError, ModelConnectionError) as e:
             conn.rollback()
             raise e
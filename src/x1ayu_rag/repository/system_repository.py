@@ -17,3 +17,11 @@ class SystemRepository:
             return True
         except Exception:
             return False
+
+    def count_rows(self) -> dict:
+        """当前知识库的文档数与分块数"""
+        conn = SqliteDB.get_read_conn()
+        return {
+            "documents": conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            "chunks": conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+        }
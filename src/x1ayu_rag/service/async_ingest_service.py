@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from typing import List, Optional
+from x1ayu_rag.db.store_executor import StoreExecutor
+from x1ayu_rag.db.vector_db import VectorDB
+from x1ayu_rag.model.document import Document
+from x1ayu_rag.service.constants import IngestOp
+from x1ayu_rag.service.ingest_service import IngestService
+from x1ayu_rag.utils.path_utils import to_relative_path
+from x1ayu_rag.utils.metrics import DOCUMENTS, INGEST_DURATION
+
+
+class AsyncIngestService:
+    """异步摄取服务
+
+    目录中的文件并发处理：解析与切分在线程中执行，分块嵌入使用 Embedding 模型的异步接口，
+    SQLite 与向量库写入经 StoreExecutor 串行执行。同时处理的文件数受 max_concurrency 限制。
+    """
+
+    def __init__(self, ingest_service: IngestService = None, max_concurrency: int = 4):
+        self.service = ingest_service or IngestService()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._embeddings = None
+
+    async def _get_embeddings(self):
+        if self._embeddings is None:
+            from x1ayu_rag.db.vector_db import VectorDB
+            # 首次访问会打开向量库，放到存储线程中执行
+            self._embeddings = await StoreExecutor.run(lambda: VectorDB.get_vector_store().embeddings)
+        return self._embeddings
+
+    async def _embed(self, doc: Document) -> List[Optional[List[float]]]:
+        """嵌入文档的分块，返回与 doc.chunks 一一对应的向量 (无内容的分块为 None)"""
+        chunks = doc.chunks or []
+        valid = [i for i, c in enumerate(chunks) if c.content is not None]
+        texts = [chunks[i].content for i in valid]
+        embeddings = await self._get_embeddings()
+        vectors: List[Optional[List[float]]] = [None] * len(chunks)
+        # 分批、限流与重试由 ResilientEmbeddings 处理，各批次并发提交
+        for i, vector in zip(valid, await embeddings.aembed_documents(texts) if texts else []):
+            vectors[i] = vector
+        return vectors
+
+    async def ingest_file(self, file_path: str) -> tuple[IngestOp, str]:
+        """摄取单个文件 (内容未变化时跳过)
+
+        返回:
+            tuple[IngestOp, str]: 同 IngestService.ingest_document 的单文件结果
+        """
+        async with self._semaphore:
+            start = time.perf_counter()
+            op_type, result = await self._ingest_file(file_path)
+            INGEST_DURATION.observe(time.perf_counter() - start)
+            DOCUMENTS.inc(op=op_type.value)
+            return op_type, result
+
+    async def _ingest_file(self, file_path: str) -> tuple[IngestOp, str]:
+        """摄取单个文件，不计入指标 (见 ingest_file)"""
+        try:
+            doc = await asyncio.to_thread(Document.from_file, file_path)
+            existing = await StoreExecutor.run(
+                self.service.doc_repo.get_by_path_and_name, doc.path, doc.name
+            )
+            if existing and existing.hash == doc.hash:
+                return IngestOp.SKIPPED, f"Document UUID: {existing.uuid} (unchanged)"
+            vectors = await self._embed(doc)
+            if existing:
+                uuid = await StoreExecutor.run(self.service.replace_document, existing.uuid, doc, vectors)
+                return IngestOp.UPDATED, f"Document {doc.name} updated. UUID: {uuid}"
+            await StoreExecutor.run(self.service.doc_repo.add, doc, vectors)
+            return IngestOp.ADDED, f"Document {doc.name} added. UUID: {doc.uuid}"
+        except Exception as e:
+            return IngestOp.ERROR, str(e)
+
+    async def ingest_document(self, file_path: str) -> tuple[IngestOp, list | str]:
+        """处理文档或目录摄取请求 (返回值同 IngestService.ingest_document)"""
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Path not found: {to_relative_path(file_path)}")
+        await StoreExecutor.run(VectorDB.tag_active)
+        if os.path.isdir(file_path):
+            return IngestOp.BATCH_RESULT, await self.sync_directory(file_path)
+        return await self.ingest_file(file_path)
+
+    async def sync_directory(self, root_path: str) -> list[tuple[str, str, str]]:
+        """并发同步目录中的所有 Markdown 文件 (返回值同 IngestService.sync_directory)"""
+        files = IngestService.scan_markdown_files(root_path)
+        outcomes = await asyncio.gather(*(self.ingest_file(f) for f in files))
+        results = [
+            IngestService.to_result_row(op_type, result, file_path)
+            for file_path, (op_type, result) in zip(files, outcomes)
+        ]
+        results.extend(await StoreExecutor.run(self.service.delete_missing, root_path))
+        return results
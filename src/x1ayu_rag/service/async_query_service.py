@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence
+from x1ayu_rag.config.kb_context import use_kb
+from x1ayu_rag.db.store_executor import StoreExecutor
+from x1ayu_rag.model.chunk import Chunk
+from x1ayu_rag.service.query_service import QueryService
+from x1ayu_rag.utils.metrics import QUERY_DURATION
+
+
+class AsyncQueryService:
+    """异步查询服务
+
+    查询嵌入使用 Embedding 模型的异步接口在事件循环上并发执行，
+    向量检索与 SQLite 读取 (包括联邦检索的各知识库) 经 StoreExecutor 串行执行；
+    同时进行的查询数受 max_concurrency 限制。
+    """
+
+    def __init__(self, query_service: QueryService = None, max_concurrency: int = 8):
+        self.service = query_service or QueryService()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._embeddings = None
+
+    async def _get_embeddings(self):
+        if self._embeddings is None:
+            # 首次访问会打开向量库，放到存储线程中执行
+            self._embeddings = await StoreExecutor.run(lambda: self.service.chunk_repo.embeddings)
+        return self._embeddings
+
+    async def search_chunks(
+        self,
+        query: str,
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        kbs: Optional[Sequence[str]] = None,
+    ) -> List[Chunk]:
+        """搜索相关分块 (参数同 QueryService.search_chunks)
+
+        指定多个 kbs 时 (联邦检索) 查询在每个向量空间中嵌入一次，各知识库的检索在存储线程中依次执行，
+        结果按 QueryService.merge_results 合并。
+        """
+        if not query or not query.strip():
+            return []
+        if kbs:
+            kbs = self.service.check_kbs(kbs)
+        if kbs and len(kbs) > 1:
+            async with self._semaphore:
+                start = time.perf_counter()
+                chunks = await self._search_federated(
+                    query, kbs, top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k
+                )
+                QUERY_DURATION.observe(time.perf_counter() - start, mode="async")
+                return chunks
+        kb = kbs[0] if kbs else None
+        async with self._semaphore:
+            start = time.perf_counter()
+            if kb is None:
+                embeddings = await self._get_embeddings()
+            else:
+                embeddings = await StoreExecutor.run(self._kb_embeddings, kb)
+            vector = await embeddings.aembed_query(query)
+            chunks = await StoreExecutor.run(
+                self._search_kb, kb, vector, top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k
+            )
+            QUERY_DURATION.observe(time.perf_counter() - start, mode="async")
+            return chunks
+
+    async def _search_federated(
+        self,
+        query: str,
+        kbs: List[str],
+        top_k: int,
+        neighbors: int,
+        max_distance: Optional[float],
+        elbow: Optional[float],
+        mmr_lambda: Optional[float],
+        fetch_k: Optional[int],
+    ) -> List[Chunk]:
+        spaces: Dict[str, str] = await StoreExecutor.run(self.service.kb_spaces, kbs)
+        first: Dict[str, str] = {}
+        for kb, space in spaces.items():
+            first.setdefault(space, kb)
+        embeddings = [await StoreExecutor.run(self._kb_embeddings, kb) for kb in first.values()]
+        vectors = dict(zip(first, await asyncio.gather(*(e.aembed_query(query) for e in embeddings))))
+        per_kb = [
+            (kb, space, await StoreExecutor.run(
+                self._search_kb, kb, vectors[space], top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k
+            ))
+            for kb, space in spaces.items()
+        ]
+        return self.service.merge_results(per_kb, top_k)
+
+    def _kb_embeddings(self, kb: Optional[str]):
+        """(存储线程) 知识库向量库使用的 Embedding 模型 (首次访问会打开向量库)"""
+        with use_kb(kb):
+            return self.service.chunk_repo.embeddings
+
+    def _search_kb(self, kb: Optional[str], vector: List[float], *options) -> List[Chunk]:
+        """(存储线程) 在知识库 (None 为当前知识库) 中按向量检索，options 同 QueryService.search_by_vector"""
+        with use_kb(kb):
+            return self.service.search_by_vector(vector, *options)
+
+    async def search_chunks_many(self, queries: List[str], **options) -> List[List[Chunk]]:
+        """并发搜索多个查询
+
+        返回:
+            List[List[Chunk]]: 与 queries 一一对应的结果
+        """
+        return list(await asyncio.gather(*(self.search_chunks(q, **options) for q in queries)))
@@ -0,0 +1,281 @@
+import hashlib
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+# 基准默认设置
+DEFAULT_BENCH_OPTIONS = {
+    "sizes": [50, 200],
+    "heading_depth": 3,
+    "sections": 6,
+    "paragraphs": 2,
+    "queries": 50,
+    "k": 4,
+    "backend": "milvus",
+    "embedding_dim": 256,
+    "embed_latency_ms": 0.0,
+    "seed": 0,
+}
+
+# 指标方向：True 表示越大越好
+METRICS = {
+    "files_per_second": True,
+    "chunks_per_second": True,
+    "resync_seconds": False,
+    "select_cold_ms": False,
+    "select_p50_ms": False,
+    "select_p95_ms": False,
+    "select_p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+# 影响结果可比性的设置：与基线不一致时拒绝对比 (sizes 除外，只比较双方都有的规模)
+COMPARABLE_OPTIONS = (
+    "heading_depth", "sections", "paragraphs", "queries", "k", "backend", "embedding_dim", "embed_latency_ms", "seed",
+)
+
+_SYLLABLES = ["ka", "lo", "mi", "ra", "tu", "zen", "vo", "shi", "pa", "qu", "ne", "dor", "fi", "gal", "hu", "jin"]
+
+
+def make_vocabulary(size: int = 2000, seed: int = 0) -> List[str]:
+    """生成确定性的伪词表"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def generate_corpus(
+    root: str,
+    files: int,
+    heading_depth: int = 3,
+    sections: int = 6,
+    paragraphs: int = 2,
+    seed: int = 0,
+) -> List[str]:
+    """生成合成 Markdown 语料
+
+    每个文件包含 sections 个章节，标题层级在 1..heading_depth 之间循环，
+    每个章节有 paragraphs 段随机伪词文本；文件按每目录 50 个分布在子目录中。
+
+    返回:
+        List[str]: 生成的文件路径
+    """
+    rng = random.Random(seed)
+    vocab = make_vocabulary(seed=seed)
+    paths = []
+    for i in range(files):
+        directory = os.path.join(root, f"part{i // 50:03d}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        for s in range(sections):
+            level = 1 + s % max(1, heading_depth)
+            lines.append(f"{'#' * level} {' '.join(rng.sample(vocab, 3))}\n")
+            for _ in range(paragraphs):
+                lines.append(" ".join(rng.choices(vocab, k=rng.randint(40, 80))) + "\n")
+        path = os.path.join(directory, f"doc{i:05d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        paths.append(path)
+    return paths
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    """生成确定性的检索查询 (count 条，另加一条用于冷启动)"""
+    rng = random.Random(seed + 1)
+    vocab = make_vocabulary(seed=seed)
+    return [" ".join(rng.sample(vocab, rng.randint(2, 5))) for _ in range(count + 1)]
+
+
+def query_set_digest(queries: List[str]) -> str:
+    """查询集合的摘要，用于确认两次基准使用了相同的查询"""
+    return hashlib.sha256("\n".join(queries).encode("utf-8")).hexdigest()[:16]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """线性插值百分位数 (q 取 0~100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存 (MB)，平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_size(size: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """在独立的临时工作目录中对单个语料规模执行基准 (运行于子进程)"""
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    os.chdir(workdir)
+    os.environ["RAG_NO_DAEMON"] = "1"
+    try:
+        from x1ayu_rag.config.app_config import save_config
+        save_config({
+            "chat": {"provider": "echo"},
+            "embedding": {
+                "provider": "hash",
+                "dim": options["embedding_dim"],
+                "latency_ms": options["embed_latency_ms"],
+            },
+            "vector": {"backend": options["backend"]},
+        })
+        from x1ayu_rag.api.query_api import QueryAPI
+        from x1ayu_rag.db.sqlite_db import SqliteDB
+        from x1ayu_rag.service.ingest_service import IngestService
+
+        corpus = os.path.join(workdir, "corpus")
+        generate_corpus(
+            corpus, size, options["heading_depth"], options["sections"], options["paragraphs"], options["seed"]
+        )
+
+        service = IngestService()
+        start = time.perf_counter()
+        service.ingest_document(corpus)
+        ingest_seconds = time.perf_counter() - start
+        chunks = SqliteDB.get_conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+        start = time.perf_counter()
+        rows = service.ingest_document(corpus)[1]
+        resync_seconds = time.perf_counter() - start
+        changed = sum(1 for action, _, _ in rows if action != "[skipped]")
+
+        queries = make_queries(options["queries"], options["seed"])
+        api = QueryAPI()
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            api.search_chunks(query, top_k=options["k"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        # 首次查询包含打开向量库等冷启动开销，单独统计
+        cold, warm = latencies[0], latencies[1:]
+
+        return {
+            "size": size,
+            "files": size,
+            "chunks": chunks,
+            "ingest_seconds": round(ingest_seconds, 4),
+            "files_per_second": round(size / ingest_seconds, 2),
+            "chunks_per_second": round(chunks / ingest_seconds, 2),
+            "resync_seconds": round(resync_seconds, 4),
+            "resync_changed": changed,
+            "select_cold_ms": round(cold, 3),
+            "select_p50_ms": round(percentile(warm, 50), 3),
+            "select_p95_ms": round(percentile(warm, 95), 3),
+            "select_p99_ms": round(percentile(warm, 99), 3),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class BenchService:
+    """基准测试服务
+
+    使用离线的 hash Embedding 与 echo 聊天提供商，在临时目录中生成合成语料，
+    测量摄取吞吐、无变更重新同步耗时、检索延迟分位数与峰值内存。
+    每个语料规模在独立子进程中运行，互不影响且峰值内存可分别统计。
+    """
+
+    def run(self, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """执行基准
+
+        参数:
+            options: 覆盖 DEFAULT_BENCH_OPTIONS 中的设置
+
+        返回:
+            dict: 包含运行环境、设置及各规模结果 (results) 的报告
+        """
+        options = {**DEFAULT_BENCH_OPTIONS, **(options or {})}
+        results = []
+        for size in sorted(options["sizes"]):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results.append(pool.submit(_run_size, size, options).result())
+        return {
+            "version": self._version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "options": options,
+            "query_set": query_set_digest(make_queries(options["queries"], options["seed"])),
+            "results": results,
+        }
+
+    @staticmethod
+    def _version() -> Optional[str]:
+        try:
+            from importlib.metadata import version
+            return version("x1ayu_rag")
+        except Exception:
+            return None
+
+    @staticmethod
+    def option_mismatches(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+        """本次报告与基线之间影响可比性的设置差异
+
+        基线中没有记录的设置 (旧版本报告) 不参与比较。
+
+        返回:
+            List[str]: 差异说明，如 "backend: milvus (baseline) vs numpy"；为空表示可以对比
+        """
+        current = {**report.get("options", {}), "query_set": report.get("query_set")}
+        recorded = {**baseline.get("options", {}), "query_set": baseline.get("query_set")}
+        return [
+            f"{key}: {recorded[key]} (baseline) vs {current.get(key)}"
+            for key in (*COMPARABLE_OPTIONS, "query_set")
+            if recorded.get(key) is not None and recorded[key] != current.get(key)
+        ]
+
+    @staticmethod
+    def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.1) -> List[Dict[str, Any]]:
+        """与基线报告逐项对比 (只比较双方都有的语料规模)
+
+        参数:
+            report: 本次报告
+            baseline: 基线报告
+            tolerance: 允许的相对退化比例
+
+        返回:
+            List[dict]: size, metric, baseline, current, change (相对变化，正值表示变好), regressed
+        """
+        base_by_size = {r["size"]: r for r in baseline.get("results", [])}
+        rows = []
+        for result in report.get("results", []):
+            base = base_by_size.get(result["size"])
+            if base is None:
+                continue
+            for metric, higher_is_better in METRICS.items():
+                old, new = base.get(metric), result.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if not higher_is_better:
+                    change = -change
+                rows.append({
+                    "size": result["size"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 4),
+                    "regressed": change < -tolerance,
+                })
+        return rows
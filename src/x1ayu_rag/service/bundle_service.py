@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import uuid
+from typing import Any, Dict
+import numpy as np
+from x1ayu_rag.config.kb_context import kb_dir
+from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.db.vector_db import VectorDB
+from x1ayu_rag.db.vector_store import PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD
+from x1ayu_rag.error.exceptions import BundleError
+from x1ayu_rag.llm.factory import LLMFactory
+from x1ayu_rag.llm.projection import Projection, ProjectedEmbeddings
+from x1ayu_rag.repository.bundle_repository import BATCH_SIZE, BundleRepository
+from x1ayu_rag.utils.vector_math import as_matrix
+
+# 快照格式标识与版本
+BUNDLE_FORMAT = "x1ayu-rag-bundle"
+BUNDLE_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+METADATA_FILE = "metadata.db"
+VECTORS_FILE = "vectors.npy"
+PROJECTION_FILE = "projection.npz"
+BUNDLE_FILES = (MANIFEST_FILE, METADATA_FILE, VECTORS_FILE, PROJECTION_FILE)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BundleService:
+    """知识库快照导出 / 导入
+
+    快照为单个 tar.gz 文件，包含：
+    - manifest.json: 格式版本、Embedding 模型身份、向量维度与各文件校验和
+    - metadata.db: documents / chunks 表 (含分块文本) 及向量行号映射
+    - vectors.npy: float32 向量矩阵，解包后以 mmap 方式分批读取
+    - projection.npz: 降维投影 (仅在向量经过压缩时存在)
+    导入时直接写入已计算好的向量，无需重新嵌入；模型身份不一致时拒绝导入。
+    """
+
+    def export_bundle(self, bundle_path: str) -> Dict[str, Any]:
+        """导出当前知识库
+
+        返回:
+            dict: 快照清单 (manifest)，另含 bytes (快照文件大小)
+        """
+        workdir = tempfile.mkdtemp(prefix="bundle-", dir=kb_dir())
+        try:
+            repo = BundleRepository.snapshot(os.path.join(workdir, METADATA_FILE))
+            try:
+                rows, dim, skipped = self._export_vectors(repo, workdir)
+                repo.commit()
+                counts = repo.counts()
+            finally:
+                repo.close()
+
+            projection_path = VectorDB.projection_path()
+            has_projection = os.path.exists(projection_path)
+            if has_projection:
+                shutil.copyfile(projection_path, os.path.join(workdir, PROJECTION_FILE))
+            files = [METADATA_FILE, VECTORS_FILE] + ([PROJECTION_FILE] if has_projection else [])
+            manifest = {
+                "format": BUNDLE_FORMAT,
+                "version": BUNDLE_VERSION,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "embedding": VectorDB.active_collection()["identity"],
+                "vector_backend": VectorDB.get_backend(),
+                "dim": dim,
+                "projection": has_projection,
+                "documents": counts["documents"],
+                "chunks": counts["chunks"],
+                "vectors": rows,
+                "orphan_vectors_skipped": skipped,
+                "sha256": {name: _sha256(os.path.join(workdir, name)) for name in files},
+            }
+            with open(os.path.join(workdir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            tmp_path = f"{bundle_path}.{os.getpid()}.tmp"
+            with tarfile.open(tmp_path, "w:gz") as tar:
+                for name in [MANIFEST_FILE] + files:
+                    tar.add(os.path.join(workdir, name), arcname=name)
+            os.replace(tmp_path, bundle_path)
+            return {**manifest, "bytes": os.path.getsize(bundle_path)}
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _export_vectors(self, repo: BundleRepository, workdir: str) -> tuple:
+        """分批读出向量库记录，写入 vectors.npy 并在快照中记录行号映射
+
+        没有对应分块记录的孤立向量不导出。
+
+        返回:
+            (rows, dim, skipped)
+        """
+        raw_path = os.path.join(workdir, "vectors.f32")
+        rows, dim, skipped = 0, 0, 0
+        with open(raw_path, "wb") as raw:
+            for batch in VectorDB.get_vector_store().iter_records(BATCH_SIZE, with_vectors=True):
+                known = repo.known_pkids([r[PRIMARY_FIELD] for r in batch])
+                kept = [r for r in batch if r[PRIMARY_FIELD] in known]
+                skipped += len(batch) - len(kept)
+                if not kept:
+                    continue
+                matrix = as_matrix([r[VECTOR_FIELD] for r in kept])
+                if dim and matrix.shape[1] != dim:
+                    raise BundleError(f"Inconsistent vector dim in store: {dim} vs {matrix.shape[1]}")
+                dim = matrix.shape[1]
+                raw.write(matrix.tobytes())
+                repo.add_vectors(rows, [
+                    (
+                        r[PRIMARY_FIELD],
+                        r.get(TEXT_FIELD),
+                        {k: v for k, v in r.items() if k not in (PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD)},
+                    )
+                    for r in kept
+                ])
+                rows += len(kept)
+
+        # 按最终行数写出 .npy (分块复制，不把整个矩阵读入内存)
+        source = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(rows, dim)) if rows else None
+        target = np.lib.format.open_memmap(
+            os.path.join(workdir, VECTORS_FILE), mode="w+", dtype=np.float32, shape=(rows, dim)
+        )
+        for i in range(0, rows, 65536):
+            target[i:i + 65536] = source[i:i + 65536]
+        target.flush()
+        del target, source
+        os.remove(raw_path)
+        return rows, dim, skipped
+
+    @staticmethod
+    def read_manifest(bundle_path: str) -> Dict[str, Any]:
+        """只读取快照清单 (不解包数据文件)"""
+        try:
+            with tarfile.open(bundle_path, "r:gz") as tar:
+                member = tar.extractfile(MANIFEST_FILE)
+                manifest = json.load(member)
+        except (OSError, KeyError, ValueError, tarfile.TarError) as e:
+            raise BundleError(f"Not a valid bundle: {bundle_path} ({e})", e)
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise BundleError(f"Not a valid bundle: {bundle_path}")
+        if manifest.get("version", 0) > BUNDLE_VERSION:
+            raise BundleError(
+                f"Bundle version {manifest['version']} is newer than supported ({BUNDLE_VERSION}); upgrade x1ayu_rag."
+            )
+        return manifest
+
+    def check_compatible(self, manifest: Dict[str, Any]) -> None:
+        """快照的 Embedding 模型与当前配置不一致时抛出 BundleError"""
+        current = LLMFactory.embedding_identity()
+        if manifest.get("embedding") != current:
+            raise BundleError(
+                f"Bundle was built with embedding model {manifest.get('embedding')}, "
+                f"but the current configuration uses {current}. "
+                "Configure the same embedding model before importing."
+            )
+
+    def import_bundle(self, bundle_path: str, replace: bool = False) -> Dict[str, Any]:
+        """导入快照
+
+        参数:
+            bundle_path: 快照文件路径
+            replace: 当前知识库非空时是否替换 (否则拒绝导入)
+
+        返回:
+            dict: 快照清单，另含实际写入的 documents / chunks / vectors 数
+        """
+        manifest = self.read_manifest(bundle_path)
+        self.check_compatible(manifest)
+        conn = SqliteDB.get_conn()
+        existing = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        if existing and not replace:
+            raise BundleError(
+                f"Knowledge base already contains {existing} documents; use --replace to overwrite it."
+            )
+
+        workdir = tempfile.mkdtemp(prefix="bundle-", dir=kb_dir())
+        try:
+            self._extract(bundle_path, manifest, workdir)
+            repo = BundleRepository(os.path.join(workdir, METADATA_FILE))
+            try:
+                counts = self._load(repo, manifest, workdir, conn)
+            finally:
+                repo.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        return {**manifest, **counts}
+
+    @staticmethod
+    def _extract(bundle_path: str, manifest: Dict[str, Any], workdir: str) -> None:
+        """解包清单中列出的文件并校验 sha256 (不信任归档中的其他路径)"""
+        expected = manifest.get("sha256") or {}
+        with tarfile.open(bundle_path, "r:gz") as tar:
+            for name in expected:
+                if name not in BUNDLE_FILES:
+                    raise BundleError(f"Unexpected file in bundle: {name}")
+                member = tar.extractfile(name)
+                if member is None:
+                    raise BundleError(f"Bundle is missing {name}")
+                with open(os.path.join(workdir, name), "wb") as f:
+                    shutil.copyfileobj(member, f, 1 << 20)
+        for name, digest in expected.items():
+            if _sha256(os.path.join(workdir, name)) != digest:
+                raise BundleError(f"Checksum mismatch for {name}; the bundle is corrupted.")
+
+    def _load(self, repo: BundleRepository, manifest: Dict[str, Any], workdir: str, conn) -> Dict[str, int]:
+        """替换元数据并把向量写入新集合后切换
+
+        元数据在同一个 SQLite 事务中替换，向量写入新位置的集合；全部写完后原子替换 vectors.json
+        并提交事务。切换前的任何失败都回滚元数据并删除新集合，原知识库保持不变。
+        """
+        vectors = np.load(os.path.join(workdir, VECTORS_FILE), mmap_mode="r")
+        if vectors.shape[0] != manifest["vectors"]:
+            raise BundleError("Vector matrix does not match the manifest.")
+        if vectors.shape[0] and (vectors.ndim != 2 or vectors.shape[1] != manifest.get("dim")):
+            raise BundleError(
+                f"Vector dim {vectors.shape[1:]} does not match the manifest dim {manifest.get('dim')}."
+            )
+        backend = VectorDB.get_backend()
+        location = VectorDB.new_location(backend, uuid.uuid4().hex[:12])
+        state = VectorDB.load_state()
+        store = None
+        switched = False
+        try:
+            counts = repo.load_into(conn)
+            VectorDB.remove_location(location)
+            embeddings = LLMFactory.get_embeddings()
+            projection_file = os.path.join(workdir, PROJECTION_FILE)
+            if os.path.exists(projection_file):
+                shutil.copyfile(projection_file, VectorDB.projection_path(location))
+                embeddings = ProjectedEmbeddings(embeddings, Projection.load(projection_file))
+            store = VectorDB.open_store(backend, location, embeddings)
+            loaded = 0
+            for rows in repo.iter_vectors():
+                store.add_embeddings(
+                    texts=[r["content"] or "" for r in rows],
+                    embeddings=np.asarray(vectors[[r["row"] for r in rows]]).tolist(),
+                    metadatas=[json.loads(r["metadata"]) for r in rows],
+                    ids=[r["pk"] for r in rows],
+                )
+                loaded += len(rows)
+            store.close()
+            store = None
+            VectorDB.switch_collection(VectorDB.make_tag(backend, location))
+            switched = True
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if store is not None:
+                store.close()
+            if switched:
+                VectorDB.save_state(state)
+                VectorDB.reset()
+            VectorDB.remove_location(location)
+            if isinstance(e, BundleError):
+                raise
+            raise BundleError(f"Failed to import bundle: {e}", e)
+        finally:
+            del vectors
+        from x1ayu_rag.service.reindex_service import ReindexService
+        ReindexService().cleanup_retired()
+        counts["vectors"] = loaded
+        return counts
@@ -0,0 +1,168 @@
+import os
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+from x1ayu_rag.config.app_config import load_config
+from x1ayu_rag.config.constants import DEFAULT_KB_NAME, KB_DIR_NAME
+from x1ayu_rag.config.kb_context import current_kb, kb_dir
+from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.db.vector_db import VectorDB
+from x1ayu_rag.db.vector_store import VECTOR_FIELD, VectorStore
+
+
+class CompactService:
+    """存储压缩与维护
+
+    update_document 先删后写，持续更新会在向量库中留下已删除的记录 (Milvus 段中的删除标记、
+    NumPy 矩阵中的墓碑行)，在 SQLite 中留下空闲页。压缩依次：
+    - 合并向量库的段并 flush (NumPy 后端为重排矩阵)，按当前数据重建向量索引
+    - SQLite VACUUM (随后重建全文索引)、ANALYZE、PRAGMA optimize
+    并报告压缩前后知识库目录大小与检索延迟 (用库中已存储的向量作为查询，不调用 Embedding 模型)。
+
+    自动压缩 (config.json 中的 maintenance.auto_compact_ratio) 在摄取更新后检查删除比例，
+    超过阈值时执行同样的压缩，不测量延迟。
+    """
+
+    # 测量检索延迟的查询数与每次检索的 k
+    LATENCY_QUERIES = 20
+    LATENCY_K = 10
+    # 自动压缩要求的最少删除行数 / 空闲页数 (数据量很小时不值得整理)
+    AUTO_MIN_DELETED = 256
+
+    def __init__(self):
+        SqliteDB.init_db()
+
+    @staticmethod
+    def auto_threshold() -> Optional[float]:
+        """config.json 中的自动压缩阈值 (maintenance.auto_compact_ratio)，未配置时为 None"""
+        ratio = (load_config().get("maintenance") or {}).get("auto_compact_ratio")
+        return float(ratio) if ratio is not None else None
+
+    def compact(
+        self, measure: bool = True, progress: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """压缩当前知识库
+
+        参数:
+            measure: 是否测量压缩前后的检索延迟
+            progress: 各阶段开始时调用 progress(阶段说明)
+
+        返回:
+            dict: before / after (见 measure)、reclaimed_vectors (回收的向量记录数)、seconds
+        """
+        start = time.perf_counter()
+        store = VectorDB.get_vector_store()
+        queries = self._sample_queries(store) if measure else []
+        if progress:
+            progress("Measuring")
+        before = self.measure(queries)
+
+        if progress:
+            progress("Compacting vector segments")
+        reclaimed = store.compact()
+        if progress:
+            progress("Rebuilding vector index")
+        store.rebuild_index()
+        if progress:
+            progress("Vacuuming SQLite")
+        SqliteDB.optimize()
+
+        if progress:
+            progress("Measuring")
+        after = self.measure(queries)
+        return {
+            "before": before,
+            "after": after,
+            "reclaimed_vectors": reclaimed,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def auto_compact(self) -> Optional[Dict[str, Any]]:
+        """删除比例超过配置的阈值时压缩当前知识库
+
+        返回:
+            dict: 压缩报告 (见 compact，不含延迟)；未配置阈值或无需压缩时为 None
+        """
+        threshold = self.auto_threshold()
+        if threshold is None or not self.needs_compaction(threshold):
+            return None
+        return self.compact(measure=False)
+
+    def needs_compaction(self, threshold: float) -> bool:
+        """向量库的删除比例或 SQLite 的空闲页比例是否达到阈值"""
+        stats = VectorDB.get_vector_store().stats()
+        deleted = stats["deleted"] or 0
+        if deleted >= self.AUTO_MIN_DELETED and self.deleted_ratio(stats) >= threshold:
+            return True
+        pages = SqliteDB.page_stats()
+        return (
+            pages["free_pages"] >= self.AUTO_MIN_DELETED
+            and pages["free_pages"] / pages["pages"] >= threshold
+        )
+
+    @staticmethod
+    def deleted_ratio(stats: Dict[str, Any]) -> Optional[float]:
+        """已删除记录占全部记录 (存活 + 已删除) 的比例，后端无法统计时为 None"""
+        if stats["deleted"] is None:
+            return None
+        total = stats["rows"] + stats["deleted"]
+        return stats["deleted"] / total if total else 0.0
+
+    # ---- 测量 ----
+
+    def measure(self, queries: List[List[float]]) -> Dict[str, Any]:
+        """当前知识库的存储统计
+
+        参数:
+            queries: 测量检索延迟所用的查询向量 (为空时不测量)
+
+        返回:
+            dict: bytes (知识库目录大小)、vectors、deleted_vectors、deleted_ratio、
+                  sqlite_free_ratio、latency_ms (检索延迟中位数，未测量时为 None)
+        """
+        store = VectorDB.get_vector_store()
+        stats = store.stats()
+        pages = SqliteDB.page_stats()
+        return {
+            "bytes": self.kb_bytes(),
+            "vectors": stats["rows"],
+            "deleted_vectors": stats["deleted"],
+            "deleted_ratio": self.deleted_ratio(stats),
+            "sqlite_free_ratio": pages["free_pages"] / pages["pages"] if pages["pages"] else 0.0,
+            "latency_ms": self._latency(store, queries) if queries else None,
+        }
+
+    @staticmethod
+    def kb_bytes() -> int:
+        """当前知识库数据目录的总大小 (默认知识库不计入命名知识库的子目录)"""
+        root = kb_dir()
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            if dirpath == root and current_kb() == DEFAULT_KB_NAME and KB_DIR_NAME in dirnames:
+                dirnames.remove(KB_DIR_NAME)
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    # 临时文件可能在遍历期间被删除
+                    pass
+        return total
+
+    def _sample_queries(self, store: VectorStore) -> List[List[float]]:
+        """取库中前 LATENCY_QUERIES 条已存储的向量作为查询"""
+        records = store.iter_records(self.LATENCY_QUERIES, with_vectors=True)
+        try:
+            batch = next(records, [])
+        finally:
+            records.close()
+        return [list(r[VECTOR_FIELD]) for r in batch]
+
+    def _latency(self, store: VectorStore, queries: List[List[float]]) -> float:
+        """逐条检索的延迟中位数 (毫秒)，第一条查询先预热一次"""
+        store.search_by_vectors(queries[:1], self.LATENCY_K)
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            store.search_by_vectors([query], self.LATENCY_K)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,214 @@
+import uuid
+import numpy as np
+from x1ayu_rag.config.app_config import load_config, save_config
+from x1ayu_rag.db.milvus_db import MilvusDB
+from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.db.vector_db import VectorDB
+from x1ayu_rag.db.vector_store import PRIMARY_FIELD, TEXT_FIELD, VECTOR_FIELD
+from x1ayu_rag.llm.projection import Projection, ProjectedEmbeddings
+from x1ayu_rag.repository.chunk_repository import ChunkRepository
+from x1ayu_rag.utils.vector_math import as_matrix, exact_top_k
+from x1ayu_rag.error.exceptions import ConfigurationError, DatabaseError
+
+
+def bytes_per_vector(dim: int, index_params: dict) -> float:
+    """估算单个向量在索引中占用的字节数"""
+    if index_params["index_type"] == "IVF_SQ8":
+        return float(dim)
+    return 4.0 * dim
+
+
+class CompressionService:
+    """向量压缩服务
+
+    拟合降维投影，按新的索引类型在新位置建立集合，并评估内存节省与召回损失。
+    新集合写完后在 SQLite 写锁内补齐期间的变更，再原子替换 vectors.json 切换；
+    切换前的任何失败 (包括中断) 只会留下未使用的新集合，原集合保持不变。
+    """
+
+    EMBED_BATCH_SIZE = 64
+    WRITE_BATCH_SIZE = 1000
+
+    def compress(
+        self,
+        method: str = "pca",
+        dim: int | None = None,
+        index_type: str = "FLAT",
+        index_params: dict | None = None,
+        sample_size: int = 200,
+        k: int = 10,
+    ) -> dict:
+        """压缩向量集合
+
+        参数:
+            method: 降维方式 (pca / truncate / none)
+            dim: 目标维度，method 为 none 时忽略
+            index_type: 新集合的索引类型 (FLAT / IVF_FLAT / IVF_SQ8 / HNSW)
+            index_params: 覆盖默认索引参数
+            sample_size: 用于评估召回率的查询样本数
+            k: 评估召回率时的 top-k
+
+        返回:
+            dict: 压缩报告 (recall 在向量少于 2 个时为 None)
+        """
+        old_vector_config = load_config().get("vector", {})
+        old_index = MilvusDB.get_index_params(old_vector_config)
+        new_vector_config = {
+            **old_vector_config,
+            "index_type": index_type.upper(),
+            "index_params": index_params or {},
+        }
+        new_index = MilvusDB.get_index_params(new_vector_config)
+        if VectorDB.get_backend() == "numpy" and new_index["index_type"] != "FLAT":
+            raise ConfigurationError("The numpy vector backend only supports exact FLAT search.")
+        active = VectorDB.tag_active()
+
+        # 1. 导出全部记录
+        records = [r for batch in VectorDB.get_vector_store().iter_records() for r in batch]
+        if not records:
+            raise DatabaseError("Vector store is empty, nothing to compress.")
+        ids = [r.pop(PRIMARY_FIELD) for r in records]
+        texts = [r.pop(TEXT_FIELD) for r in records]
+        stored = as_matrix([r.pop(VECTOR_FIELD) for r in records])
+        metadatas = records
+        old_projection = Projection.load_if_exists(VectorDB.projection_path())
+
+        # 2. 取得原始维度的向量：未压缩过时直接复用库中向量，否则需用原模型重新嵌入
+        embeddings = VectorDB.get_model_embeddings()
+        if old_projection is None:
+            full = stored
+        else:
+            full = as_matrix([
+                v
+                for i in range(0, len(texts), self.EMBED_BATCH_SIZE)
+                for v in embeddings.embed_documents(texts[i:i + self.EMBED_BATCH_SIZE])
+            ])
+
+        # 3. 拟合新投影
+        if method == "none":
+            projection = None
+        elif not dim:
+            raise ConfigurationError("Target dim is required for dimension reduction.")
+        elif method == "pca":
+            projection = Projection.fit_pca(full, dim)
+        else:
+            projection = Projection.truncate(full.shape[1], dim)
+        compressed = projection.apply(full) if projection else full
+        out_dim = compressed.shape[1]
+
+        # 4. 在原始向量上计算精确近邻作为召回率基准 (排除查询自身，至少需要 2 个向量)
+        n = len(ids)
+        k = max(1, min(k, n - 1))
+        sample, truth = None, None
+        if n > 1:
+            rng = np.random.default_rng(0)
+            sample = rng.choice(n, size=min(sample_size, n), replace=False)
+            truth_idx, _ = exact_top_k(full[sample], full, k + 1)
+            truth = [
+                {ids[j] for j in row if j != q}
+                for q, row in zip(sample, truth_idx)
+            ]
+
+        # 5. 在新位置建立集合，评估召回率后切换
+        location = VectorDB.new_location(active["backend"], uuid.uuid4().hex[:12])
+        store = None
+        try:
+            store = self._build(
+                active["backend"], location, embeddings, projection, new_vector_config,
+                ids, texts, metadatas, compressed,
+            )
+            recall = None
+            if sample is not None:
+                try:
+                    recall = self._measure_recall(store, compressed[sample], [ids[q] for q in sample], truth, k)
+                except Exception:
+                    recall = None
+            self._switch(store, active, location, new_vector_config)
+        except BaseException as e:
+            if store is not None:
+                store.close()
+            VectorDB.remove_location(location)
+            if isinstance(e, Exception) and not isinstance(e, DatabaseError):
+                raise DatabaseError(f"Failed to rebuild vector collection: {e}", e)
+            raise
+
+        bytes_before = n * bytes_per_vector(stored.shape[1], old_index)
+        bytes_after = n * bytes_per_vector(out_dim, new_index)
+        return {
+            "vectors": n,
+            "method": method,
+            "dim_before": stored.shape[1],
+            "dim_after": out_dim,
+            "index_before": old_index["index_type"],
+            "index_after": new_index["index_type"],
+            "bytes_before": int(bytes_before),
+            "bytes_after": int(bytes_after),
+            "memory_saved": 1 - bytes_after / bytes_before if bytes_before else 0.0,
+            "k": k,
+            "recall": recall,
+        }
+
+    def _build(self, backend, location, embeddings, projection, vector_config, ids, texts, metadatas, vectors):
+        """在新位置写入投影与向量，返回打开的新集合"""
+        VectorDB.remove_location(location)
+        if projection is not None:
+            projection.save(VectorDB.projection_path(location))
+            embeddings = ProjectedEmbeddings(embeddings, projection)
+        store = VectorDB.open_store(backend, location, embeddings, vector_config)
+        for i in range(0, len(ids), self.WRITE_BATCH_SIZE):
+            store.add_embeddings(
+                texts=texts[i:i + self.WRITE_BATCH_SIZE],
+                embeddings=vectors[i:i + self.WRITE_BATCH_SIZE].tolist(),
+                metadatas=metadatas[i:i + self.WRITE_BATCH_SIZE],
+                ids=ids[i:i + self.WRITE_BATCH_SIZE],
+            )
+        return store
+
+    def _switch(self, store, active: dict, location: str, vector_config: dict) -> None:
+        """在 SQLite 写锁内补齐建立新集合期间的变更，切换集合并保存新的 vector 配置
+
+        持锁期间其他进程的摄取在 busy_timeout 内等待，不会在对比之后、切换之前写入原集合。
+        """
+        conn = SqliteDB.get_conn()
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._catch_up(store, VectorDB.get_vector_store(), ChunkRepository(conn))
+            store.close()
+            VectorDB.switch_collection(VectorDB.make_tag(active["backend"], location, active["embedding"]))
+            # 整体替换 vector 配置，避免旧索引参数残留
+            cfg = load_config()
+            cfg["vector"] = vector_config
+            save_config(cfg)
+        finally:
+            conn.rollback()
+        from x1ayu_rag.service.reindex_service import ReindexService
+        ReindexService().cleanup_retired()
+
+    def _catch_up(self, store, source, repo: ChunkRepository) -> None:
+        """以原集合为准，补齐新集合缺少的分块 (用模型与新投影嵌入) 并删除多余的分块"""
+        current = {pk for batch in source.iter_ids() for pk in batch}
+        built = {pk for batch in store.iter_ids() for pk in batch}
+        missing = sorted(current - built)
+        stale = sorted(built - current)
+        for i in range(0, len(missing), self.EMBED_BATCH_SIZE):
+            chunks = repo.get_embeddable(missing[i:i + self.EMBED_BATCH_SIZE])
+            if chunks:
+                texts = [c.content for c in chunks]
+                store.add_embeddings(
+                    texts=texts,
+                    embeddings=store.embeddings.embed_documents(texts),
+                    metadatas=[c.metadata for c in chunks],
+                    ids=[c.pkid for c in chunks],
+                )
+        if stale:
+            store.delete(stale)
+
+    def _measure_recall(self, store, queries: np.ndarray, query_ids: list, truth: list[set], k: int) -> float:
+        """在新集合上检索样本查询，计算相对原始向量精确结果的 recall@k"""
+        results = store.search_by_vectors(queries.tolist(), k + 1)
+        hits = 0
+        for query_id, expected, result in zip(query_ids, truth, results):
+            found = [doc.id for doc, _ in result if doc.id != query_id][:k]
+            hits += len(expected.intersection(found))
+        return hits / (k * len(truth))
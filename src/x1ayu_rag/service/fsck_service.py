@@ -0,0 +1,248 @@
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.db.vector_db import VectorDB
+from x1ayu_rag.repository.chunk_repository import ChunkRepository
+from x1ayu_rag.repository.document_repository import DocumentRepository
+from x1ayu_rag.utils.path_utils import to_relative_path
+
+# 报告中每类问题列出的示例数
+SAMPLE_SIZE = 10
+
+
+class FsckService:
+    """SQLite 与向量库的一致性检查与修复
+
+    两个存储的写入并非原子 (见 DocumentRepository.add)，崩溃或中断后可能出现：
+    - vanished_documents: 源文件已不存在的文档
+    - dangling_chunks: 所属文档已不存在的分块行
+    - orphan_vectors: 向量库中没有对应分块行的向量
+    - missing_vectors: 有本地文本但缺少向量的分块 (可直接重新嵌入)
+    - lost_chunks: 既没有本地文本也没有向量的分块 (只能重新摄取所属文档)
+
+    检查只分批流式读取两侧的主键 (不加载文本与向量)，用集合运算对比，耗时与分块数成线性关系。
+    """
+
+    # 流式读取主键的批大小
+    SCAN_BATCH_SIZE = 1000
+    # 修复时每批重新嵌入的分块数
+    EMBED_BATCH_SIZE = 256
+    # 源文件缺失的文档超过该比例时不删除 (通常是知识库从别处导入或源目录被移动)，除非指定 force
+    VANISHED_FORCE_RATIO = 0.5
+
+    def __init__(self):
+        self.doc_repo = DocumentRepository()
+        SqliteDB.init_db()
+
+    def check(
+        self, repair: bool = False, progress: Optional[Callable[[str], None]] = None, force: bool = False
+    ) -> Dict[str, Any]:
+        """检查 (并可选修复) 当前知识库
+
+        参数:
+            repair: 是否修复发现的问题
+            progress: 各阶段开始时调用 progress(阶段说明)
+            force: 源文件缺失的文档超过 VANISHED_FORCE_RATIO 时仍然删除
+
+        返回:
+            dict: documents / chunks / vectors (扫描到的数量)、各类问题的数量及总数 issues、
+                  samples (每类问题的示例)、repaired (修复数量，未修复时为 None)、
+                  vanished_kept (是否因缺失比例过高而保留了源文件缺失的文档)、seconds
+        """
+        start = time.perf_counter()
+        report: Dict[str, Any] = {"samples": {}, "repaired": None, "vanished_kept": False}
+        repaired: Dict[str, int] = {}
+
+        if progress:
+            progress("Checking document files")
+        vanished = self._find_vanished()
+        report["vanished_documents"] = len(vanished)
+        report["samples"]["vanished_documents"] = [path for _, path in vanished[:SAMPLE_SIZE]]
+        if repair and vanished and not force and self._mostly_vanished(len(vanished)):
+            # 多数文档同时缺失更可能是路径变化而非删除，不整库删除
+            report["vanished_kept"] = True
+        elif repair and vanished:
+            if progress:
+                progress("Removing vanished documents")
+            for uuid, _ in vanished:
+                self.doc_repo.delete_by_uuid(uuid)
+            repaired["vanished_documents"] = len(vanished)
+
+        if progress:
+            progress("Comparing chunk and vector ids")
+        scan = self._scan()
+        report.update(documents=scan["documents"], chunks=scan["chunks"], vectors=scan["vectors"])
+        for key in ("dangling_chunks", "orphan_vectors", "missing_vectors", "lost_chunks"):
+            report[key] = len(scan[key])
+            report["samples"][key] = sorted(scan[key])[:SAMPLE_SIZE]
+        report["issues"] = self.issue_count(report)
+
+        if repair:
+            if progress:
+                progress("Repairing")
+            repaired.update(self._repair_ids(scan, progress))
+            lost_documents = sorted(scan["lost_documents"])
+            repaired["reingested_documents"] = self._reingest(lost_documents) if lost_documents else 0
+            report["repaired"] = repaired
+
+        report["seconds"] = time.perf_counter() - start
+        return report
+
+    @staticmethod
+    def issue_count(report: Dict[str, Any]) -> int:
+        """报告中发现的问题总数"""
+        return sum(report[key] for key in (
+            "vanished_documents", "dangling_chunks", "orphan_vectors", "missing_vectors", "lost_chunks",
+        ))
+
+    # ---- 检查 ----
+
+    def _mostly_vanished(self, vanished: int) -> bool:
+        """源文件缺失的文档是否超过 VANISHED_FORCE_RATIO"""
+        documents = SqliteDB.get_read_conn().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return vanished > documents * self.VANISHED_FORCE_RATIO
+
+    def _find_vanished(self) -> List[tuple]:
+        """源文件已不存在的文档
+
+        返回:
+            List[(uuid, 相对路径)]
+        """
+        vanished = []
+        for batch in self.doc_repo.iter_locations(self.SCAN_BATCH_SIZE):
+            for uuid, name, path in batch:
+                full_path = os.path.join(path, name)
+                if not os.path.exists(os.path.abspath(full_path)):
+                    vanished.append((uuid, to_relative_path(full_path)))
+        return vanished
+
+    def _scan(self) -> Dict[str, Any]:
+        """流式对比 SQLite 分块与向量库主键
+
+        返回:
+            dict: 数量 (documents, chunks, vectors) 及各类问题的 pkid 集合；
+                  lost_documents 为含 lost_chunks 的文档 uuid 集合
+        """
+        repo = ChunkRepository()
+        # 应当有向量的分块 (所属文档存在)；遍历向量库时逐个划掉，剩下的即缺少向量
+        expected: Dict[str, bool] = {}
+        dangling, lost_documents = set(), {}
+        chunks = 0
+        for batch in repo.iter_chunk_states(self.SCAN_BATCH_SIZE):
+            chunks += len(batch)
+            for pkid, has_content, has_document, document_id in batch:
+                if has_document:
+                    expected[pkid] = has_content
+                    if not has_content:
+                        lost_documents[pkid] = document_id
+                else:
+                    dangling.add(pkid)
+
+        orphans, vectors = set(), 0
+        for batch in VectorDB.get_vector_store().iter_ids(self.SCAN_BATCH_SIZE):
+            vectors += len(batch)
+            for pk in batch:
+                if expected.pop(pk, None) is None:
+                    orphans.add(pk)
+                else:
+                    lost_documents.pop(pk, None)
+
+        documents = SqliteDB.get_read_conn().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "documents": documents,
+            "chunks": chunks,
+            "vectors": vectors,
+            "dangling_chunks": dangling,
+            "orphan_vectors": orphans,
+            "missing_vectors": {pk for pk, has_content in expected.items() if has_content},
+            "lost_chunks": set(lost_documents),
+            "lost_documents": set(lost_documents.values()),
+        }
+
+    # ---- 修复 ----
+
+    def _repair_ids(self, scan: Dict[str, Any], progress: Optional[Callable[[str], None]]) -> Dict[str, int]:
+        """删除悬空分块与孤立向量，为缺少向量的分块重新嵌入
+
+        删除在 SQLite 写锁内重新核对候选：摄取在提交前先写向量，持锁时不存在进行中的摄取，
+        核对后仍不一致的才是真正的问题，不会误删刚写入的向量。
+        重新嵌入与 ReindexService 相同：每批先在锁外嵌入，再在短暂的写锁内核对分块仍存在且
+        文本未变后写入向量，摄取不会因等待 Embedding 模型而被阻塞。
+        """
+        repaired = {"dangling_chunks": 0, "orphan_vectors": 0, "missing_vectors": 0}
+        if not (scan["dangling_chunks"] or scan["orphan_vectors"] or scan["missing_vectors"]):
+            return repaired
+        conn = SqliteDB.get_conn()
+        if scan["dangling_chunks"] or scan["orphan_vectors"]:
+            conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                repo = ChunkRepository(conn)
+                dangling = sorted(scan["dangling_chunks"])
+                repaired["dangling_chunks"] = repo.delete_dangling(dangling)
+
+                # 悬空分块的向量一并作为孤立向量删除
+                candidates = sorted(scan["orphan_vectors"] | scan["dangling_chunks"])
+                orphans = sorted(set(candidates) - repo.existing_pkids(candidates))
+                store = repo.vector_store
+                for i in range(0, len(orphans), self.SCAN_BATCH_SIZE):
+                    store.delete(orphans[i:i + self.SCAN_BATCH_SIZE])
+                repaired["orphan_vectors"] = len(set(orphans) & scan["orphan_vectors"])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        missing = sorted(scan["missing_vectors"])
+        if missing and progress:
+            progress(f"Re-embedding {len(missing)} chunks")
+        reader = ChunkRepository()
+        for i in range(0, len(missing), self.EMBED_BATCH_SIZE):
+            chunks = reader.get_embeddable(missing[i:i + self.EMBED_BATCH_SIZE])
+            if not chunks:
+                continue
+            embeddings = reader.embeddings.embed_documents([c.content for c in chunks])
+            repaired["missing_vectors"] += self._write_missing(conn, chunks, embeddings)
+        return repaired
+
+    @staticmethod
+    def _write_missing(conn, chunks: List, embeddings: List[List[float]]) -> int:
+        """在写锁内核对分块仍存在且文本未变，写入锁外算好的向量
+
+        返回:
+            int: 写入的向量数
+        """
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            repo = ChunkRepository(conn)
+            current = {c.pkid: c.content for c in repo.get_embeddable([c.pkid for c in chunks])}
+            keep = [i for i, c in enumerate(chunks) if current.get(c.pkid) == c.content]
+            repo.write_vectors([chunks[i] for i in keep], [embeddings[i] for i in keep])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(keep)
+
+    def _reingest(self, document_ids: List[str]) -> int:
+        """重新摄取含有无法恢复分块的文档 (源文件仍存在时)
+
+        返回:
+            int: 重新摄取的文档数
+        """
+        from x1ayu_rag.service.ingest_service import IngestService
+        service = IngestService()
+        locations = {
+            uuid: os.path.join(path, name)
+            for batch in self.doc_repo.iter_locations(self.SCAN_BATCH_SIZE)
+            for uuid, name, path in batch
+        }
+        count = 0
+        for uuid in document_ids:
+            full_path = locations.get(uuid)
+            if full_path and os.path.exists(os.path.abspath(full_path)):
+                service.update_document(uuid, os.path.abspath(full_path))
+                count += 1
+        return count
@@ -1,15 +1,24 @@
+import base64
+import json
 import os
+from typing import Any, Iterator, Optional
 from x1ayu_rag.model.document import Document
-from x1ayu_rag.repository.document_repository import DocumentRepository
+from x1ayu_rag.repository.document_repository import SORT_COLUMNS, DocumentRepository
 from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.db.vector_db import VectorDB
 from x1ayu_rag.utils.path_utils import to_relative_path
 from x1ayu_rag.service.constants import IngestOp
+from x1ayu_rag.utils.profiling import span
+from x1ayu_rag.utils.metrics import DOCUMENTS, INGEST_DURATION
 
 class IngestService:
     """摄取服务
     
     协调文档解析、切分和存储。
     """
+    # 文档列表支持的排序键
+    SORT_KEYS = tuple(SORT_COLUMNS)
+
     def __init__(self):
         self.doc_repo = DocumentRepository()
         # 确保 DB 已初始化
@@ -60,18 +69,27 @@ class IngestService:
         # 1. 解析新文档
         # 注意：这里生成的 doc 会有一个新的随机 UUID
         new_doc = Document.from_file(file_path)
-        
-        # 2. 强制使用旧 UUID
+        return self.replace_document(uuid, new_doc)
+
+    def replace_document(self, uuid: str, new_doc: Document, vectors: list | None = None) -> str:
+        """用已解析的新文档替换旧文档 (保持 UUID)
+
+        参数:
+            uuid: 原文档 UUID
+            new_doc: 新文档
+            vectors: 与 new_doc.chunks 一一对应的已计算向量 (可选)
+        """
+        # 1. 强制使用旧 UUID
         new_doc.uuid = uuid
         # 同时更新 chunks 里的 document_id
         if new_doc.chunks:
             for chunk in new_doc.chunks:
                 chunk.document_id = uuid
 
-        # 3. 执行更新 (先删后加)
+        # 2. 执行更新 (先删后加)
         # TODO: 理想情况下应该在 Repository 层作为一个事务处理
         self.doc_repo.delete_by_uuid(uuid)
-        self.doc_repo.add(new_doc)
+        self.doc_repo.add(new_doc, vectors)
         
         return uuid
 
@@ -89,25 +107,32 @@ class IngestService:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Path not found: {to_relative_path(file_path)}")
 
+        VectorDB.tag_active()
         if os.path.isdir(file_path):
             return IngestOp.BATCH_RESULT, self.sync_directory(file_path)
         else:
-            try:
-                doc = Document.from_file(file_path)
-                existing = self.doc_repo.get_by_path_and_name(doc.path, doc.name)
-                
-                if existing:
-                    uuid = self.update_document(existing.uuid, file_path)
-                    if existing.hash == doc.hash:
-                        return IngestOp.SKIPPED, f"Document UUID: {uuid} (unchanged)"
-                    else:
-                        uuid = self.update_document(existing.uuid, file_path)
-                        return IngestOp.UPDATED, f"Document {doc.name} updated. UUID: {uuid}"
+            with span("ingest.file"), INGEST_DURATION.time():
+                op_type, result = self._ingest_file(file_path)
+            DOCUMENTS.inc(op=op_type.value)
+            return op_type, result
+
+    def _ingest_file(self, file_path: str) -> tuple[IngestOp, str]:
+        """摄取单个文件 (内容未变化时跳过)"""
+        try:
+            doc = Document.from_file(file_path)
+            existing = self.doc_repo.get_by_path_and_name(doc.path, doc.name)
+            
+            if existing:
+                if existing.hash == doc.hash:
+                    return IngestOp.SKIPPED, f"Document UUID: {existing.uuid} (unchanged)"
                 else:
-                    uuid = self.add_document(file_path)
-                    return IngestOp.ADDED, f"Document {doc.name} added. UUID: {uuid}"
-            except Exception as e:
-                return IngestOp.ERROR, str(e)
+                    uuid = self.replace_document(existing.uuid, doc)
+                    return IngestOp.UPDATED, f"Document {doc.name} updated. UUID: {uuid}"
+            else:
+                self.doc_repo.add(doc)
+                return IngestOp.ADDED, f"Document {doc.name} added. UUID: {doc.uuid}"
+        except Exception as e:
+            return IngestOp.ERROR, str(e)
 
     def sync_directory(self, root_path: str) -> list[tuple[str, str, str]]:
         """同步目录中的所有 Markdown 文件
@@ -121,39 +146,59 @@ class IngestService:
         results = []
         
         # 1. 递归扫描文件
+        fs_files = self.scan_markdown_files(root_path)
+        
+        # 2. 处理添加/更新 - 调用 ingest_document
+        for file_path in fs_files:
+            op_type, result = self.ingest_document(file_path)
+            results.append(self.to_result_row(op_type, result, file_path))
+
+        # 3. 清理已删除的文件
+        results.extend(self.delete_missing(root_path))
+        return results
+
+    @staticmethod
+    def scan_markdown_files(root_path: str) -> list[str]:
+        """递归扫描目录下的 Markdown 文件"""
         fs_files = []
         for root, _, files in os.walk(root_path):
             for file in files:
                 if file.endswith(".md"):
                     fs_files.append(os.path.join(root, file))
+        return fs_files
+
+    @staticmethod
+    def to_result_row(op_type: IngestOp, result, file_path: str) -> tuple[str, str, str]:
+        """将单文件摄取结果转换为 (action, file_path, detail/uuid)"""
+        rel_path = to_relative_path(file_path)
+        # 转换 UUID 或错误信息
+        # 如果是成功操作，result 包含 "Document ... UUID: <uuid>"，我们需要提取 UUID 或者保持原样
+        # 为了符合用户要求的格式 `[action] file uuid`，我们需要从 message 中提取 UUID
+        # ingest_document 返回的是 (op_type, message)
+        # 我们可以修改 ingest_document 返回 (op_type, uuid/error) 但这会破坏单文件调用的兼容性
+        # 这里简单解析一下 message
         
-        # 2. 处理添加/更新 - 调用 ingest_document
-        for file_path in fs_files:
-            op_type, result = self.ingest_document(file_path)
-            rel_path = to_relative_path(file_path)
-            
-            # 转换 UUID 或错误信息
-            # 如果是成功操作，result 包含 "Document ... UUID: <uuid>"，我们需要提取 UUID 或者保持原样
-            # 为了符合用户要求的格式 `[action] file uuid`，我们需要从 message 中提取 UUID
-            # ingest_document 返回的是 (op_type, message)
-            # 我们可以修改 ingest_document 返回 (op_type, uuid/error) 但这会破坏单文件调用的兼容性
-            # 这里简单解析一下 message
-            
-            detail = str(result)
-            if "UUID: " in detail:
-                detail = detail.split("UUID: ")[1].strip()
-            
-            if op_type == IngestOp.ERROR:
-                results.append(("[error]", rel_path, detail))
-            elif op_type == IngestOp.SKIPPED:
-                # 显示 [skipped] 状态
-                results.append(("[skipped]", rel_path, detail))
-            elif op_type == IngestOp.ADDED:
-                results.append(("[added]", rel_path, detail))
-            elif op_type == IngestOp.UPDATED:
-                results.append(("[updated]", rel_path, detail))
+        detail = str(result)
+        if "UUID: " in detail:
+            detail = detail.split("UUID: ")[1].strip()
+        
+        if op_type == IngestOp.ERROR:
+            return ("[error]", rel_path, detail)
+        elif op_type == IngestOp.SKIPPED:
+            # 显示 [skipped] 状态
+            return ("[skipped]", rel_path, detail)
+        elif op_type == IngestOp.ADDED:
+            return ("[added]", rel_path, detail)
+        else:
+            return ("[updated]", rel_path, detail)
 
-        # 3. 清理已删除的文件
+    def delete_missing(self, root_path: str) -> list[tuple[str, str, str]]:
+        """删除目录范围内已不存在于磁盘上的文档
+
+        返回:
+            list: ("[deleted]", file_path, uuid) 列表
+        """
+        results = []
         rel_root = to_relative_path(root_path)
         all_docs = self.doc_repo.list_all()
         
@@ -171,6 +216,7 @@ class IngestService:
                 abs_doc_path = os.path.abspath(doc_full_path)
                 if not os.path.exists(abs_doc_path):
                     self.delete_document(doc.uuid)
+                    DOCUMENTS.inc(op=IngestOp.DELETED.value)
                     results.append(("[deleted]", to_relative_path(doc_full_path), doc.uuid))
 
         return results
@@ -182,3 +228,65 @@ class IngestService:
             list[Document]: 所有已摄取的文档列表
         """
         return self.doc_repo.list_all()
+
+    def list_documents_page(
+        self,
+        sort: str = "name",
+        descending: bool = False,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        query: Optional[str] = None,
+    ) -> tuple[list[dict[str, Any]], Optional[str]]:
+        """分页列出文档 (附带分块数与大小)
+
+        参数:
+            sort: 排序键 (name / path / created / chunks / size)
+            descending: 是否降序
+            limit: 每页行数
+            cursor: 上一页返回的游标，为空时从第一页开始
+            query: 名称或路径需包含的子串 (可选)
+
+        返回:
+            (rows, next_cursor): 本页数据，及下一页游标 (没有更多时为 None)
+        """
+        after = self.decode_cursor(cursor, sort, descending) if cursor else None
+        rows = self.doc_repo.list_page(sort, descending, limit + 1, after, query)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode_cursor(rows[-1], sort, descending)
+
+    def iter_documents(
+        self,
+        sort: str = "name",
+        descending: bool = False,
+        query: Optional[str] = None,
+        page_size: int = 500,
+    ) -> Iterator[dict[str, Any]]:
+        """逐页读取并逐行产出全部匹配的文档 (内存占用与总数无关)"""
+        cursor = None
+        while True:
+            rows, cursor = self.list_documents_page(sort, descending, page_size, cursor, query)
+            yield from rows
+            if cursor is None:
+                return
+
+    @staticmethod
+    def encode_cursor(row: dict[str, Any], sort: str, descending: bool) -> str:
+        """将本页最后一行的排序列编码为不透明游标"""
+        payload = {"s": sort, "d": descending, "k": [row[c] for c in SORT_COLUMNS[sort]]}
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort: str, descending: bool) -> list:
+        """解析游标；游标无效或与当前排序不一致时抛出 ValueError"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            keys = payload["k"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        if payload.get("s") != sort or bool(payload.get("d")) != descending or len(keys) != len(SORT_COLUMNS[sort]):
+            raise ValueError("Cursor was created with a different sort order.")
+        return keys
@@ -1,18 +1,47 @@
-from typing import List, Optional
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
 from x1ayu_rag.repository.document_repository import DocumentRepository
 from x1ayu_rag.repository.chunk_repository import ChunkRepository
 from x1ayu_rag.model.document import Document
 from x1ayu_rag.model.chunk import Chunk
 from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.config.app_config import load_config
+from x1ayu_rag.config.kb_context import kb_exists, use_kb, validate_kb_name
+from x1ayu_rag.error.exceptions import ConfigurationError
+from x1ayu_rag.utils.vector_math import mmr_select
+from x1ayu_rag.utils.profiling import span
+from x1ayu_rag.utils.metrics import QUERY_DURATION
 
 class QueryService:
     """查询服务
     
     提供文档检索、列表展示和过滤功能。
+    检索方法的 kbs 参数指定多个知识库时并发检索各知识库并合并结果，见 search_federated。
     """
+    # 联邦检索的最大并发知识库数
+    FEDERATED_WORKERS = 8
+    # 联邦检索的线程池 (进程内共享)：线程复用，各线程的只读连接随之复用而不是每次查询新建
+    _federated_pool: Optional[ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
     def __init__(self):
         self.doc_repo = DocumentRepository()
-        self.chunk_repo = ChunkRepository(SqliteDB.get_conn())
+        # 确保 DB 已迁移到最新 Schema (只读检查版本，已是最新时不执行写入)
+        SqliteDB.ensure_schema()
+        # 只读访问，使用各线程的只读连接
+        self.chunk_repo = ChunkRepository()
+        # 检索结果截断的默认值 (config.json 中的 retrieval 配置)
+        retrieval_config = load_config().get("retrieval", {})
+        self.max_distance: Optional[float] = retrieval_config.get("max_distance")
+        self.elbow: Optional[float] = retrieval_config.get("elbow")
+        self.mmr_lambda: Optional[float] = retrieval_config.get("mmr_lambda")
+        self.fetch_k: Optional[int] = retrieval_config.get("fetch_k")
 
 
     def list_documents(self) -> List[Document]:
@@ -29,16 +58,415 @@ class QueryService:
             return self.list_documents()
         return self.doc_repo.search_documents(query)
 
-    def search_chunks(self, query: str, top_k: int = 2) -> List[Chunk]:
+    def search_chunks(
+        self,
+        query: str,
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        kbs: Optional[Sequence[str]] = None,
+    ) -> List[Chunk]:
         """搜索相关分块
 
         参数:
             query: 搜索关键词
-            top_k: 返回结果数量
+            top_k: 最多返回的结果数量
+            neighbors: 为每个命中分块附带同文档前后 neighbors 个分块作为上下文
+            max_distance: 距离阈值，见 apply_cutoffs (默认读取配置)
+            elbow: 分数断层阈值，见 apply_cutoffs (默认读取配置)
+            mmr_lambda: 设置后启用 MMR 多样化，见 diversify (默认读取配置)
+            fetch_k: MMR 候选池大小 (默认 top_k 的 4 倍，至少 20)
+            kbs: 检索的知识库 (默认为当前知识库)；多个知识库时结果合并排序，见 search_federated
         """
         if not query or not query.strip():
             return []
-        return self.chunk_repo.search_chunks(query, top_k)
+        if kbs:
+            kbs = self.check_kbs(kbs)
+        if kbs and len(kbs) > 1:
+            return self.search_federated(
+                query, kbs, top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k
+            )
+        with use_kb(kbs[0] if kbs else None), QUERY_DURATION.time(mode="single"):
+            return self.search_by_vector(
+                self.chunk_repo.embed_query(query), top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k
+            )
+
+    def search_federated(
+        self,
+        query: str,
+        kbs: Sequence[str],
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> List[Chunk]:
+        """在多个知识库中并发检索并合并结果 (参数同 search_chunks)
+
+        查询在每个向量空间 (见 _vector_space) 中只嵌入一次，同一 Embedding 模型的知识库共用查询向量；
+        每个知识库在各自的线程中按向量检索 top_k (截断、MMR 与邻近扩展均在库内完成)，
+        合并后按分数重新排序取 top_k，见 merge_results。分块的 extra 中记录来源知识库 kb。
+        """
+        with QUERY_DURATION.time(mode="single"):
+            spaces = self.kb_spaces(kbs)
+            vectors = self._embed_per_space(spaces, lambda: self.chunk_repo.embed_query(query))
+            per_kb = self._run_per_kb(spaces, lambda space: [self.search_by_vector(
+                vectors[space], top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k
+            )])
+            return self.merge_results([(kb, space, results[0]) for kb, space, results in per_kb], top_k)
+
+    def kb_spaces(self, kbs: Sequence[str]) -> Dict[str, str]:
+        """各知识库的向量空间标识 (见 _vector_space)，按 kbs 的顺序"""
+        spaces = {}
+        for kb in self.check_kbs(kbs):
+            with use_kb(kb):
+                spaces[kb] = self._vector_space(kb)
+        return spaces
+
+    def _embed_per_space(self, spaces: Dict[str, str], embed: Callable[[], Any]) -> Dict[str, Any]:
+        """每个向量空间执行一次 embed (在该空间第一个知识库的上下文中，各空间并发)
+
+        返回:
+            Dict[space, embed 的返回值]
+        """
+        first = {}
+        for kb, space in spaces.items():
+            first.setdefault(space, kb)
+
+        def _embed(space: str):
+            with use_kb(first[space]):
+                return space, embed()
+
+        return dict(self.federated_pool().map(_embed, first))
+
+    def _run_per_kb(
+        self, spaces: Dict[str, str], search: Callable[[str], List[List[Chunk]]]
+    ) -> List[Tuple[str, str, List[List[Chunk]]]]:
+        """在各知识库的上下文中并发执行 search(space)
+
+        参数:
+            spaces: 知识库到向量空间标识的映射，见 kb_spaces
+
+        返回:
+            List[(kb, space, results)]: results 为 search 的返回值
+        """
+        def _search(kb: str):
+            # ContextVar 不会传递到线程池，在任务内切换知识库
+            with use_kb(kb):
+                return kb, spaces[kb], search(spaces[kb])
+
+        return list(self.federated_pool().map(_search, spaces))
+
+    @classmethod
+    def federated_pool(cls) -> ThreadPoolExecutor:
+        """联邦检索共享的线程池 (首次使用时创建)"""
+        with cls._pool_lock:
+            if cls._federated_pool is None:
+                cls._federated_pool = ThreadPoolExecutor(
+                    max_workers=cls.FEDERATED_WORKERS, thread_name_prefix="rag-kb"
+                )
+            return cls._federated_pool
+
+    @staticmethod
+    def check_kbs(kbs: Sequence[str]) -> List[str]:
+        """去重并校验知识库均已建立，否则抛出 ConfigurationError"""
+        kbs = list(dict.fromkeys(kbs))
+        for kb in kbs:
+            if not kb_exists(validate_kb_name(kb)):
+                raise ConfigurationError(f"Knowledge base not found: {kb}")
+        return kbs
+
+    @staticmethod
+    def _vector_space(kb: str) -> str:
+        """知识库向量所在空间的标识
+
+        同一 Embedding 模型且未经降维投影的集合的距离可以直接比较；
+        投影各自拟合，带投影的集合单独成为一个空间。
+        """
+        from x1ayu_rag.db.vector_db import VectorDB
+        if os.path.exists(VectorDB.projection_path()):
+            return f"projection:{kb}"
+        return json.dumps(VectorDB.active_collection()["identity"], sort_keys=True)
 
+    @staticmethod
+    def merge_results(per_kb: List[Tuple[str, str, List[Chunk]]], top_k: int) -> List[Chunk]:
+        """合并多个知识库的检索结果
+
+        所有知识库处于同一向量空间时按原始 L2 距离排序；否则全部分数按合并结果的
+        全局最小 / 最大值归一化到 [0, 1] 后排序。各库共用同一参照，库内最相关的结果
+        不会被拉到 0，只有一条结果的知识库也不会因此得到满分。
+        归一化后的分数记录在 extra 的 normalized_score 中，score 保持原值。
+
+        参数:
+            per_kb: (kb, space, chunks) 列表，chunks 按 score 升序
+            top_k: 合并后保留的数量
+        """
+        comparable = len({space for _, space, _ in per_kb}) <= 1
+        scores = [c.score for _, _, chunks in per_kb for c in chunks if c.score is not None]
+        low, high = (min(scores), max(scores)) if scores else (0.0, 0.0)
+        merged: List[Tuple[float, int, Chunk]] = []
+        for order, (kb, _, chunks) in enumerate(per_kb):
+            for rank, chunk in enumerate(chunks):
+                if chunk.score is None:
+                    key = float("inf")
+                elif comparable:
+                    key = chunk.score
+                else:
+                    key = (chunk.score - low) / (high - low) if high > low else 0.0
+                extra: Dict[str, Any] = {**(chunk.extra or {}), "kb": kb}
+                if not comparable and chunk.score is not None:
+                    extra["normalized_score"] = round(key, 6)
+                chunk.extra = extra
+                # 分数相同时按库内排名、再按知识库顺序
+                merged.append((key, rank * len(per_kb) + order, chunk))
+        merged.sort(key=lambda item: (item[0], item[1]))
+        return [chunk for _, _, chunk in merged[:top_k]]
+
+    def search_by_vector(
+        self,
+        vector: List[float],
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> List[Chunk]:
+        """按已嵌入的查询向量搜索相关分块 (参数同 search_chunks)
+
+        只访问本地存储，供异步服务在嵌入完成后调用。
+        """
+        mmr_lambda = self.mmr_lambda if mmr_lambda is None else mmr_lambda
+        if mmr_lambda is None:
+            hits = self.chunk_repo.search_by_vectors([vector], top_k)[0]
+            chunks = self.apply_cutoffs(hits, max_distance, elbow)
+        else:
+            query_vector, candidates, matrix = self.chunk_repo.search_candidates_by_vectors(
+                [vector], self._fetch_k(top_k, fetch_k)
+            )[0]
+            chunks = self.diversify(
+                query_vector, candidates, matrix, top_k, mmr_lambda, max_distance, elbow
+            )
+        return self.expand_neighbors(chunks, neighbors)
 
-    
\ No newline at end of file
+    def _fetch_k(self, top_k: int, fetch_k: Optional[int]) -> int:
+        fetch_k = fetch_k or self.fetch_k or max(top_k * 4, 20)
+        return max(fetch_k, top_k)
+
+    def diversify(
+        self,
+        query_vector: np.ndarray,
+        candidates: List[Chunk],
+        matrix: np.ndarray,
+        top_k: int,
+        mmr_lambda: float,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+    ) -> List[Chunk]:
+        """对候选池做最大边际相关性 (MMR) 重排，返回多样化的 top_k
+
+        使用检索时一并取回的候选向量在本地计算，不重新嵌入候选。
+        距离阈值与分数断层先作用于候选池。
+
+        参数:
+            query_vector: 查询向量
+            candidates: 按 score 升序排列的候选分块
+            matrix: 候选向量矩阵，行与 candidates 一一对应
+            top_k: 返回数量
+            mmr_lambda: 1 为纯相关性，0 为纯多样性
+        """
+        candidates = self.apply_cutoffs(candidates, max_distance, elbow)
+        # apply_cutoffs 只截掉尾部，候选与矩阵的前缀仍一一对应
+        with span("rerank.mmr"):
+            selected = mmr_select(query_vector, matrix[:len(candidates)], top_k, mmr_lambda)
+        return [candidates[i] for i in selected]
+
+    def apply_cutoffs(
+        self,
+        chunks: List[Chunk],
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+    ) -> List[Chunk]:
+        """按分数截断检索结果 (动态 k)
+
+        score 为 L2 距离平方，越小越相似。
+
+        参数:
+            chunks: 按 score 升序排列的检索结果
+            max_distance: 丢弃 score 大于该值的结果
+            elbow: 断层阈值 (0~1)。相邻结果之间最大的分数间隔若不小于
+                elbow * (最大 score - 最小 score)，则只保留断层之前的结果
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        elbow = self.elbow if elbow is None else elbow
+        if max_distance is not None:
+            chunks = [c for c in chunks if c.score is None or c.score <= max_distance]
+        scores = [c.score for c in chunks]
+        if elbow is None or len(chunks) < 2 or None in scores:
+            return chunks
+        spread = scores[-1] - scores[0]
+        if spread <= 0:
+            return chunks
+        gaps = [b - a for a, b in zip(scores, scores[1:])]
+        cut = max(range(len(gaps)), key=gaps.__getitem__)
+        if gaps[cut] >= elbow * spread:
+            return chunks[:cut + 1]
+        return chunks
+
+    def expand_neighbors(self, chunks: List[Chunk], neighbors: int) -> List[Chunk]:
+        """将命中分块扩展为同文档 ±neighbors 的上下文窗口
+
+        邻近分块按 SQLite 中保存的 position 读取，不做额外的向量检索或嵌入。
+        同一文档中重叠或相邻的窗口会被合并，合并后的分块沿用其中排名最高的命中的
+        pkid、score 与元数据，结果保持原命中排序。
+        窗口跨越标题 (mk_struct) 变化时按章节拆分为多个分块，各自带有所属章节的标题结构，
+        拆出的分块与命中排名相同、按 position 排列，不含命中的部分以其首个分块的 pkid 标识。
+        """
+        if neighbors <= 0 or not chunks:
+            return chunks
+
+        # 1. 按文档收集窗口 [start, end, rank, hit]
+        windows: Dict[str, list] = {}
+        ranked: List[tuple] = []
+        for rank, chunk in enumerate(chunks):
+            if chunk.document_id is None or chunk.content is None:
+                ranked.append((rank, chunk))
+                continue
+            document_id, position = chunk.document_id, chunk.position
+            windows.setdefault(document_id, []).append(
+                [max(0, position - neighbors), position + neighbors, rank, chunk]
+            )
+
+        # 2. 合并重叠或相邻的窗口
+        merged = []
+        for document_id, items in windows.items():
+            items.sort(key=lambda w: w[0])
+            current = items[0]
+            for window in items[1:]:
+                if window[0] <= current[1] + 1:
+                    current[1] = max(current[1], window[1])
+                    if window[2] < current[2]:
+                        current[2], current[3] = window[2], window[3]
+                else:
+                    merged.append((document_id, current))
+                    current = window
+            merged.append((document_id, current))
+
+        # 3. 读取窗口文本，按章节拆分后拼接
+        for document_id, (start, end, rank, hit) in merged:
+            rows = self.chunk_repo.get_window(document_id, start, end)
+            if not rows:
+                ranked.append((rank, hit))
+                continue
+            for _, group in groupby(rows, key=lambda row: row["mk_struct"]):
+                section = list(group)
+                has_hit = any(row["pkid"] == hit.pkid for row in section)
+                ranked.append((rank, Chunk(
+                    document_id=document_id,
+                    pkid=hit.pkid if has_hit else section[0]["pkid"],
+                    content="\n".join(row["content"] for row in section),
+                    source=hit.source,
+                    mk_struct=section[0]["mk_struct"],
+                    position=section[0]["position"],
+                    score=hit.score,
+                    extra={**(hit.extra or {}), "positions": [section[0]["position"], section[-1]["position"]]},
+                )))
+
+        ranked.sort(key=lambda item: item[0])
+        return [chunk for _, chunk in ranked]
+
+    def search_chunks_batch(
+        self,
+        queries: List[str],
+        top_k: int = 2,
+        neighbors: int = 0,
+        max_distance: Optional[float] = None,
+        elbow: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        kbs: Optional[Sequence[str]] = None,
+    ) -> List[List[Chunk]]:
+        """批量搜索相关分块
+
+        参数:
+            queries: 查询列表
+            top_k: 每个查询最多返回的结果数量
+            neighbors: 邻近分块扩展窗口，见 expand_neighbors
+            max_distance: 距离阈值，见 apply_cutoffs
+            elbow: 分数断层阈值，见 apply_cutoffs
+            mmr_lambda: 设置后启用 MMR 多样化，见 diversify
+            fetch_k: MMR 候选池大小
+            kbs: 检索的知识库 (默认为当前知识库)；多个知识库时各库批量检索后逐查询合并
+
+        返回:
+            List[List[Chunk]]: 与 queries 一一对应的结果，空查询对应空列表
+        """
+        if kbs:
+            kbs = self.check_kbs(kbs)
+        if kbs and len(kbs) > 1:
+            # 与 search_federated 相同：每个向量空间只嵌入一次
+            spaces = self.kb_spaces(kbs)
+            valid = self._valid_queries(queries)
+            vectors = self._embed_per_space(
+                spaces, lambda: self.chunk_repo.embed_queries([queries[i] for i in valid])
+            )
+            per_kb = self._run_per_kb(spaces, lambda space: self._search_chunks_batch(
+                queries, top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k, vectors[space]
+            ))
+            return [
+                self.merge_results([(kb, space, results[i]) for kb, space, results in per_kb], top_k)
+                for i in range(len(queries))
+            ]
+        start = time.perf_counter()
+        with use_kb(kbs[0] if kbs else None):
+            results = self._search_chunks_batch(queries, top_k, neighbors, max_distance, elbow, mmr_lambda, fetch_k)
+        if queries:
+            # 批量模式记录均摊到每个查询的耗时
+            per_query = (time.perf_counter() - start) / len(queries)
+            for _ in queries:
+                QUERY_DURATION.observe(per_query, mode="batch")
+        return results
+
+    @staticmethod
+    def _valid_queries(queries: List[str]) -> List[int]:
+        """非空查询的序号"""
+        return [i for i, q in enumerate(queries) if q and q.strip()]
+
+    def _search_chunks_batch(
+        self,
+        queries: List[str],
+        top_k: int,
+        neighbors: int,
+        max_distance: Optional[float],
+        elbow: Optional[float],
+        mmr_lambda: Optional[float],
+        fetch_k: Optional[int],
+        vectors: Optional[List[List[float]]] = None,
+    ) -> List[List[Chunk]]:
+        """批量检索当前知识库
+
+        参数:
+            vectors: 已嵌入的查询向量，与非空查询 (见 _valid_queries) 一一对应；为空时在此嵌入
+        """
+        valid = self._valid_queries(queries)
+        results: List[List[Chunk]] = [[] for _ in queries]
+        if vectors is None:
+            vectors = self.chunk_repo.embed_queries([queries[i] for i in valid])
+        mmr_lambda = self.mmr_lambda if mmr_lambda is None else mmr_lambda
+        if mmr_lambda is None:
+            hits = self.chunk_repo.search_by_vectors(vectors, top_k)
+            for i, chunks in zip(valid, hits):
+                chunks = self.apply_cutoffs(chunks, max_distance, elbow)
+                results[i] = self.expand_neighbors(chunks, neighbors)
+            return results
+        candidates = self.chunk_repo.search_candidates_by_vectors(vectors, self._fetch_k(top_k, fetch_k))
+        for i, (query_vector, chunks, matrix) in zip(valid, candidates):
+            chunks = self.diversify(
+                query_vector, chunks, matrix, top_k, mmr_lambda, max_distance, elbow
+            )
+            results[i] = self.expand_neighbors(chunks, neighbors)
+        return results
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+from x1ayu_rag.config.app_config import load_config
+from x1ayu_rag.config.constants import REINDEX_LOG_FILE_NAME, REINDEX_STATE_FILE_NAME
+from x1ayu_rag.config.kb_context import current_kb, kb_path
+from x1ayu_rag.db.sqlite_db import SqliteDB
+from x1ayu_rag.db.vector_db import VectorDB
+from x1ayu_rag.error.exceptions import ReindexError
+from x1ayu_rag.llm.factory import LLMFactory
+from x1ayu_rag.model.chunk import Chunk
+from x1ayu_rag.repository.chunk_repository import ChunkRepository
+from x1ayu_rag.utils.path_utils import write_json_atomic
+
+# 任务状态
+RUNNING = "running"
+INTERRUPTED = "interrupted"
+FAILED = "failed"
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ReindexService:
+    """Embedding 模型迁移 (影子集合重建索引)
+
+    1. start: 以 config.json 中的 Embedding 模型为目标，在按模型身份命名的新位置建立影子集合，
+       任务与进度写入 reindex.json；当前集合继续以原模型服务检索与摄取
+    2. run: 按 pkid 顺序分批读取 SQLite 中的分块文本，用新模型嵌入后写入影子集合，
+       每批保存游标，中断后再次运行从游标处继续
+    3. 追平与切换: 对比 SQLite 与影子集合的 pkid，补齐重建期间新增的分块、删除已移除的分块；
+       最后一轮在 SQLite 写锁内完成，随后原子替换 vectors.json 切换到新集合
+    """
+
+    # 每批从 SQLite 读取并嵌入的分块数 (提供商请求由 ResilientEmbeddings 再按限流设置拆分)
+    BATCH_SIZE = 256
+
+    # ---- 任务状态 ----
+
+    @staticmethod
+    def load_job() -> Optional[Dict[str, Any]]:
+        try:
+            with open(kb_path(REINDEX_STATE_FILE_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _save_job(job: Dict[str, Any]) -> None:
+        job["updated_at"] = time.time()
+        write_json_atomic(kb_path(REINDEX_STATE_FILE_NAME), job)
+
+    @staticmethod
+    def _clear_job() -> None:
+        path = kb_path(REINDEX_STATE_FILE_NAME)
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def shadow_location(backend: str, identity: Dict[str, Any]) -> str:
+        """影子集合的位置，以模型身份的摘要命名"""
+        tag = hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return VectorDB.new_location(backend, tag)
+
+    def status(self) -> Dict[str, Any]:
+        """当前集合、配置中的目标模型与重建任务进度 (顺带清理已切换下来的旧集合)"""
+        self.cleanup_retired()
+        active = VectorDB.active_collection()
+        job = self.load_job()
+        report: Dict[str, Any] = {
+            "collection": {k: active[k] for k in ("backend", "location", "identity")},
+            "config": LLMFactory.embedding_identity(),
+            "job": None,
+        }
+        report["up_to_date"] = report["collection"]["identity"] == report["config"]
+        if job:
+            running = job.get("status") == RUNNING and _pid_alive(job.get("pid"))
+            report["job"] = {
+                "identity": job["identity"],
+                "location": job["location"],
+                "status": job.get("status") if running or job.get("status") != RUNNING else INTERRUPTED,
+                "running": running,
+                "pid": job.get("pid"),
+                "done": job.get("done", 0),
+                "total": job.get("total", 0),
+                "error": job.get("error"),
+                "started_at": job.get("started_at"),
+                "updated_at": job.get("updated_at"),
+            }
+        return report
+
+    def start(self) -> Dict[str, Any]:
+        """创建重建任务，已有同一目标模型的未完成任务时继续该任务
+
+        返回:
+            dict: 任务状态 (reindex.json 内容)
+
+        异常:
+            ReindexError: 配置中的模型与当前集合一致，或已有任务正在运行
+        """
+        LLMFactory.validate_embedding_config()
+        self.cleanup_retired()
+        active = VectorDB.tag_active()
+        emb_config = load_config().get("embedding") or {}
+        identity = LLMFactory.embedding_identity({"embedding": emb_config})
+        job = self.load_job()
+
+        if job and job.get("status") == RUNNING and _pid_alive(job.get("pid")) and job.get("pid") != os.getpid():
+            raise ReindexError(f"A reindex is already running (pid {job['pid']}).")
+        if identity == active["identity"]:
+            if job:
+                self.cancel()
+            raise ReindexError(
+                f"The vector collection already uses {identity}; change the embedding model in config.json first."
+            )
+        if job and job["identity"] == identity and job["backend"] == active["backend"]:
+            # 继续未完成的任务 (连接地址、密钥等可能已更新)
+            job["embedding"] = dict(emb_config)
+            self._save_job(job)
+            return job
+        if job:
+            self.cancel()
+
+        location = self.shadow_location(active["backend"], identity)
+        VectorDB.remove_location(location)
+        job = {
+            "backend": active["backend"],
+            "location": location,
+            "embedding": dict(emb_config),
+            "identity": identity,
+            "source": active["identity"],
+            "cursor": None,
+            "done": 0,
+            "total": ChunkRepository().count_embeddable(),
+            "status": RUNNING,
+            "pid": None,
+            "error": None,
+            "started_at": time.time(),
+        }
+        self._save_job(job)
+        return job
+
+    def cancel(self) -> bool:
+        """放弃重建任务并删除影子集合
+
+        返回:
+            bool: 是否存在任务
+        """
+        job = self.load_job()
+        if job is None:
+            return False
+        if job.get("status") == RUNNING and _pid_alive(job.get("pid")) and job.get("pid") != os.getpid():
+            raise ReindexError(f"The reindex is still running (pid {job['pid']}); stop it first.")
+        if job["location"] != VectorDB.active_collection()["location"]:
+            VectorDB.remove_location(job["location"])
+        self._clear_job()
+        return True
+
+    def cleanup_retired(self) -> List[str]:
+        """删除已切换下来的旧集合 (常驻服务运行时保留，服务可能仍打开着旧文件)"""
+        from x1ayu_rag.daemon.client import DaemonClient
+        state = VectorDB.load_state()
+        retired = state.get("retired") or []
+        if not retired or DaemonClient.connect() is not None:
+            return []
+        active_location = (state.get("active") or {}).get("location")
+        for location in retired:
+            if location != active_location:
+                VectorDB.remove_location(location)
+        state["retired"] = []
+        VectorDB.save_state(state)
+        return retired
+
+    # ---- 执行 ----
+
+    def spawn_worker(self) -> int:
+        """在后台进程中执行当前知识库的任务 (rag reindex --worker，输出追加到 reindex.log)
+
+        返回:
+            int: 后台进程号
+        """
+        job = self.load_job()
+        if job is None:
+            raise ReindexError("No reindex in progress; run 'rag reindex' to start one.")
+        with open(kb_path(REINDEX_LOG_FILE_NAME), "ab") as log:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "x1ayu_rag.main", "reindex", "--worker", "--kb", current_kb()],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        # 立即记录进程号，避免后台进程启动前被误判为已中断
+        job.update(status=RUNNING, pid=proc.pid)
+        self._save_job(job)
+        return proc.pid
+
+    def run(self, progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """执行 (或继续) 重建任务直至切换完成
+
+        参数:
+            progress: 每批完成后调用 progress(done, total)
+
+        返回:
+            dict: embedded (嵌入分块数)、added / removed (追平时补齐 / 删除的分块数)、
+                  collection (新集合标签)、seconds
+        """
+        job = self.load_job()
+        if job is None:
+            raise ReindexError("No reindex in progress; run 'rag reindex' to start one.")
+        if job.get("status") == RUNNING and _pid_alive(job.get("pid")) and job.get("pid") != os.getpid():
+            raise ReindexError(f"A reindex is already running (pid {job['pid']}).")
+        job.update(status=RUNNING, pid=os.getpid(), error=None)
+        self._save_job(job)
+
+        start = time.perf_counter()
+        store = None
+        try:
+            store = VectorDB.open_store(job["backend"], job["location"], LLMFactory.get_embeddings(job["embedding"]))
+            embedded = self._embed_pass(store, job, progress)
+            # 先在无锁状态下追平，使写锁内的最后一轮只剩极少量差异
+            added, removed = self._catch_up(store, ChunkRepository())
+            final_added, final_removed = self._switch(store, job)
+            added, removed = added + final_added, removed + final_removed
+        except KeyboardInterrupt:
+            if store is not None:
+                store.close()
+            job.update(status=INTERRUPTED, pid=None)
+            self._save_job(job)
+            raise
+        except Exception as e:
+            if store is not None:
+                store.close()
+            job.update(status=FAILED, pid=None, error=str(e))
+            self._save_job(job)
+            if isinstance(e, ReindexError):
+                raise
+            raise ReindexError(f"Reindex failed: {e}", e)
+
+        self._clear_job()
+        self.cleanup_retired()
+        return {
+            "embedded": embedded,
+            "added": added,
+            "removed": removed,
+            "collection": VectorDB.load_state()["active"],
+            "seconds": time.perf_counter() - start,
+        }
+
+    def _write(self, store, chunks: List[Chunk]) -> None:
+        texts = [c.content for c in chunks]
+        store.add_embeddings(
+            texts=texts,
+            embeddings=store.embeddings.embed_documents(texts),
+            metadatas=[c.metadata for c in chunks],
+            ids=[c.pkid for c in chunks],
+        )
+
+    def _embed_pass(self, store, job: Dict[str, Any], progress) -> int:
+        """按 pkid 顺序分批嵌入，每批后保存游标"""
+        repo = ChunkRepository()
+        embedded = 0
+        # 上次中断时游标之后的一批可能已写入但未记录进度，继续时先删除以免重复插入
+        resumed = job["cursor"] is not None or job["done"] > 0
+        while True:
+            chunks = repo.list_embeddable(after=job["cursor"], limit=self.BATCH_SIZE)
+            if not chunks:
+                return embedded
+            if resumed:
+                store.delete([c.pkid for c in chunks])
+                resumed = False
+            self._write(store, chunks)
+            embedded += len(chunks)
+            job["cursor"] = chunks[-1].pkid
+            job["done"] += len(chunks)
+            job["total"] = max(job["total"], job["done"])
+            self._save_job(job)
+            if progress:
+                progress(job["done"], job["total"])
+
+    def _catch_up(self, store, repo: ChunkRepository) -> tuple:
+        """补齐影子集合缺少的分块并删除 SQLite 中已不存在的分块
+
+        返回:
+            (added, removed)
+        """
+        current = {pk for batch in repo.iter_pkids(embeddable_only=True) for pk in batch}
+        shadow = {pk for batch in store.iter_ids() for pk in batch}
+        missing = sorted(current - shadow)
+        stale = sorted(shadow - current)
+        for i in range(0, len(missing), self.BATCH_SIZE):
+            chunks = repo.get_embeddable(missing[i:i + self.BATCH_SIZE])
+            if chunks:
+                self._write(store, chunks)
+        if stale:
+            store.delete(stale)
+        return len(missing), len(stale)
+
+    def _switch(self, store, job: Dict[str, Any]) -> tuple:
+        """在 SQLite 写锁内完成最后一轮追平并切换集合
+
+        持锁期间其他进程的摄取在 busy_timeout 内等待，不会在对比之后、切换之前写入旧集合。
+        """
+        conn = SqliteDB.get_conn()
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added, removed = self._catch_up(store, ChunkRepository(conn))
+            # 本进程不再使用影子集合 (Milvus Lite 数据文件在本进程退出后才可被其他进程打开)
+            store.close()
+            # 降维投影属于旧集合，新集合保存的是原始维度的向量
+            VectorDB.switch_collection(VectorDB.make_tag(job["backend"], job["location"], job["embedding"]))
+        finally:
+            conn.rollback()
+        return added, removed
@@ -1,5 +1,6 @@
 import os
-from x1ayu_rag.config.constants import DEFAULT_CONFIG_DIR, SQLITE_DB_PATH
+from x1ayu_rag.config.constants import DEFAULT_CONFIG_DIR, DEFAULT_KB_NAME
+from x1ayu_rag.config.kb_context import current_kb, kb_dir, kb_exists, list_kbs, use_kb
 from x1ayu_rag.repository.system_repository import SystemRepository
 
 class SystemService:
@@ -14,9 +15,9 @@ class SystemService:
         """检查系统是否已初始化。
         
         返回:
-            bool: 如果 SQLite 数据库文件存在，则返回 True，否则返回 False。
+            bool: 如果默认知识库的 SQLite 数据库文件存在，则返回 True，否则返回 False。
         """
-        return os.path.exists(SQLITE_DB_PATH)
+        return kb_exists(DEFAULT_KB_NAME)
         
     def initialize_environment(self) -> bool:
         """初始化 RAG 运行环境。
@@ -35,3 +36,34 @@ class SystemService:
         
         self.system_repo.initialize_database()
         return True
+
+    def ensure_kb(self) -> bool:
+        """确保当前知识库已建立 (命名知识库在首次使用时创建目录与数据库)
+
+        返回:
+            bool: 本次新建了知识库返回 True
+        """
+        if kb_exists(current_kb()):
+            return False
+        os.makedirs(kb_dir(), exist_ok=True)
+        self.system_repo.initialize_database()
+        return True
+
+    def list_kbs(self):
+        """已建立的知识库
+
+        返回:
+            List[dict]: name, path (数据目录), documents, chunks
+        """
+        result = []
+        for name in list_kbs():
+            with use_kb(name):
+                result.append({"name": name, "path": kb_dir(), **self.system_repo.count_rows()})
+        return result
+
+    def pending_model_change(self):
+        """config.json 中的 Embedding 模型与向量集合不一致时返回两者的身份 (见 VectorDB.pending_model_change)"""
+        if not kb_exists(current_kb()):
+            return None
+        from x1ayu_rag.db.vector_db import VectorDB
+        return VectorDB.pending_model_change()
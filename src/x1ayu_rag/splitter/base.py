@@ -1,13 +1,16 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from langchain_core.documents import Document
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from x1ayu_rag.model.chunk import Chunk
 
 class SplitterStrategy(ABC):
     """切分器策略基类。"""
     
     @abstractmethod
-    def split_from_content(self, file_name: str, dir_path: str | None, content: str) -> list[Document]:
-        """将文件内容拆分为 LangChain 文档列表。
+    def split_from_content(self, file_name: str, dir_path: str | None, content: str) -> list[Chunk]:
+        """将文件内容拆分为分块列表。
         
         参数:
             file_name: 文件名
@@ -15,7 +18,7 @@ class SplitterStrategy(ABC):
             content: 文件内容
             
         返回:
-            list[Document]: 切分后的文档列表
+            list[Chunk]: 按顺序编号的分块 (尚未关联文档)，同一文件的分块共用一个 source 字典
         """
 
 
@@ -25,4 +28,4 @@ def get_splitter():
     目前固定使用 MarkdownSplitter。
     """
     from x1ayu_rag.splitter.markdown import MarkdownSplitter
-    return MarkdownSplitter()
\ No newline at end of file
+    return MarkdownSplitter()
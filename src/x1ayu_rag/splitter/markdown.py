@@ -1,8 +1,8 @@
 from __future__ import annotations
 from langchain_text_splitters import MarkdownHeaderTextSplitter
-from langchain_core.documents import Document
 import json
-import os
+import sys
+from x1ayu_rag.model.chunk import Chunk
 from .base import SplitterStrategy
 
 
@@ -11,8 +11,15 @@ class MarkdownSplitter(SplitterStrategy):
     
     使用 LangChain 的 MarkdownHeaderTextSplitter 按标题层级进行切分。
     """
+
+    HEADERS_TO_SPLIT_ON = [
+        ("#", "Header1"),
+        ("##", "Header2"),
+        ("###", "Header3"),
+        ("####", "Header4"),
+    ]
     
-    def split_from_content(self, file_name: str, dir_path: str | None, content: str) -> list[Document]:
+    def split_from_content(self, file_name: str, dir_path: str | None, content: str) -> list[Chunk]:
         """按 Markdown 头级结构拆分给定内容。
         
         参数:
@@ -21,27 +28,19 @@ class MarkdownSplitter(SplitterStrategy):
             content: Markdown 内容
             
         返回:
-            list[Document]: 切分后的文档列表，包含元数据（文件名、目录、标题结构）。
+            list[Chunk]: 切分后的分块，共用文件级元数据 (文件名、目录)，标题结构为驻留的 JSON 字符串。
         """
-        headers_to_split_on = [
-            ("#", "Header1"),
-            ("##", "Header2"),
-            ("###", "Header3"),
-            ("####", "Header4"),
-        ]
         markdown_splitter = MarkdownHeaderTextSplitter(
-            headers_to_split_on, return_each_line=True
+            self.HEADERS_TO_SPLIT_ON, return_each_line=True
         )
-        docs = markdown_splitter.split_text(content)
-        final_docs = [
-            Document(
-                page_content=doc.page_content,
-                metadata={
-                    "file_name": file_name,
-                    "dir_path": dir_path,
-                    "mk_struct": json.dumps(doc.metadata, ensure_ascii=False),
-                },
-            )
-            for doc in docs
-        ]
-        return final_docs
+        source = {"file_name": file_name, "dir_path": dir_path}
+        # 同一标题路径下的各行只序列化一次
+        structs: dict[tuple, str] = {}
+        chunks = []
+        for position, doc in enumerate(markdown_splitter.split_text(content)):
+            key = tuple(doc.metadata.items())
+            mk_struct = structs.get(key)
+            if mk_struct is None:
+                mk_struct = structs[key] = sys.intern(json.dumps(doc.metadata, ensure_ascii=False))
+            chunks.append(Chunk(content=doc.page_content, source=source, mk_struct=mk_struct, position=position))
+        return chunks
@@ -0,0 +1,268 @@
+import contextlib
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 默认直方图分桶 (秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指标基类：按标签值组合保存样本"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """返回 (后缀, 标签串, 值) 列表"""
+        with self._lock:
+            return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    """分桶直方图 (累计分桶、总和与次数)"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """记录 with 语句块的耗时 (秒)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = [(key, [list(state[0]), state[1], state[2]]) for key, state in sorted(self._values.items())]
+        samples = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                samples.append(("_bucket", _format_labels(self.labelnames, key, le), bucket_count))
+            samples.append(("_sum", _format_labels(self.labelnames, key), total))
+            samples.append(("_count", _format_labels(self.labelnames, key), count))
+        return samples
+
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    摄取与查询路径在运行时更新计数器、仪表与直方图；render 输出 Prometheus 文本格式，
+    write_textfile 原子写入供 node_exporter textfile collector 读取。
+    向量数等按需计算的指标通过 add_collector 注册，在导出前刷新。
+    """
+
+    _metrics: Dict[str, _Metric] = {}
+    _collectors: List[Callable[[], None]] = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_or_create(cls, metric_cls, name: str, help: str, labelnames: Tuple[str, ...], **kwargs):
+        with cls._lock:
+            metric = cls._metrics.get(name)
+            if metric is None:
+                metric = cls._metrics[name] = metric_cls(name, help, tuple(labelnames), **kwargs)
+            elif not isinstance(metric, metric_cls):
+                raise ValueError(f"Metric {name} is already registered as {metric.type}")
+            return metric
+
+    @classmethod
+    def counter(cls, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return cls._get_or_create(Counter, name, help, labelnames)
+
+    @classmethod
+    def gauge(cls, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return cls._get_or_create(Gauge, name, help, labelnames)
+
+    @classmethod
+    def histogram(
+        cls, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return cls._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    @classmethod
+    def add_collector(cls, collector: Callable[[], None]) -> None:
+        """注册导出前调用的回调 (用于刷新按需计算的仪表)"""
+        if collector not in cls._collectors:
+            cls._collectors.append(collector)
+
+    @classmethod
+    def collect(cls) -> None:
+        for collector in list(cls._collectors):
+            try:
+                collector()
+            except Exception:
+                # 指标导出不应影响主流程 (如知识库尚未初始化)
+                pass
+
+    @classmethod
+    def render(cls) -> str:
+        """输出 Prometheus 文本格式"""
+        cls.collect()
+        with cls._lock:
+            metrics = [cls._metrics[name] for name in sorted(cls._metrics)]
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+    @classmethod
+    def write_textfile(cls, path: str, text: Optional[str] = None) -> None:
+        """原子写入 Prometheus 文本文件 (先写临时文件再重命名)
+
+        参数:
+            path: 目标文件路径
+            text: 要写入的内容，默认为本进程的 render() 结果
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(cls.render() if text is None else text)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def reset(cls) -> None:
+        """清空所有样本 (保留已注册的指标)"""
+        with cls._lock:
+            for metric in cls._metrics.values():
+                metric.clear()
+
+
+# ---- 标准指标 ----
+
+EMBEDDING_REQUESTS = MetricsRegistry.counter(
+    "rag_embedding_requests_total", "Embedding requests that succeeded.", ("provider",)
+)
+EMBEDDING_TEXTS = MetricsRegistry.counter(
+    "rag_embedding_texts_total", "Texts embedded.", ("provider",)
+)
+EMBEDDING_TOKENS = MetricsRegistry.counter(
+    "rag_embedding_tokens_total", "Estimated tokens sent to the embedding provider.", ("provider",)
+)
+EMBEDDING_RETRIES = MetricsRegistry.counter(
+    "rag_embedding_retries_total", "Embedding requests retried after a retryable error.", ("provider",)
+)
+PROVIDER_ERRORS = MetricsRegistry.counter(
+    "rag_provider_errors_total", "Errors raised by model providers.", ("kind", "provider", "error")
+)
+CACHE_REQUESTS = MetricsRegistry.counter(
+    "rag_cache_requests_total", "Cache lookups.", ("cache", "result")
+)
+DOCUMENTS = MetricsRegistry.counter(
+    "rag_documents_total", "Documents processed by ingest, by outcome.", ("op",)
+)
+INGEST_DURATION = MetricsRegistry.histogram(
+    "rag_ingest_file_duration_seconds", "Time to ingest a single file (parse, embed, store)."
+)
+QUERY_DURATION = MetricsRegistry.histogram(
+    "rag_query_duration_seconds", "Chunk search latency per query (batch mode is amortised).", ("mode",)
+)
+CONTEXT_TOKENS = MetricsRegistry.counter(
+    "rag_context_tokens_total",
+    "Context tokens sent to the chat model (packed) and what the unpacked JSON format would have used (json).",
+    ("format",),
+)
+VECTORS = MetricsRegistry.gauge("rag_vectors", "Chunks (vectors) stored in the knowledge base.")
+STORED_DOCUMENTS = MetricsRegistry.gauge("rag_documents", "Documents stored in the knowledge base.")
+LAST_RUN = MetricsRegistry.gauge("rag_last_run_timestamp_seconds", "Unix time when these metrics were exported.")
+
+
+def _collect_store_sizes() -> None:
+    from x1ayu_rag.config.constants import SQLITE_DB_PATH
+    if not os.path.exists(SQLITE_DB_PATH):
+        return
+    from x1ayu_rag.db.sqlite_db import SqliteDB
+    from x1ayu_rag.db.vector_db import VectorDB
+    conn = SqliteDB.get_read_conn()
+    STORED_DOCUMENTS.set(conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0])
+    # 向量数以向量库为准 (与 SQLite 中的分块数可能因未修复的缺失向量而不同)
+    VECTORS.set(VectorDB.get_vector_store().stats()["rows"])
+
+
+MetricsRegistry.add_collector(_collect_store_sizes)
+MetricsRegistry.add_collector(lambda: LAST_RUN.set(time.time()))
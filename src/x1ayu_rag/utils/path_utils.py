@@ -1,4 +1,6 @@
+import json
 import os
+from typing import Any
 
 def to_relative_path(path: str) -> str:
     """将绝对路径转换为相对于当前工作目录的路径
@@ -13,3 +15,11 @@ def to_relative_path(path: str) -> str:
         return rel_path
     except Exception:
         return path
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """原子写入 JSON 文件 (先写临时文件再重命名，读取方不会看到写了一半的内容)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,110 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+# 未启用时所有 span 共用的空上下文 (不计时、不分配对象)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Profiler:
+    """分阶段计时
+
+    通过 span(name) 记录各阶段耗时，启用后可输出按阶段汇总的统计 (次数、总耗时、p50/p95)
+    或 Chrome trace-event 文件 (chrome://tracing / Perfetto 打开)。
+    默认关闭，此时 span 直接返回共享的空上下文。
+    """
+
+    enabled = False
+    # (name, start, end, thread_id)
+    _records: List[tuple] = []
+    _origin = 0.0
+
+    @classmethod
+    def enable(cls) -> None:
+        cls._records = []
+        cls._origin = time.perf_counter()
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls) -> None:
+        cls.enabled = False
+
+    @classmethod
+    def record(cls, name: str, start: float, end: float) -> None:
+        # list.append 在 GIL 下是原子的，多线程记录无需加锁
+        cls._records.append((name, start, end, threading.get_ident()))
+
+    @classmethod
+    def summary(cls) -> List[Dict[str, Any]]:
+        """按阶段汇总，按总耗时降序
+
+        返回:
+            List[Dict]: name, count, total_ms, p50_ms, p95_ms
+        """
+        durations: Dict[str, List[float]] = {}
+        for name, start, end, _ in list(cls._records):
+            durations.setdefault(name, []).append((end - start) * 1000)
+        rows = []
+        for name, values in durations.items():
+            values.sort()
+            rows.append({
+                "name": name,
+                "count": len(values),
+                "total_ms": sum(values),
+                "p50_ms": values[(len(values) - 1) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            })
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    @classmethod
+    def elapsed_ms(cls) -> float:
+        """启用以来的墙钟时间 (毫秒)"""
+        return (time.perf_counter() - cls._origin) * 1000
+
+    @classmethod
+    def write_trace(cls, path: str) -> None:
+        """写出 Chrome trace-event 格式的 JSON"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": (start - cls._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, end, tid in list(cls._records)
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        Profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+def span(name: str):
+    """记录一个阶段的耗时 (用作 with 语句)
+
+    参数:
+        name: 阶段名，按 "类别.操作" 命名，如 "sqlite.commit"、"embed.documents"
+    """
+    if not Profiler.enabled:
+        return _NULL_SPAN
+    return _Span(name)
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def as_matrix(vectors) -> np.ndarray:
+    """将向量列表转换为二维 float32 矩阵。"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+
+def squared_l2_distances(queries: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """批量计算查询向量与矩阵各行之间的 L2 距离平方。
+
+    利用 |q - x|^2 = |q|^2 - 2 q·x + |x|^2 展开为一次矩阵乘法。
+
+    返回:
+        np.ndarray: 形状为 (len(queries), len(matrix)) 的距离矩阵。
+    """
+    q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+    x_norms = np.einsum("ij,ij->i", matrix, matrix)[None, :]
+    distances = q_norms - 2.0 * (queries @ matrix.T) + x_norms
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+def top_k_smallest(distances: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """对距离矩阵的每一行取最小的 k 个元素（升序）。
+
+    先用 argpartition 做 O(n) 的部分选择，再只对选出的 k 个元素排序。
+
+    返回:
+        (indices, values): 两个形状为 (rows, k) 的数组。
+    """
+    n = distances.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty((distances.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if k < n:
+        part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(n), (distances.shape[0], 1))
+    part_values = np.take_along_axis(distances, part, axis=1)
+    order = np.argsort(part_values, axis=1, kind="stable")
+    indices = np.take_along_axis(part, order, axis=1)
+    values = np.take_along_axis(part_values, order, axis=1)
+    return indices, values
+
+
+def exact_top_k(queries, matrix, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """精确 L2 最近邻检索。
+
+    返回:
+        (indices, distances): 每个查询的前 k 个行号及其 L2 距离平方。
+    """
+    return top_k_smallest(squared_l2_distances(as_matrix(queries), as_matrix(matrix)), k)
+
+
+def mmr_select(query, candidates, k: int, lambda_mult: float = 0.5) -> list[int]:
+    """最大边际相关性 (MMR) 选择。
+
+    每一步选取使 λ·sim(q, d) - (1-λ)·max sim(d, 已选) 最大的候选，
+    相似度为余弦相似度。已选集合的最大相似度增量维护，每步只需一次矩阵-向量乘法。
+
+    参数:
+        query: 查询向量
+        candidates: 候选向量矩阵 (按相关性排序)
+        k: 选取数量
+        lambda_mult: 1 为纯相关性，0 为纯多样性
+
+    返回:
+        list[int]: 选中候选的行号，按选择顺序排列。
+    """
+    matrix = as_matrix(candidates)
+    n = matrix.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+    q = as_matrix(query)[0]
+    matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    relevance = matrix @ q
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: list[int] = []
+    for _ in range(k):
+        if selected:
+            scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, matrix @ matrix[best], out=redundancy)
+    return selected